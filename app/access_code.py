@@ -1,9 +1,13 @@
 # python
 import secrets
 import sqlite3
+from typing import Dict, List
 from .db import get_db
 from .models import Member
 from .config import COUNCIL_TITLE
+from . import member_cache
+from . import db_writer
+from sqlalchemy import bindparam, func, update
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
@@ -20,8 +24,8 @@ class AccessCode:
         for _ in range(max_attempts):
             code = ''.join(secrets.choice(self.ALPHABET) for _ in range(length))
             member = (
-                self.db.query(Member)
-                .filter(Member.access_code.ilike(code.strip()))
+                self.db.query(Member.id)
+                .filter(func.lower(Member.access_code) == func.lower(code.strip()))
                 .first()
             )
             if member is None:
@@ -43,9 +47,62 @@ class AccessCode:
         if self.db.member is None:
             raise ValueError(f"No member with id {member_id}")
         self.db.member.access_code = code
-        self.db.commit()
+        with db_writer.exclusive():
+            self.db.commit()
+        member_cache.invalidate(member_id)
         return code
 
+    def generate_unique_access_codes(self, count: int, length: int = 6, max_attempts: int = 10000) -> List[str]:
+        """
+        Generate `count` distinct codes that are not already used in `members.access_code`.
+        Existing codes are loaded into a set once instead of querying per candidate.
+        """
+        taken = {
+            str(c).strip().lower()
+            for (c,) in self.db.query(Member.access_code).filter(Member.access_code.isnot(None))
+        }
+        codes: List[str] = []
+        attempts = 0
+        while len(codes) < count:
+            attempts += 1
+            if attempts > max_attempts + count:
+                raise RuntimeError(f"Failed to generate {count} unique access_codes after {attempts} attempts")
+            code = ''.join(secrets.choice(self.ALPHABET) for _ in range(length))
+            if code.lower() in taken:
+                continue
+            taken.add(code.lower())
+            codes.append(code)
+        return codes
+
+    def assign_access_codes(self, member_ids: List[int]) -> Dict[int, str]:
+        """
+        Give each member in `member_ids` a new unique access code, written with a
+        single executemany UPDATE and one commit. Returns {member_id: code}.
+        """
+        if not member_ids:
+            return {}
+        codes = self.generate_unique_access_codes(len(member_ids))
+        assigned = dict(zip(member_ids, codes))
+        stmt = (
+            update(Member.__table__)
+            .where(Member.__table__.c.id == bindparam("m_id"))
+            .values(access_code=bindparam("code"))
+        )
+        with db_writer.exclusive():
+            self.db.connection().execute(stmt, [{"m_id": mid, "code": code} for mid, code in assigned.items()])
+            self.db.commit()
+        for mid in assigned:
+            member_cache.invalidate(mid)
+        return assigned
+
+    def assign_missing_access_codes(self) -> Dict[int, str]:
+        """Assign codes to every member whose access_code is NULL or empty."""
+        member_ids = [
+            int(mid)
+            for (mid,) in self.db.query(Member.id).filter((Member.access_code == None) | (Member.access_code == ""))
+        ]
+        return self.assign_access_codes(member_ids)
+
 
 # Example usage:
 # conn = sqlite3.connect("data.sqlite3")
@@ -0,0 +1,140 @@
+"""Write helpers for the activities table.
+
+Every save is a single `INSERT ... ON CONFLICT(member_id, category) DO
+UPDATE` against the `uq_activities_member_category` index, so two autosaves
+racing from different tabs end up on the same row instead of creating a
+duplicate. Callers own the transaction (commit/rollback).
+"""
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import and_, bindparam, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .models import Activity
+
+
+def _upsert_statement():
+    stmt = sqlite_insert(Activity)
+    return stmt.on_conflict_do_update(
+        index_elements=[Activity.member_id, Activity.category],
+        set_={
+            "hours": stmt.excluded.hours,
+            "amount": stmt.excluded.amount,
+            "date": stmt.excluded.date,
+        },
+    )
+
+
+def _row(member_id: int, category: str, hours: float, amount: float) -> dict:
+    return {
+        "member_id": member_id,
+        "category": category,
+        "description": f"Form 1728 Section 1 - {category}",
+        "date": date.today(),
+        "hours": hours,
+        "amount": amount,
+    }
+
+
+def upsert_activities(db: Session, member_id: int, values: Iterable[Tuple[str, float, float]]) -> int:
+    """Insert or update (category, hours, amount) rows for a member in one statement.
+
+    Returns the number of rows sent.
+    """
+    rows = [_row(member_id, category, hours, amount) for category, hours, amount in values]
+    if rows:
+        db.execute(_upsert_statement(), rows)
+    return len(rows)
+
+
+def save_activity(db: Session, member_id: int, category: str, hours: float, amount: float, create_empty: bool = False) -> None:
+    """Save one category for a member with a single statement.
+
+    Zero values only update an existing row; no row is created for them
+    unless `create_empty` is set (keeps the table free of empty lines).
+    """
+    if hours > 0 or amount > 0 or create_empty:
+        upsert_activities(db, member_id, [(category, hours, amount)])
+    else:
+        (
+            db.query(Activity)
+            .filter(Activity.member_id == member_id, Activity.category == category)
+            .update({"hours": hours, "amount": amount, "date": date.today()}, synchronize_session=False)
+        )
+
+
+def save_many(db: Session, saves: Iterable[Tuple[int, str, float, float, bool]]) -> int:
+    """Apply save_activity semantics to many (member_id, category) entries at once.
+
+    `saves` holds (member_id, category, hours, amount, create_empty) tuples.
+    At most two statements are issued: one bulk upsert for entries with
+    something to store and one bulk UPDATE for zeroed entries.
+    """
+    upserts = []
+    zeroes = []
+    for member_id, category, hours, amount, create_empty in saves:
+        if hours > 0 or amount > 0 or create_empty:
+            upserts.append(_row(member_id, category, hours, amount))
+        else:
+            zeroes.append({"m_id": member_id, "cat": category, "hours": hours, "amount": amount, "date": date.today()})
+    if upserts:
+        db.execute(_upsert_statement(), upserts)
+    if zeroes:
+        stmt = (
+            update(Activity)
+            .where(and_(Activity.member_id == bindparam("m_id"), Activity.category == bindparam("cat")))
+            .values(hours=bindparam("hours"), amount=bindparam("amount"), date=bindparam("date"))
+        )
+        db.connection().execute(stmt, zeroes)
+    return len(upserts) + len(zeroes)
+
+
+def load_member_values(db: Session, member_id: int) -> Dict[str, Tuple[float, float]]:
+    """Return {category: (hours, amount)} for a member in one query."""
+    rows = (
+        db.query(Activity.category, Activity.hours, Activity.amount)
+        .filter(Activity.member_id == member_id)
+        .all()
+    )
+    return {str(category): (float(hours), float(amount)) for category, hours, amount in rows}
+
+
+def save_changed(
+    db: Session,
+    member_id: int,
+    values: Iterable[Tuple[str, float, float]],
+    create_empty: Iterable[str] = (),
+) -> List[Tuple[str, float, float]]:
+    """Upsert only the (category, hours, amount) rows that differ from what's stored.
+
+    Categories in `create_empty` get a row even for zeros, as with
+    save_activity(create_empty=True). Returns the rows that were written.
+    """
+    changed = diff_activities(load_member_values(db, member_id), values, create_empty)
+    if changed:
+        upsert_activities(db, member_id, changed)
+    return changed
+
+
+def diff_activities(
+    existing: Dict[str, Tuple[float, float]],
+    submitted: Iterable[Tuple[str, float, float]],
+    create_empty: Iterable[str] = (),
+) -> List[Tuple[str, float, float]]:
+    """Keep only the submitted (category, hours, amount) rows that change something.
+
+    Unchanged rows are dropped, and so are zero rows for categories the
+    member never filled in (unless the category is in `create_empty`).
+    """
+    create_empty = set(create_empty)
+    changed = []
+    for category, hours, amount in submitted:
+        current = existing.get(category)
+        if current is None:
+            if hours > 0 or amount > 0 or category in create_empty:
+                changed.append((category, hours, amount))
+        elif current != (hours, amount):
+            changed.append((category, hours, amount))
+    return changed
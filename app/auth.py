@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from .db import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import get_async_db
 from .models import Member
 from .config import COUNCIL_TITLE
+from . import member_cache
 import json
 
 router = APIRouter()
@@ -19,22 +21,24 @@ def login_get(request: Request):
     return templates.TemplateResponse("auth/login.html", context=context)
 
 @router.post("/login")
-def login_post(
+async def login_post(
     request: Request,
     last_name: str = Form(...),
     access_code: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    # Trim inputs (we'll use ilike for case-insensitive comparison)
+    # Trim inputs; compare lower() on both sides so the expression indexes are used
     last_name_trim = (last_name or "").strip()
     access_code_trim = (access_code or "").strip()
 
-    member = (
-        db.query(Member)
-        .filter(Member.last_name.ilike(last_name_trim))
-        .filter(Member.access_code.ilike(access_code_trim))
-        .first()
+    generation = member_cache.cache.current_generation()
+    result = await db.execute(
+        select(Member)
+        .where(func.lower(Member.access_code) == func.lower(access_code_trim))
+        .where(func.lower(Member.last_name) == func.lower(last_name_trim))
+        .limit(1)
     )
+    member = result.scalars().first()
     if not member:
         return templates.TemplateResponse(
             "auth/login.html",
@@ -48,6 +52,9 @@ def login_post(
         # SessionMiddleware not installed or session not available
         raise HTTPException(status_code=500, detail="SessionMiddleware not installed; cannot set session")
 
+    # the next request's get_current_member is then a cache hit
+    member_cache.prime(member, generation)
+
     # store user id and name in the session so middleware/logging can pick it up
     sess["user_id"] = member.id
     sess["first_name"] = member.first_name or ""
@@ -0,0 +1,274 @@
+"""Online backups of the database.
+
+Copying data.sqlite3 while the app runs can capture a half-written
+transaction (or miss the WAL entirely). backup() uses SQLite's online
+backup API instead, BACKUP_PAGES_PER_STEP pages at a time with a short
+sleep in between, so writers only ever wait for one small step. A write
+from another connection restarts the copy; after BACKUP_MAX_RESTARTS
+restarts the rest is copied in a single step (under WAL that still
+doesn't block writers).
+
+Each copy is written to a temporary file, checked with PRAGMA
+integrity_check and only then renamed into BACKUP_DIR as
+<db name>-YYYYmmdd-HHMMSS.sqlite3; the newest BACKUP_KEEP are kept.
+BackupScheduler takes one every BACKUP_INTERVAL_HOURS (off unless set); with several
+worker processes an flock makes sure only one of them does.
+
+Restore with `python -m app.cli restore <file>` (stop the app first).
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; concurrent schedulers are then not prevented
+    fcntl = None
+
+from .config import (
+    BACKUP_DIR,
+    BACKUP_INTERVAL_HOURS,
+    BACKUP_KEEP,
+    BACKUP_MAX_RESTARTS,
+    BACKUP_PAGES_PER_STEP,
+    BACKUP_STEP_SLEEP_MS,
+    DB_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BackupError(Exception):
+    """A backup or restore could not be completed; nothing was replaced."""
+
+
+@dataclass
+class BackupResult:
+    path: str
+    pages: int
+    size: int
+    seconds: float
+    restarts: int
+
+
+class _TooBusy(Exception):
+    pass
+
+
+def _stem(db_path: str) -> str:
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+
+def _pattern(db_path: str):
+    return re.compile(re.escape(_stem(db_path)) + r"-\d{8}-\d{6}(-\d+)?\.sqlite3$")
+
+
+def list_backups(backup_dir: str = BACKUP_DIR, db_path: str = DB_PATH) -> List[str]:
+    """Backups of db_path in backup_dir, oldest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    pattern = _pattern(db_path)
+    paths = [os.path.join(backup_dir, name) for name in os.listdir(backup_dir) if pattern.match(name)]
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def check_integrity(path: str) -> None:
+    """Raise BackupError unless PRAGMA integrity_check says "ok"."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"{path}: {e}") from e
+    finally:
+        conn.close()
+    if rows != ["ok"]:
+        raise BackupError(f"{path} failed integrity_check: {'; '.join(rows[:5])}")
+
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, pages: int, sleep_ms: float, max_restarts: int) -> int:
+    """Run the backup API; returns how often the copy had to start over."""
+    state = {"remaining": None, "restarts": 0, "logged": 0.0}
+
+    def progress(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            # the source changed under us and SQLite started over
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _TooBusy()
+        state["remaining"] = remaining
+        done = (total - remaining) / total if total else 1.0
+        if done - state["logged"] >= 0.1 or remaining == 0:
+            state["logged"] = done
+            logger.info("Backup progress: %d of %d pages (%.0f%%)", total - remaining, total, done * 100)
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep_ms / 1000.0)
+    except _TooBusy:
+        logger.warning("Backup restarted %d times under write load; copying the rest in one step", state["restarts"])
+        source.backup(target)
+    return state["restarts"]
+
+
+def backup(
+    backup_dir: str = BACKUP_DIR,
+    db_path: str = DB_PATH,
+    keep: int = BACKUP_KEEP,
+    pages: int = BACKUP_PAGES_PER_STEP,
+    sleep_ms: float = BACKUP_STEP_SLEEP_MS,
+    max_restarts: int = BACKUP_MAX_RESTARTS,
+) -> BackupResult:
+    """Take a verified online backup of db_path and rotate old ones."""
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(backup_dir, f"{_stem(db_path)}-{stamp}.sqlite3")
+    n = 0
+    while os.path.exists(path):
+        # more than one backup in the same second
+        n += 1
+        path = os.path.join(backup_dir, f"{_stem(db_path)}-{stamp}-{n}.sqlite3")
+    partial = path + ".partial"
+    logger.info("Backup of %s to %s started", db_path, path)
+    start = time.perf_counter()
+
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    target = sqlite3.connect(partial)
+    try:
+        restarts = _copy(source, target, max(pages, 1), sleep_ms, max_restarts)
+        # a standalone file: no -wal/-shm next to the backup
+        target.execute("PRAGMA journal_mode=DELETE")
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+    except Exception as e:
+        target.close()
+        _remove(partial)
+        raise BackupError(f"backup of {db_path} failed: {e}") from e
+    finally:
+        source.close()
+    target.close()
+
+    try:
+        check_integrity(partial)
+    except BackupError:
+        _remove(partial)
+        raise
+    os.replace(partial, path)
+    seconds = time.perf_counter() - start
+    result = BackupResult(path=path, pages=page_count, size=os.path.getsize(path), seconds=seconds, restarts=restarts)
+    logger.info(
+        "Backup %s finished in %.1fs: %d pages, %d bytes, integrity ok%s",
+        path,
+        seconds,
+        page_count,
+        result.size,
+        f", {restarts} restart(s)" if restarts else "",
+    )
+    rotate(backup_dir, db_path, keep)
+    return result
+
+
+def rotate(backup_dir: str = BACKUP_DIR, db_path: str = DB_PATH, keep: int = BACKUP_KEEP) -> List[str]:
+    """Delete all but the newest `keep` backups; returns the deleted paths."""
+    backups = list_backups(backup_dir, db_path)
+    old = backups[:-keep] if keep > 0 else []
+    for path in old:
+        _remove(path)
+        logger.info("Removed old backup %s", path)
+    return old
+
+
+def restore(backup_path: str, db_path: str = DB_PATH) -> None:
+    """Replace the contents of db_path with a backup.
+
+    The backup is verified first, and the restore goes through the backup
+    API too, so db_path is never left half-written. Take a backup of the
+    current database before calling this if it might still be needed.
+    """
+    if not os.path.isfile(backup_path):
+        raise BackupError(f"{backup_path} does not exist")
+    check_integrity(backup_path)
+    logger.info("Restoring %s from %s", db_path, backup_path)
+    start = time.perf_counter()
+    source = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
+    target = sqlite3.connect(db_path)
+    try:
+        source.backup(target)
+    except sqlite3.Error as e:
+        raise BackupError(f"restore of {db_path} failed: {e}") from e
+    finally:
+        source.close()
+        target.close()
+    check_integrity(db_path)
+    logger.info("Restored %s from %s in %.1fs", db_path, backup_path, time.perf_counter() - start)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class BackupScheduler:
+    def __init__(self, interval_hours: float = BACKUP_INTERVAL_HOURS, backup_dir: str = BACKUP_DIR, db_path: str = DB_PATH):
+        self.interval = interval_hours * 3600
+        self.backup_dir = backup_dir
+        self.db_path = db_path
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_result: Optional[BackupResult] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+        self._thread.start()
+        logger.info("Backups every %.1fh to %s", self.interval / 3600, self.backup_dir)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _seconds_until_due(self) -> float:
+        backups = list_backups(self.backup_dir, self.db_path)
+        if not backups:
+            return 0.0
+        return os.path.getmtime(backups[-1]) + self.interval - time.time()
+
+    def _run(self) -> None:
+        while not self._stop.wait(max(self._seconds_until_due(), 0.0)):
+            try:
+                if self.run_if_due() is None:
+                    # another worker is taking it; look again shortly
+                    self._stop.wait(60)
+            except Exception:
+                logger.exception("Scheduled backup failed; retrying in an hour")
+                self._stop.wait(min(self.interval, 3600))
+
+    def run_if_due(self) -> Optional[BackupResult]:
+        """Back up unless another process just did (or is doing it)."""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        fd = os.open(os.path.join(self.backup_dir, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            # checked again under the lock: another worker may have finished one meanwhile
+            if self._seconds_until_due() > 0:
+                return None
+            self.last_result = backup(self.backup_dir, self.db_path)
+            return self.last_result
+        finally:
+            os.close(fd)
+
+
+scheduler = BackupScheduler()
@@ -0,0 +1,68 @@
+from typing import List
+
+# Detailed Form 1728 Section 1 activities grouped as in prompts.txt
+FAITH_ACTIVITIES: List[str] = [
+    "Refund Support Vocations Program",
+    "Church Facilities",
+    "Catholic Schools/Seminaries",
+    "Religious/Vocations Education",
+    "Prayer & Study Programs",
+    "Sacramental Gifts",
+    "Miscellaneous Faith Activities",
+]
+
+FAMILY_ACTIVITIES: List[str] = [
+    "Food for Families",
+    "Family Formation Programs",
+    "Keep Christ in Christmas",
+    "Family Week",
+    "Family Prayer Night",
+    "Miscellaneous Family Programs",
+]
+
+COMMUNITY_ACTIVITIES: List[str] = [
+    "Coats For Kids",
+    "Global Wheelchair Mission",
+    "Habitat for Humanity",
+    "Disaster Preparedness/Relief",
+    "Physically Disabled/Intellectual Disabilities",
+    "Elderly/Widow(er) Care",
+    "Hospitals/Health Organizations",
+    "Columbian Squires",
+    "Scouting/Youth Groups",
+    "Athletics",
+    "Youth Welfare/Service",
+    "Scholarships/Education",
+    "Veteran Military/VAVS",
+    "Miscellaneous Community/Youth Activities",
+]
+
+LIFE_ACTIVITIES: List[str] = [
+    "Special Olympics",
+    "Marches for Life",
+    "Ultrasound Initiative",
+    "Pregnancy Center Support",
+    "Christian Refugee Relief",
+    "Memorials to Unborn Children",
+    "Miscellaneous Life Activities",
+]
+
+OTHER_QUANTITATIVE: List[str] = [
+    "Visits to the Sick",
+    "Visits to the Bereaved",
+    "Number of Blood Donations",
+    "Masses Held for Members",
+    "Hours of Fraternal Service to Sick/Disabled Members and their Families",
+]
+
+# Items which are quantities (counts) and should NOT be counted as volunteer hours
+QUANTITY_EXCLUDE_HOURS: List[str] = [
+    "Visits to the Sick",
+    "Visits to the Bereaved",
+    "Number of Blood Donations",
+    "Masses Held for Members",
+]
+
+# For simplicity we still store all metrics in the Activity table, using
+# category as the exact label from above. For OTHER_QUANTITATIVE rows we
+# store the quantity in Activity.hours and leave amount at 0.
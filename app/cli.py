@@ -0,0 +1,138 @@
+"""Maintenance commands.
+
+Run from the project root, e.g.:
+
+    python -m app.cli rollups verify
+    python -m app.cli rollups rebuild
+    python -m app.cli export-mail --format zip --members all -o notifications.zip
+    python -m app.cli backup
+    python -m app.cli restore backups/data-20250101-030000.sqlite3
+"""
+import argparse
+import sys
+
+from .db import SessionLocal, engine, Base
+from .migrations import run_migrations
+from . import rollups
+from . import mail_merge
+from . import email_template
+from . import backup
+from . import member_cache
+
+
+def cmd_rollups(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        if args.action == "rebuild":
+            rollups.rebuild(db)
+            db.commit()
+            print("Rollup tables rebuilt.")
+            return 0
+
+        problems = rollups.verify(db)
+        if not problems:
+            print("Rollup tables match activities.")
+            return 0
+        for p in problems:
+            print(p)
+        print(f"{len(problems)} difference(s) found; run `python -m app.cli rollups rebuild` to fix.")
+        return 1
+    finally:
+        db.close()
+
+
+def cmd_export_mail(args: argparse.Namespace) -> int:
+    try:
+        email_template.load()
+    except FileNotFoundError:
+        print(f"Email template not found: {email_template.template_path()}")
+        return 1
+    output = args.output or mail_merge.filename(args.format, args.members)
+    db = SessionLocal()
+    try:
+        written = 0
+        with open(output, "wb") as out:
+            for chunk in mail_merge.export(db, args.format, args.members):
+                out.write(chunk)
+                written += len(chunk)
+        print(f"Wrote {written} bytes to {output}")
+        return 0
+    finally:
+        db.close()
+
+
+def cmd_backup(args: argparse.Namespace) -> int:
+    if args.list:
+        for path in backup.list_backups(args.dir):
+            print(path)
+        return 0
+    try:
+        result = backup.backup(args.dir, keep=args.keep)
+    except backup.BackupError as e:
+        print(e)
+        return 1
+    print(f"Backed up to {result.path} ({result.size} bytes, {result.seconds:.1f}s)")
+    return 0
+
+
+def cmd_restore(args: argparse.Namespace) -> int:
+    if not args.yes:
+        answer = input(f"Replace {backup.DB_PATH} with {args.file}? Stop the app first. [y/N] ")
+        if answer.strip().lower() != "y":
+            print("Restore cancelled.")
+            return 1
+    try:
+        if not args.no_backup:
+            # so the restore itself can be undone
+            result = backup.backup(keep=0)
+            print(f"Current database saved to {result.path}")
+        backup.restore(args.file)
+    except backup.BackupError as e:
+        print(e)
+        return 1
+    # an older backup may predate some columns
+    run_migrations(engine)
+    # other processes still running drop their cached members
+    member_cache.clear()
+    print(f"Restored {backup.DB_PATH} from {args.file}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rollups", help="verify or rebuild the member/category rollup tables")
+    p.add_argument("action", choices=["verify", "rebuild"])
+    p.set_defaults(func=cmd_rollups)
+
+    p = sub.add_parser("export-mail", help="write the notification emails to an mbox file or a zip of .eml files")
+    p.add_argument("--format", choices=mail_merge.FORMATS, default="mbox")
+    p.add_argument("--members", choices=mail_merge.SELECTIONS, default="unreported")
+    p.add_argument("-o", "--output", help="output file (default: notifications-<members>-<date>.<ext>)")
+    p.set_defaults(func=cmd_export_mail)
+
+    p = sub.add_parser("backup", help="take a verified online backup of the database now")
+    p.add_argument("--dir", default=backup.BACKUP_DIR, help="backup directory (default: BACKUP_DIR)")
+    p.add_argument("--keep", type=int, default=backup.BACKUP_KEEP, help="backups to keep (default: BACKUP_KEEP)")
+    p.add_argument("--list", action="store_true", help="list existing backups instead, oldest first")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("restore", help="replace the database with a backup (stop the app first)")
+    p.add_argument("file", help="backup file to restore")
+    p.add_argument("--yes", action="store_true", help="don't ask for confirmation")
+    p.add_argument("--no-backup", action="store_true", help="don't back up the current database first")
+    p.set_defaults(func=cmd_restore)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,4 +17,119 @@ SMTP_FROM = os.getenv("SMTP_FROM", "noreply@example.com")
 EMAIL_TEXT = os.getenv('EMAIL_TEXT', 'This is a default email text.')
 EMAIL_SUBJECT = os.getenv('EMAIL_SUBJECT', 'Default Subject')
 #
+# SQLite connection profile, applied to every new connection (app/db.py).
+# DB_PROFILE picks the defaults and each DB_* variable below overrides one
+# pragma:
+#   legacy       rollback journal, synchronous=FULL (sqlite's own defaults)
+#   wal          WAL journal, synchronous=NORMAL: readers don't block the
+#                writer and a commit doesn't fsync; a power cut can lose
+#                the last commits but never corrupts the database
+#   wal-durable  WAL with synchronous=FULL (fsync on every commit)
+DB_PROFILES = {
+    "legacy": {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000, "cache_size": -2000, "mmap_size": 0, "temp_store": "DEFAULT"},
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000, "cache_size": -65536, "mmap_size": 268435456, "temp_store": "MEMORY"},
+    "wal-durable": {"journal_mode": "WAL", "synchronous": "FULL", "busy_timeout": 5000, "cache_size": -65536, "mmap_size": 268435456, "temp_store": "MEMORY"},
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "wal")
+if DB_PROFILE not in DB_PROFILES:
+    raise ValueError(f"DB_PROFILE must be one of {', '.join(DB_PROFILES)}, not {DB_PROFILE!r}")
+_db_profile = DB_PROFILES[DB_PROFILE]
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", _db_profile["journal_mode"]).upper()
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", _db_profile["synchronous"]).upper()
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", str(_db_profile["busy_timeout"])))
+# negative = KiB, positive = pages
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", str(_db_profile["cache_size"])))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(_db_profile["mmap_size"])))
+DB_TEMP_STORE = os.getenv("DB_TEMP_STORE", _db_profile["temp_store"]).upper()
+# connections per engine (sync and async each have their own pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+#
+# Report snapshot (app/report_snapshot.py, off by default). When on, the
+# admin report reads an in-memory copy of the tables it needs, refreshed in
+# the background once it is REPORT_SNAPSHOT_MAX_AGE seconds old and before
+# the report is served once it is REPORT_SNAPSHOT_MAX_STALE seconds old.
+REPORT_SNAPSHOT = os.getenv("REPORT_SNAPSHOT", "false").lower() == "true"
+REPORT_SNAPSHOT_MAX_AGE = float(os.getenv("REPORT_SNAPSHOT_MAX_AGE", "30"))
+REPORT_SNAPSHOT_MAX_STALE = float(os.getenv("REPORT_SNAPSHOT_MAX_STALE", "120"))
+#
+# Online backups (app/backup.py, off by default): set BACKUP_INTERVAL_HOURS
+# (e.g. 24) to turn on the scheduler; every BACKUP_INTERVAL_HOURS a verified
+# copy goes to BACKUP_DIR, copied
+# BACKUP_PAGES_PER_STEP pages at a time with BACKUP_STEP_SLEEP_MS between
+# steps; the newest BACKUP_KEEP are kept.
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "backups"))
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "0"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP_MS = float(os.getenv("BACKUP_STEP_SLEEP_MS", "20"))
+# a copy restarted this often by concurrent writes finishes in one step instead
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "5"))
+#
+# Single database writer (app/db_writer.py, off by default). When on,
+# autosaves are queued to one writer thread per process that commits up to
+# DB_WRITER_MAX_BATCH of them at once, and all writers across processes
+# take turns through an flock on DB_WRITER_LOCK_FILE.
+DB_WRITER = os.getenv("DB_WRITER", "false").lower() == "true"
+DB_WRITER_MAX_BATCH = int(os.getenv("DB_WRITER_MAX_BATCH", "200"))
+DB_WRITER_LOCK_FILE = os.getenv("DB_WRITER_LOCK_FILE", f"{DB_PATH}.write-lock")
+#
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+#
+# Write-behind autosave buffer (off by default). When on, autosaves are held
+# in memory and written in one transaction every WRITE_BEHIND_FLUSH_MS or
+# once WRITE_BEHIND_MAX_PENDING entries are waiting.
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "false").lower() == "true"
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "500"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "200"))
+#
+# Member imports are inserted in chunks of this many rows
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Uploaded rosters waiting for confirmation (sync dry-run) are kept here;
+# ones that were never applied are deleted after IMPORT_STAGING_MAX_AGE_HOURS
+IMPORT_STAGING_DIR = os.getenv("IMPORT_STAGING_DIR", os.path.join(tempfile.gettempdir(), "survey1728-imports"))
+IMPORT_STAGING_MAX_AGE_HOURS = float(os.getenv("IMPORT_STAGING_MAX_AGE_HOURS", "24"))
+# A running import job that hasn't reported progress for this long is picked up again
+# (the worker running it heartbeats every quarter of this while it is alive)
+IMPORT_JOB_STALE_SECONDS = int(os.getenv("IMPORT_JOB_STALE_SECONDS", "60"))
+#
+# Outgoing mail reuses up to SMTP_POOL_SIZE logged-in connections. Idle ones
+# are closed after SMTP_POOL_IDLE_SECONDS and checked with NOOP after
+# SMTP_POOL_HEALTHCHECK_SECONDS.
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_POOL_IDLE_SECONDS = float(os.getenv("SMTP_POOL_IDLE_SECONDS", "60"))
+SMTP_POOL_HEALTHCHECK_SECONDS = float(os.getenv("SMTP_POOL_HEALTHCHECK_SECONDS", "15"))
+#
+# Email outbox (app/outbox.py): OUTBOX_CONCURRENCY sends in flight, at most
+# OUTBOX_RATE_PER_MINUTE messages a minute (set to the SMTP provider's
+# limit), failed sends retried with exponential backoff from
+# OUTBOX_RETRY_BASE_SECONDS up to OUTBOX_RETRY_MAX_SECONDS, and given up
+# after OUTBOX_MAX_ATTEMPTS. A message stuck "sending" for
+# OUTBOX_SEND_TIMEOUT_SECONDS (worker died mid-send) is sent again. With
+# several worker processes only the one holding an flock on OUTBOX_LOCK_FILE
+# sends, so the rate limit holds for the whole app.
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+OUTBOX_RATE_PER_MINUTE = int(os.getenv("OUTBOX_RATE_PER_MINUTE", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+OUTBOX_SEND_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_SEND_TIMEOUT_SECONDS", "300"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_LOCK_FILE = os.getenv("OUTBOX_LOCK_FILE", f"{DB_PATH}.outbox-lock")
+#
+# Signed-in member cache (app/member_cache.py)
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "1024"))
+MEMBER_CACHE_TTL_SECONDS = float(os.getenv("MEMBER_CACHE_TTL_SECONDS", "60"))
+#
+# Shared-memory generation counters used to invalidate caches across worker processes
+GENERATION_FILE = os.getenv("GENERATION_FILE", f"{DB_PATH}.generations")
+#
+# Event-loop monitor (app/loop_monitor.py): a heartbeat every
+# LOOP_MONITOR_INTERVAL_MS; a stall of LOOP_LAG_THRESHOLD_MS or more is
+# logged with the blocking request and a stack sample, and the last
+# LOOP_MONITOR_KEEP stalls are shown at /admin/loop-stats.
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+LOOP_MONITOR_KEEP = int(os.getenv("LOOP_MONITOR_KEEP", "50"))
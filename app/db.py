@@ -1,22 +1,86 @@
+from typing import Dict
+
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from .config import DB_PATH
+from .config import (
+    DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE,
+    DB_JOURNAL_MODE,
+    DB_MAX_OVERFLOW,
+    DB_MMAP_SIZE,
+    DB_PATH,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_SYNCHRONOUS,
+    DB_TEMP_STORE,
+)
 
 DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+
+# Connection profile (DB_PROFILE in app/config.py), set on every new connection
+PRAGMAS = {
+    # first, so switching the journal mode waits for other connections
+    "busy_timeout": DB_BUSY_TIMEOUT_MS,
+    "journal_mode": DB_JOURNAL_MODE,
+    "synchronous": DB_SYNCHRONOUS,
+    "cache_size": DB_CACHE_SIZE,
+    "mmap_size": DB_MMAP_SIZE,
+    "temp_store": DB_TEMP_STORE,
+}
+
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def apply_pragmas(dbapi_connection, pragmas: Dict[str, object] = PRAGMAS) -> None:
+    """Enable foreign keys and apply a connection profile to a raw sqlite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA foreign_keys=ON")
+        for name, value in pragmas.items():
+            # values come from the environment; only known keywords or integers reach the SQL
+            if name in _PRAGMA_CHOICES:
+                value = str(value).upper()
+                if value not in _PRAGMA_CHOICES[name]:
+                    raise ValueError(f"unsupported {name} {value!r}")
+            else:
+                value = int(value)
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
 
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Enable foreign key constraints for SQLite
+# aiosqlite runs each connection on its own thread, so queries made through
+# an AsyncSession wait on the event loop instead of blocking it. Sync helpers
+# (rollups, activity_store...) can still be used via AsyncSession.run_sync.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Enable foreign key constraints and the connection profile for SQLite
 @event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
+    apply_pragmas(dbapi_connection)
 
 
 def get_db():
@@ -26,3 +90,8 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Async counterpart of get_db for `async def` routes."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,200 @@
+"""Single writer for SQLite (DB_WRITER=true).
+
+SQLite allows one writer at a time. When every request thread (and every
+worker process) writes for itself, they collide on the database lock and
+back off in sqlite's busy handler, and throughput drops as workers are
+added. With the writer on:
+
+- request handlers hand their write to a queue and wait on a future
+  (`await run(fn, ...)` from async routes, `call(fn, ...)` from threads);
+- one thread per process takes everything queued, runs each job in its own
+  SAVEPOINT (a failing job only rolls back itself) and commits the batch
+  once;
+- each batch, and the background writers (imports, access codes,
+  write-behind flushes, the outbox), hold exclusive(): a thread lock plus
+  an flock on DB_WRITER_LOCK_FILE, so worker processes take turns in the
+  kernel instead of polling the database lock.
+
+Reads don't go through here and stay fully concurrent (WAL profile).
+Occasional admin edits still commit directly and rely on busy_timeout.
+Jobs are called as fn(db, *args, **kwargs) with the writer's Session and
+must not commit.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Iterator, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; writes are then only serialised within the process
+    fcntl = None
+
+from sqlalchemy.orm import Session
+
+from .config import DB_WRITER, DB_WRITER_LOCK_FILE, DB_WRITER_MAX_BATCH
+from .db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _WriteLock:
+    """Re-entrant within a thread, exclusive across threads and processes."""
+
+    def __init__(self, path: str = DB_WRITER_LOCK_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._fd = None
+
+    @contextlib.contextmanager
+    def hold(self) -> Iterator[None]:
+        with self._lock:
+            depth = getattr(self._local, "depth", 0)
+            if depth == 0 and fcntl is not None:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+                if depth == 0 and fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+_write_lock = _WriteLock()
+
+
+def exclusive():
+    """Hold the database write lock for a block of writes (no-op unless DB_WRITER is on).
+
+    Take it before the first write of a transaction and keep it until the
+    commit.
+    """
+    if not DB_WRITER:
+        return contextlib.nullcontext()
+    return _write_lock.hold()
+
+
+class DatabaseWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_batch: int = DB_WRITER_MAX_BATCH,
+        write_lock: _WriteLock = _write_lock,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max(max_batch, 1)
+        self.write_lock = write_lock
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self.batches = 0
+        self.jobs = 0
+        self.failed_jobs = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        logger.info("Database writer started (batches of up to %s writes)", self.max_batch)
+
+    def stop(self) -> None:
+        """Finish everything already queued, then stop."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            batch = [job]
+            stopping = False
+            # group commit: everything that queued up while the last batch was written
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Database writer batch of %s failed", len(batch))
+            if stopping:
+                return
+
+    def _write(self, batch: List[Tuple]) -> None:
+        batch = [job for job in batch if job[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        db = self.session_factory()
+        try:
+            with self.write_lock.hold():
+                # an explicit BEGIN so the savepoints nest inside one transaction
+                # (pysqlite would otherwise let the first RELEASE commit)
+                db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                for fn, args, kwargs, future in batch:
+                    try:
+                        with db.begin_nested():
+                            outcomes.append((future, fn(db, *args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            raise
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.jobs += len(batch)
+        for future, result, error in outcomes:
+            if error is not None:
+                self.failed_jobs += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+writer = DatabaseWriter()
+
+
+def enabled() -> bool:
+    return DB_WRITER and writer.running
+
+
+def call(fn: Callable, *args, **kwargs):
+    """Run a write on the writer thread and wait for its result (from a worker thread)."""
+    return writer.submit(fn, *args, **kwargs).result()
+
+
+async def run(fn: Callable, *args, **kwargs):
+    """Run a write on the writer thread without blocking the event loop."""
+    return await asyncio.wrap_future(writer.submit(fn, *args, **kwargs))
@@ -1,45 +1,205 @@
 import os
 import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
 from dotenv import load_dotenv
 import yagmail
 
+from .config import SMTP_POOL_SIZE, SMTP_POOL_IDLE_SECONDS, SMTP_POOL_HEALTHCHECK_SECONDS
+
 load_dotenv()
 
 # router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Errors after which a connection is thrown away and the send retried once on a fresh one
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPConnectionPool:
+    """Logged-in SMTP connections shared between sends.
+
+    yagmail.SMTP.send() connects and logs in again on every call, so the
+    pool drives yagmail's pieces itself: login() once per connection,
+    prepare_send() to build the message and sendmail() over the open socket.
+
+    A connection idle for more than `idle_timeout` seconds is closed rather
+    than reused (servers drop idle clients), one idle for more than
+    `health_check_after` seconds gets a NOOP before reuse, and one that
+    raised during a send is discarded. At most `size` connections are open.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], yagmail.SMTP],
+        size: int = SMTP_POOL_SIZE,
+        idle_timeout: float = SMTP_POOL_IDLE_SECONDS,
+        health_check_after: float = SMTP_POOL_HEALTHCHECK_SECONDS,
+    ):
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        # (connection, last used), most recently used last
+        self._idle: List[Tuple[yagmail.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except Exception:
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._checkin(conn)
+            self._slots.release()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _checkout(self) -> yagmail.SMTP:
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                return self._connect()
+            conn, last_used = item
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                self._discard(conn)
+                continue
+            if idle_for > self.health_check_after and not self._healthy(conn):
+                self._discard(conn)
+                continue
+            self.reused += 1
+            return conn
+
+    def _checkin(self, conn: yagmail.SMTP) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._idle.append((conn, now))
+            expired = [c for c, used in self._idle if now - used > self.idle_timeout]
+            self._idle = [(c, used) for c, used in self._idle if now - used <= self.idle_timeout]
+        for c in expired:
+            self._discard(c)
+
+    def _connect(self) -> yagmail.SMTP:
+        conn = self.factory()
+        conn.login()
+        self.created += 1
+        return conn
+
+    @staticmethod
+    def _healthy(conn: yagmail.SMTP) -> bool:
+        try:
+            return conn.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _discard(self, conn: yagmail.SMTP) -> None:
+        self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools: Dict[tuple, SMTPConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _shared_pool(key: tuple, factory: Callable[[], yagmail.SMTP]) -> SMTPConnectionPool:
+    # EMailSender is created per request; the pool lives as long as the process
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPConnectionPool(factory)
+        return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
 class EMailSender:
 
-    def __init__(self):
-        self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-        self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        self.smtp_user = os.getenv("SMTP_USER")
-        self.smtp_pass = os.getenv("SMTP_PASS")
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        smtp_skip_login: bool = False,
+        pool: Optional[SMTPConnectionPool] = None,
+    ):
+        host = host or os.getenv("SMTP_HOST")
+        if host:
+            self.smtp_host = host
+            self.smtp_port = int(port or os.getenv("SMTP_PORT") or "587")
+        else:
+            # no SMTP_HOST: yagmail's own default, as before SMTP_HOST/SMTP_PORT were honoured
+            self.smtp_host = "smtp.gmail.com"
+            self.smtp_port = int(port or 465)
+        self.smtp_user = user if user is not None else os.getenv("SMTP_USER")
+        self.smtp_pass = password if password is not None else os.getenv("SMTP_PASS")
+        self.smtp_skip_login = smtp_skip_login
         self.default_from = os.getenv("SMTP_FROM", self.smtp_user)
         self.email_subject = os.getenv('EMAIL_SUBJECT', 'Default Subject')
+        self.pool = pool or _shared_pool(
+            (self.smtp_host, self.smtp_port, self.smtp_user, self.smtp_skip_login), self._new_connection
+        )
 
-    def __del__(self):
-        self.smtp_host = None
-        self.smtp_port = None
-        self.smtp_user = None
-        self.smtp_pass = None
-        self.default_from = None
-        self.email_subject = None
+    def _new_connection(self) -> yagmail.SMTP:
+        # 465 is implicit TLS; other ports upgrade with STARTTLS, except an unauthenticated local relay
+        ssl = self.smtp_port == 465
+        return yagmail.SMTP(
+            user=self.smtp_user,
+            password=self.smtp_pass,
+            host=self.smtp_host,
+            port=self.smtp_port,
+            smtp_ssl=ssl,
+            smtp_starttls=False if (ssl or self.smtp_skip_login) else True,
+            smtp_skip_login=self.smtp_skip_login,
+        )
 
     def send_email(self,to_address: str, subject: str = None, body: str = '', html: bool = False):
-        try:
-            user = self.smtp_user
-            password = self.smtp_pass
-
-            yag = yagmail.SMTP(user=user, password=password)
-            contents = body if not html else yagmail.inline(body)
-            if subject is None:
-                subject = self.email_subject
-            yag.send(to=to_address, subject=subject, contents=contents)
-            yag.close()
-            logger.exception("send to: %s", to_address)
-
-        except Exception as exc:
-            logger.exception("async send failed: %s", exc)
-            raise
-
+        contents = body if not html else yagmail.inline(body)
+        if subject is None:
+            subject = self.email_subject
+        for attempt in (1, 2):
+            try:
+                with self.pool.connection() as yag:
+                    recipients, message = yag.prepare_send(to=to_address, subject=subject, contents=contents)
+                    yag.smtp.sendmail(yag.user, recipients, message)
+                logger.info("send to: %s", to_address)
+                return
+            except RECONNECT_ERRORS as exc:
+                if attempt == 1:
+                    logger.warning("SMTP connection lost (%s); retrying on a new connection", exc)
+                    continue
+                logger.exception("async send failed: %s", exc)
+                raise
+            except Exception as exc:
+                logger.exception("async send failed: %s", exc)
+                raise
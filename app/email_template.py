@@ -0,0 +1,117 @@
+"""Notification email template: parsed once, cached on the file's mtime.
+
+The template (the file named by EMAIL_TEXT) is split into literal text and
+placeholder segments, so rendering a message is a single join instead of a
+chain of str.replace calls over the whole text. The compiled template is
+kept until the file's mtime/size changes or invalidate() is called (the
+template editor does that on save); invalidate() bumps the shared
+"email_template" generation so other worker processes reload too, even
+within the filesystem's timestamp resolution.
+
+Placeholders: {name}, {first_name}, {last_name}, {url}, {access_code},
+{member_number}, {council_title}. Any other {word} is left as written.
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from .config import COUNCIL_TITLE, EMAIL_TEXT
+from .generations import Generation
+
+PLACEHOLDERS = ("name", "first_name", "last_name", "url", "access_code", "member_number", "council_title")
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    # literals[i] comes before fields[i]; there is always one more literal than fields
+    literals: Tuple[str, ...]
+    fields: Tuple[str, ...]
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values.get(field, ""))
+            parts.append(literal)
+        return "".join(parts)
+
+    def render_many(self, rows: Iterable[Dict[str, str]]) -> Iterator[str]:
+        render = self.render
+        for values in rows:
+            yield render(values)
+
+
+def compile_template(text: str) -> CompiledTemplate:
+    literals = []
+    fields = []
+    pos = 0
+    for match in _PLACEHOLDER_RE.finditer(text):
+        if match.group(1) not in PLACEHOLDERS:
+            continue
+        literals.append(text[pos:match.start()])
+        fields.append(match.group(1))
+        pos = match.end()
+    literals.append(text[pos:])
+    return CompiledTemplate(tuple(literals), tuple(fields))
+
+
+def template_path() -> str:
+    """Absolute path of the template named by EMAIL_TEXT (~ and $VARS expanded)."""
+    path = os.getenv("EMAIL_TEXT", EMAIL_TEXT)
+    path = os.path.expanduser(os.path.expandvars(path))
+    return os.path.abspath(path)
+
+
+# path -> ((mtime_ns, size, generation), compiled)
+_cache: Dict[str, Tuple[Tuple[int, int, int], CompiledTemplate]] = {}
+_lock = threading.Lock()
+_generation = Generation("email_template")
+
+
+def load(path: Optional[str] = None) -> CompiledTemplate:
+    """Return the compiled template, re-reading the file only if it changed.
+
+    Raises FileNotFoundError if the template doesn't exist.
+    """
+    path = path or template_path()
+    generation = _generation.current()
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size, generation)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        compiled = compile_template(f.read())
+    with _lock:
+        _cache[path] = (key, compiled)
+    return compiled
+
+
+def invalidate(path: Optional[str] = None) -> None:
+    with _lock:
+        _cache.pop(path or template_path(), None)
+    _generation.bump()
+
+
+def base_values() -> Dict[str, str]:
+    """Values shared by every message in a send."""
+    return {"url": os.getenv("URL", "http://localhost:8000"), "council_title": COUNCIL_TITLE}
+
+
+def member_values(member, access_code: Optional[str] = None, base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Placeholder values for one member; `base` comes from base_values() when rendering many."""
+    first_name = member.first_name or ""
+    last_name = member.last_name or ""
+    values = dict(base if base is not None else base_values())
+    values.update(
+        name=f"{first_name} {last_name}".strip(),
+        first_name=first_name,
+        last_name=last_name,
+        member_number=str(member.member_number or ""),
+        access_code=access_code if access_code is not None else (member.access_code or ""),
+    )
+    return values
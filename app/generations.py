@@ -0,0 +1,118 @@
+"""Cross-process generation counters for cache invalidation.
+
+Several workers share one data.sqlite3, so an in-process cache goes stale
+as soon as another worker writes. Each cache subscribes to a named slot
+in a small memory-mapped file (GENERATION_FILE, next to the database):
+a writer bumps the slot after committing, and a reader compares the slot
+with the value it last saw - one 8-byte read from shared memory, no
+system call and no query. When the value moved, the reader drops what it
+cached.
+
+Bumps take an flock so concurrent increments from different processes
+are never lost. Reads take no lock; a torn read can only show a value
+that differs from the last one seen, which costs one unnecessary refresh.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; bumps are then only serialised within the process
+    fcntl = None
+
+from .config import GENERATION_FILE
+
+logger = logging.getLogger(__name__)
+
+# slot name -> index; append new slots at the end, never reorder
+SLOTS: Dict[str, int] = {
+    "members": 0,
+    "email_template": 1,
+}
+_SLOT_SIZE = 8
+_FILE_SIZE = 4096  # room for 512 slots
+
+
+class GenerationCounter:
+    def __init__(self, path: str = GENERATION_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+
+    def _map(self) -> mmap.mmap:
+        # (re)open after fork: flock belongs to the open file, which a forked child would share
+        if self._pid == os.getpid():
+            return self._mm
+        with self._lock:
+            if self._pid != os.getpid():
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if os.fstat(fd).st_size < _FILE_SIZE:
+                    # zero-filled; safe if several processes race to do it
+                    os.ftruncate(fd, _FILE_SIZE)
+                self._fd = fd
+                self._mm = mmap.mmap(fd, _FILE_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+                self._pid = os.getpid()
+        return self._mm
+
+    def current(self, name: str) -> int:
+        return struct.unpack_from("<Q", self._map(), SLOTS[name] * _SLOT_SIZE)[0]
+
+    def bump(self, name: str) -> int:
+        """Increment a slot for every process and return the new value."""
+        mm = self._map()
+        offset = SLOTS[name] * _SLOT_SIZE
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                value = struct.unpack_from("<Q", mm, offset)[0] + 1
+                struct.pack_into("<Q", mm, offset, value)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+
+counter = GenerationCounter()
+
+
+# returned when the counter file can't be used; never equal to a real generation worth caching under
+UNAVAILABLE = -1
+
+
+class Generation:
+    """One named slot, as used by a cache.
+
+    A cache notes current() when it reads from the database and throws its
+    entries away when current() no longer matches; writers call bump() after
+    committing.
+    """
+
+    def __init__(self, name: str, generations: GenerationCounter = None):
+        if name not in SLOTS:
+            raise KeyError(f"unknown generation slot {name!r}")
+        self.name = name
+        self.generations = generations or counter
+        self._warned = False
+
+    def current(self) -> int:
+        try:
+            return self.generations.current(self.name)
+        except OSError:
+            # no usable counter file (read-only directory...): callers must not cache
+            if not self._warned:
+                logger.exception("Generation counter %s unavailable; caching disabled", self.generations.path)
+                self._warned = True
+            return UNAVAILABLE
+
+    def bump(self) -> None:
+        try:
+            self.generations.bump(self.name)
+        except OSError:
+            logger.exception("Could not bump generation counter %s", self.generations.path)
@@ -0,0 +1,468 @@
+"""Roster imports as background jobs.
+
+The upload is staged to IMPORT_STAGING_DIR and an `import_jobs` row is
+created; a worker thread then runs the import with a commit per
+IMPORT_CHUNK_SIZE rows, recording progress on the job row in the same
+transaction. If the process stops mid-import the job is left "queued"
+(or, after a crash, goes stale after IMPORT_JOB_STALE_SECONDS) and the
+next worker to pick it up resumes after the last committed row.
+
+A replace import empties the members table in its own commit before
+loading, so one that fails part-way leaves a partial roster. The job's
+message says so, and the admin can retry it (POST /import/jobs/{id}/retry),
+which resumes after the last committed row while the staged upload is
+still there.
+
+Each claim gets a token (claimed_by). While a job runs, a keep-alive
+thread refreshes updated_at every quarter of IMPORT_JOB_STALE_SECONDS, so
+slow phases (counting a large .xlsx, the single sync transaction, access
+codes) don't make the job look stale; and every commit of the job first
+checks, inside its transaction, that the claim is still ours. A worker
+that lost its job to another one stops without writing anything more.
+
+Staged uploads that never became a job (sync dry-runs that were not
+applied) are deleted after IMPORT_STAGING_MAX_AGE_HOURS.
+
+The import page polls GET /import/jobs/{id} for progress.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from . import db_writer
+from . import member_cache
+from . import member_import
+from .config import IMPORT_CHUNK_SIZE, IMPORT_JOB_STALE_SECONDS, IMPORT_STAGING_MAX_AGE_HOURS
+from .db import SessionLocal
+from .models import ImportJob, Member
+
+logger = logging.getLogger(__name__)
+
+# Only the first errors are kept on the job row; error_count has the total
+MAX_STORED_ERRORS = 100
+
+
+class JobInterrupted(Exception):
+    """The worker is shutting down; the job will be resumed later."""
+
+
+class ClaimLost(Exception):
+    """Another worker claimed the job (it looked stale); this one must stop."""
+
+
+def create_job(db: Session, token: str, filename: str, extension: str, mode: str) -> ImportJob:
+    """Queue a staged upload (see member_import.stage_upload) for import."""
+    job = ImportJob(id=token, filename=filename, extension=extension, mode=mode, status="queued")
+    db.add(job)
+    db.commit()
+    worker.wake()
+    return job
+
+
+def active_job(db: Session) -> Optional[ImportJob]:
+    """The oldest job that is still queued or running, if any."""
+    return (
+        db.query(ImportJob)
+        .filter(ImportJob.status.in_(["queued", "running"]))
+        .order_by(ImportJob.created_at)
+        .first()
+    )
+
+
+def latest_partial_replace(db: Session) -> Optional[ImportJob]:
+    """The newest job, if it is a replace that failed after emptying the members table."""
+    job = db.query(ImportJob).order_by(ImportJob.created_at.desc()).first()
+    if job is not None and job.status == "failed" and job.mode == "replace" and job.truncated:
+        return job
+    return None
+
+
+def can_retry(job: ImportJob) -> bool:
+    return job.status == "failed" and member_import.find_staged(job.id) is not None
+
+
+def retry_job(db: Session, job_id: str) -> Optional[ImportJob]:
+    """Queue a failed job again; it resumes after the last committed row.
+
+    Returns None if the job isn't failed or its staged upload is gone.
+    """
+    job = db.get(ImportJob, job_id)
+    if job is None or not can_retry(job):
+        return None
+    job.status = "queued"
+    job.message = None
+    job.finished_at = None
+    db.commit()
+    worker.wake()
+    return job
+
+
+def job_status(job: ImportJob) -> Dict:
+    """JSON-friendly progress for the polling endpoint."""
+    now = datetime.utcnow()
+    elapsed = (now - job.started_at).total_seconds() if job.started_at else 0.0
+    if job.finished_at and job.started_at:
+        elapsed = (job.finished_at - job.started_at).total_seconds()
+    rate = job.rows_processed / elapsed if elapsed > 0 else 0.0
+    eta = None
+    if job.status == "running" and job.total_rows and rate > 0:
+        eta = max(job.total_rows - job.rows_processed, 0) / rate
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "mode": job.mode,
+        "status": job.status,
+        "phase": job.phase,
+        "total_rows": job.total_rows,
+        "rows_processed": job.rows_processed,
+        "imported": job.imported,
+        "skipped": job.skipped,
+        "error_count": job.error_count,
+        "errors": json.loads(job.errors or "[]"),
+        "message": job.message,
+        # a replace that stopped part-way leaves only the members loaded so far
+        "partial": job.mode == "replace" and bool(job.truncated) and job.status != "done",
+        "can_retry": can_retry(job),
+        "rows_per_sec": round(rate, 1),
+        "eta_seconds": round(eta, 1) if eta is not None else None,
+    }
+
+
+class ImportWorker:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        poll_seconds: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # claim token of the job being run (jobs run one at a time on the worker thread)
+        self._token = None
+        self._cleaned_at = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="import-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set() and self.run_next():
+                    pass
+                self._clean_staging()
+            except Exception:
+                logger.exception("Import worker loop failed")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _clean_staging(self) -> None:
+        # hourly is plenty for files that are kept for a day
+        if time.monotonic() - self._cleaned_at < 3600:
+            return
+        self._cleaned_at = time.monotonic()
+        db = self.session_factory()
+        try:
+            # queued jobs still need their file; failed ones go once they are old too
+            keep = [job_id for (job_id,) in db.query(ImportJob.id).filter(ImportJob.status.in_(["queued", "running"]))]
+        finally:
+            db.close()
+        for path in member_import.remove_stale_staged(IMPORT_STAGING_MAX_AGE_HOURS * 3600, keep):
+            logger.info("Removed stale staged import %s", path)
+
+    # -- claiming -------------------------------------------------------
+
+    @staticmethod
+    def _claimable(now: datetime):
+        cutoff = now - timedelta(seconds=IMPORT_JOB_STALE_SECONDS)
+        return or_(
+            ImportJob.status == "queued",
+            and_(ImportJob.status == "running", or_(ImportJob.updated_at == None, ImportJob.updated_at < cutoff)),
+        )
+
+    def _claim(self, db: Session) -> Optional[Tuple[str, str]]:
+        """Take the oldest claimable job; returns (job id, claim token)."""
+        now = datetime.utcnow()
+        candidates = db.query(ImportJob.id).filter(self._claimable(now)).order_by(ImportJob.created_at).all()
+        for (job_id,) in candidates:
+            token = uuid.uuid4().hex
+            # conditional UPDATE so two workers can't take the same job
+            claimed = (
+                db.query(ImportJob)
+                .filter(ImportJob.id == job_id, self._claimable(now))
+                .update(
+                    {
+                        "status": "running",
+                        "claimed_by": token,
+                        "updated_at": now,
+                        "started_at": func.coalesce(ImportJob.started_at, now),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if claimed:
+                return job_id, token
+        return None
+
+    def run_next(self) -> bool:
+        """Claim and run one job. Returns False when there was nothing to do."""
+        db = self.session_factory()
+        try:
+            claimed = self._claim(db)
+            if claimed is None:
+                return False
+            job_id, self._token = claimed
+            done = threading.Event()
+            keep_alive = threading.Thread(
+                target=self._keep_alive, args=(job_id, self._token, done), name="import-keep-alive", daemon=True
+            )
+            keep_alive.start()
+            try:
+                self._run_job(db, job_id)
+            finally:
+                done.set()
+                keep_alive.join()
+                self._token = None
+            return True
+        finally:
+            db.close()
+
+    def _keep_alive(self, job_id: str, token: str, done: threading.Event) -> None:
+        """Refresh updated_at while the job runs, so slow phases don't look stale."""
+        interval = max(IMPORT_JOB_STALE_SECONDS / 4.0, 1.0)
+        while not done.wait(interval):
+            db = self.session_factory()
+            try:
+                with db_writer.exclusive():
+                    db.query(ImportJob).filter(
+                        ImportJob.id == job_id, ImportJob.claimed_by == token, ImportJob.status == "running"
+                    ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+                    db.commit()
+            except Exception:
+                # e.g. locked by a long import transaction; that commit checks the claim itself
+                db.rollback()
+                logger.debug("Import job %s keep-alive failed", job_id, exc_info=True)
+            finally:
+                db.close()
+
+    def _check_claim(self, db: Session, job_id: str) -> None:
+        """Raise ClaimLost unless the job is still ours; call inside the transaction about to commit.
+
+        It is a write, so from here until the commit no other worker can
+        claim the job.
+        """
+        owned = (
+            db.query(ImportJob)
+            .filter(ImportJob.id == job_id, ImportJob.claimed_by == self._token)
+            .update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+        )
+        if not owned:
+            raise ClaimLost()
+
+    # -- running --------------------------------------------------------
+
+    def _run_job(self, db: Session, job_id: str) -> None:
+        job = db.get(ImportJob, job_id)
+        logger.info("Import job %s (%s, %s) started at row %s", job.id, job.filename, job.mode, job.rows_processed)
+        try:
+            found = member_import.find_staged(job.id)
+            if found is None:
+                raise RuntimeError("staged upload is missing")
+            path, _ = found
+
+            if job.total_rows is None:
+                job.phase = "counting"
+                self._heartbeat(db, job)
+                with open(path, "rb") as f:
+                    job.total_rows = member_import.count_rows(f, job.extension)
+                self._heartbeat(db, job)
+
+            if job.mode == "sync":
+                self._run_sync(db, job, path)
+            else:
+                self._run_replace(db, job, path)
+
+            job.phase = "access_codes"
+            self._heartbeat(db, job)
+            # assign_missing_access_codes commits on its own; the keep-alive covers it
+            from .access_code import AccessCode
+            AccessCode(db).assign_missing_access_codes()
+
+            job.status = "done"
+            job.phase = None
+            job.finished_at = datetime.utcnow()
+            self._heartbeat(db, job)
+            member_cache.clear()
+            os.remove(path)
+            logger.info("Import job %s finished: %s imported, %s errors", job.id, job.imported, job.error_count)
+        except ClaimLost:
+            db.rollback()
+            logger.warning(
+                "Import job %s was taken over by another worker (no progress for %ss); stopping here",
+                job_id,
+                IMPORT_JOB_STALE_SECONDS,
+            )
+        except JobInterrupted:
+            db.rollback()
+            job = db.get(ImportJob, job_id)
+            job.status = "queued"
+            self._heartbeat(db, job)
+            logger.info("Import job %s paused at row %s; it will resume on restart", job.id, job.rows_processed)
+        except Exception as e:
+            logger.exception("Import job %s failed", job_id)
+            db.rollback()
+            job = db.get(ImportJob, job_id)
+            job.status = "failed"
+            job.message = str(e)
+            if job.mode == "replace" and job.truncated:
+                # the truncate and the chunks loaded so far are committed; say so plainly
+                job.message = (
+                    f"{e}. The member list was emptied when this import started and now holds only "
+                    f"the {job.imported} members loaded before the failure. Retry the import to "
+                    f"continue after row {job.rows_processed}, or upload the roster again."
+                )
+            job.finished_at = datetime.utcnow()
+            try:
+                self._heartbeat(db, job)
+            except ClaimLost:
+                db.rollback()
+                logger.warning("Import job %s failed after another worker took it over", job_id)
+
+    def _heartbeat(self, db: Session, job: ImportJob) -> None:
+        """Commit the job row, and whatever else is in the transaction, if the job is still ours."""
+        job.updated_at = datetime.utcnow()
+        with db_writer.exclusive():
+            self._check_claim(db, job.id)
+            db.commit()
+
+    def _open(self, path: str, job: ImportJob):
+        f = open(path, "rb")
+        fieldnames, rows = member_import.open_roster(f, job.extension)
+        missing_cols = member_import.missing_columns(fieldnames)
+        if missing_cols:
+            f.close()
+            raise ValueError(f"Missing required columns in file: {', '.join(missing_cols)}")
+        return f, fieldnames, rows
+
+    def _run_replace(self, db: Session, job: ImportJob, path: str) -> None:
+        f, fieldnames, rows = self._open(path, job)
+        try:
+            if not job.truncated:
+                with db_writer.exclusive():
+                    db.query(Member).delete()
+                    job.truncated = True
+                    job.phase = "import"
+                    self._heartbeat(db, job)
+                member_cache.clear()
+
+            errors: List[str] = json.loads(job.errors or "[]")
+            chunk: List[Dict] = []
+            resume_after = job.rows_processed
+            row_no = resume_after
+            for row_no, row in enumerate(rows, start=1):
+                if row_no <= resume_after:
+                    continue
+                try:
+                    mapping = member_import.row_to_mapping(row, fieldnames)
+                except Exception as e:
+                    job.error_count += 1
+                    if len(errors) < MAX_STORED_ERRORS:
+                        errors.append(f"Row {row_no}: {e}")
+                else:
+                    if mapping is None:
+                        job.skipped += 1
+                    else:
+                        chunk.append(mapping)
+                if row_no % self.chunk_size == 0:
+                    self._commit_chunk(db, job, chunk, row_no, errors)
+                    chunk = []
+                    if self._stop.is_set():
+                        raise JobInterrupted()
+            self._commit_chunk(db, job, chunk, row_no, errors)
+        finally:
+            f.close()
+
+    def _commit_chunk(self, db: Session, job: ImportJob, chunk: List[Dict], row_no: int, errors: List[str]) -> None:
+        # rows and progress go in the same transaction so a resume starts exactly after them
+        with db_writer.exclusive():
+            if chunk:
+                db.bulk_insert_mappings(Member, chunk)
+            job.imported += len(chunk)
+            job.rows_processed = row_no
+            job.errors = json.dumps(errors)
+            self._heartbeat(db, job)
+
+    def _run_sync(self, db: Session, job: ImportJob, path: str) -> None:
+        # A sync is a single transaction recomputed from the current table,
+        # so resuming simply means running it again.
+        f, fieldnames, rows = self._open(path, job)
+        try:
+            job.phase = "planning"
+            job.rows_processed = 0
+            self._heartbeat(db, job)
+            plan = member_import.plan_sync(db, self._report_progress(rows, job.id), fieldnames)
+
+            job.phase = "applying"
+            job.imported = len(plan.inserts) + len(plan.updates)
+            job.skipped = plan.result.skipped
+            job.error_count = len(plan.result.errors)
+            job.errors = json.dumps(plan.result.errors[:MAX_STORED_ERRORS])
+            job.message = (
+                f"{len(plan.inserts)} new, {len(plan.updates)} updated, "
+                f"{len(plan.deletes)} removed, {plan.unchanged} unchanged"
+            )
+            job.rows_processed = job.total_rows or job.rows_processed
+            job.updated_at = datetime.utcnow()
+            # apply_sync commits the job counters together with the member changes
+            with db_writer.exclusive():
+                member_import.apply_sync(db, plan, before_commit=lambda s: self._check_claim(s, job.id))
+        finally:
+            f.close()
+
+    def _report_progress(self, rows: Iterable[Dict[str, str]], job_id: str) -> Iterator[Dict[str, str]]:
+        """Pass rows through, saving rows_processed every chunk from a separate session."""
+        for i, row in enumerate(rows, start=1):
+            yield row
+            if i % self.chunk_size == 0:
+                if self._stop.is_set():
+                    raise JobInterrupted()
+                progress = self.session_factory()
+                try:
+                    with db_writer.exclusive():
+                        owned = progress.query(ImportJob).filter(
+                            ImportJob.id == job_id, ImportJob.claimed_by == self._token
+                        ).update({"rows_processed": i, "updated_at": datetime.utcnow()}, synchronize_session=False)
+                        progress.commit()
+                finally:
+                    progress.close()
+                if not owned:
+                    raise ClaimLost()
+
+
+worker = ImportWorker()
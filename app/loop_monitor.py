@@ -0,0 +1,240 @@
+"""Event-loop lag monitor and blocking detector.
+
+A heartbeat task on the event loop asks to wake every
+LOOP_MONITOR_INTERVAL_MS and records how late it actually woke: that lag
+is added to the response time of every request on the worker. A watchdog
+thread notices when a heartbeat is overdue by more than
+LOOP_LAG_THRESHOLD_MS while the loop is still stuck, samples the loop
+thread's stack (sys._current_frames) and finds the route handler on it.
+The request middleware in main.py registers every in-flight request, so
+the stall is attributed to a method, path and member.
+
+Stalls are logged as warnings through app/logging_config.py (with the
+blocking request's client/member fields) and the last LOOP_MONITOR_KEEP
+are kept, with their stacks, for GET /admin/loop-stats.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, List, Optional
+
+from .config import LOOP_LAG_THRESHOLD_MS, LOOP_MONITOR_INTERVAL_MS, LOOP_MONITOR_KEEP
+
+logger = logging.getLogger(__name__)
+
+# lag samples kept for the percentiles (about a minute at the default interval)
+_WINDOW = 1200
+# frames kept per stack sample, innermost last
+_STACK_LIMIT = 30
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        interval_ms: float = LOOP_MONITOR_INTERVAL_MS,
+        threshold_ms: float = LOOP_LAG_THRESHOLD_MS,
+        keep: int = LOOP_MONITOR_KEEP,
+    ):
+        self.interval = max(interval_ms, 1) / 1000.0
+        self.threshold = max(threshold_ms, 1) / 1000.0
+        self._lock = threading.Lock()
+        # id(scope) -> in-flight request
+        self._inflight: Dict[int, Dict] = {}
+        self._lags: "deque[float]" = deque(maxlen=_WINDOW)
+        self._stalls: "deque[Dict]" = deque(maxlen=keep)
+        # stack sample taken by the watchdog during the current stall
+        self._sample: Optional[Dict] = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._loop_thread_id = None
+        self._last_beat = 0.0
+        self.beats = 0
+        self.stall_count = 0
+        self.stalled_seconds = 0.0
+        self.max_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the heartbeat and the watchdog; call from the event loop (app startup)."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # -- requests ---------------------------------------------------------
+
+    def request_started(self, scope: Dict, client_ip: str, member_id: str, member_name: str) -> None:
+        # the scope dict is shared with the router, which adds "endpoint" once the route matches
+        with self._lock:
+            self._inflight[id(scope)] = {
+                "scope": scope,
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "client_ip": client_ip,
+                "member_id": member_id,
+                "member_name": member_name,
+                "started": time.monotonic(),
+            }
+
+    def request_finished(self, scope: Dict) -> None:
+        with self._lock:
+            self._inflight.pop(id(scope), None)
+
+    # -- heartbeat (event loop) -------------------------------------------
+
+    async def _heartbeat(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(now - start - self.interval, 0.0)
+            with self._lock:
+                self._lags.append(lag)
+                self.beats += 1
+                self.max_lag = max(self.max_lag, lag)
+                sample, self._sample = self._sample, None
+            if lag >= self.threshold:
+                self._record_stall(lag, sample)
+
+    def _record_stall(self, lag: float, sample: Optional[Dict]) -> None:
+        sample = sample or {}
+        request = sample.get("request") or {}
+        stall = {
+            "at": time.time(),
+            "lag_ms": round(lag * 1000, 1),
+            "handler": sample.get("handler"),
+            "method": request.get("method"),
+            "path": request.get("path"),
+            "client_ip": request.get("client_ip", "-"),
+            "member_id": request.get("member_id", "-"),
+            "member_name": request.get("member_name", "-"),
+            "stack": sample.get("stack", []),
+        }
+        with self._lock:
+            self._stalls.append(stall)
+            self.stall_count += 1
+            self.stalled_seconds += lag
+        # the blocking request's context, not the heartbeat task's
+        logger.warning(
+            "event loop blocked for %.0fms by %s %s (handler %s)%s",
+            stall["lag_ms"],
+            stall["method"] or "-",
+            stall["path"] or "-",
+            stall["handler"] or "unknown",
+            "\n" + "".join(stall["stack"]) if stall["stack"] else " - no stack sample",
+            extra={
+                "client_ip": stall["client_ip"],
+                "member_id": stall["member_id"],
+                "member_name": stall["member_name"],
+            },
+        )
+
+    # -- watchdog (thread) ------------------------------------------------
+
+    def _watch(self) -> None:
+        check = min(self.interval, self.threshold) / 2
+        sampled_beat = None
+        while not self._stop.wait(check):
+            last_beat = self._last_beat
+            overdue = time.monotonic() - last_beat - self.interval
+            # one sample per stall, while the loop is still stuck in the culprit
+            if overdue >= self.threshold and sampled_beat != last_beat:
+                sampled_beat = last_beat
+                try:
+                    sample = self._sample_stack()
+                except Exception:
+                    logger.exception("Loop monitor could not sample the event loop stack")
+                    continue
+                with self._lock:
+                    self._sample = sample
+
+    def _sample_stack(self) -> Optional[Dict]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        with self._lock:
+            by_code = {}
+            for entry in self._inflight.values():
+                endpoint = entry["scope"].get("endpoint")
+                code = getattr(endpoint, "__code__", None)
+                if code is not None:
+                    by_code.setdefault(code, entry)
+        handler = None
+        request = None
+        f = frame
+        while f is not None:
+            if f.f_code in by_code:
+                request = by_code[f.f_code]
+                handler = f"{f.f_globals.get('__name__', '?')}.{f.f_code.co_name}"
+                break
+            f = f.f_back
+        stack = traceback.format_list(traceback.extract_stack(frame, limit=_STACK_LIMIT))
+        if request is not None:
+            request = {k: v for k, v in request.items() if k != "scope"}
+        return {"handler": handler, "request": request, "stack": stack}
+
+    # -- reporting --------------------------------------------------------
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            lags = list(self._lags)
+            stalls = list(self._stalls)
+            inflight = [
+                {
+                    "method": entry["method"],
+                    "path": entry["path"],
+                    "member_id": entry["member_id"],
+                    "running_ms": round((now - entry["started"]) * 1000, 1),
+                }
+                for entry in self._inflight.values()
+            ]
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "beats": self.beats,
+            "lag_ms": {
+                "p50": round(_percentile(lags, 50) * 1000, 2),
+                "p95": round(_percentile(lags, 95) * 1000, 2),
+                "p99": round(_percentile(lags, 99) * 1000, 2),
+                "max_recent": round(max(lags, default=0.0) * 1000, 2),
+                "max": round(self.max_lag * 1000, 2),
+            },
+            "stalls": self.stall_count,
+            "stalled_ms": round(self.stalled_seconds * 1000, 1),
+            "in_flight": inflight,
+            "recent_stalls": stalls,
+        }
+
+
+monitor = LoopMonitor()
@@ -0,0 +1,136 @@
+"""Offline mail merge: notification emails as an mbox file or a zip of .eml files.
+
+For when mail can't go out from the app (SMTP relay down, or the council
+sends from its own mail client). Each selected member's notification is
+rendered with the EMAIL_TEXT template, exactly as the outbox would send
+it, and written out one message at a time: members are read with
+yield_per and the mbox/zip bytes are produced as a generator, so memory
+use doesn't grow with the number of messages.
+
+Members without an email address are skipped.
+"""
+import io
+import os
+import re
+import time
+import zipfile
+from email.generator import BytesGenerator
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from typing import Iterator, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from .config import COUNCIL_TITLE, SMTP_FROM
+from . import email_template
+from . import rollups
+from .models import Member
+
+FORMATS = ("mbox", "zip")
+SELECTIONS = ("unreported", "all")
+
+# rows fetched from the database at a time
+BATCH_SIZE = 500
+
+
+def select_members(db: Session, selection: str) -> Query:
+    if selection == "unreported":
+        return rollups.unreported_members(db)
+    return db.query(Member).order_by(Member.last_name, Member.first_name)
+
+
+def iter_messages(db: Session, selection: str = "unreported", subject: Optional[str] = None) -> Iterator[EmailMessage]:
+    """Render one EmailMessage per selected member with an email address."""
+    from .access_code import AccessCode
+    # messages carry access codes, so hand out any the selected members are missing first
+    # (one bulk UPDATE, the same way Notify All does)
+    missing = [
+        int(mid)
+        for (mid,) in select_members(db, selection)
+        .filter(func.trim(func.coalesce(Member.email, "")) != "")
+        .filter(func.trim(func.coalesce(Member.access_code, "")) == "")
+        .with_entities(Member.id)
+    ]
+    AccessCode(db).assign_access_codes(missing)
+
+    template = email_template.load()
+    base = email_template.base_values()
+    subject = subject or os.getenv("EMAIL_SUBJECT", f"Notification from {COUNCIL_TITLE}")
+    for member in select_members(db, selection).yield_per(BATCH_SIZE):
+        to_address = (member.email or "").strip()
+        if not to_address:
+            continue
+        msg = EmailMessage()
+        msg["From"] = SMTP_FROM
+        msg["To"] = to_address
+        msg["Subject"] = subject
+        msg["Date"] = formatdate(localtime=True)
+        msg["Message-ID"] = make_msgid()
+        msg["X-Member-Number"] = str(member.member_number)
+        msg.set_content(template.render(email_template.member_values(member, base=base)))
+        yield msg
+
+
+def _as_bytes(msg: EmailMessage, unixfrom: bool = False) -> bytes:
+    buf = io.BytesIO()
+    # mangle_from_ escapes body lines starting with "From " so mbox readers don't split on them
+    BytesGenerator(buf, mangle_from_=unixfrom).flatten(msg, unixfrom=unixfrom)
+    return buf.getvalue()
+
+
+def iter_mbox(messages: Iterator[EmailMessage]) -> Iterator[bytes]:
+    """mboxo-style output (body lines starting with "From " get a ">"), one chunk per message."""
+    for msg in messages:
+        msg.set_unixfrom(f"From MAILER-DAEMON {time.asctime()}")
+        yield _as_bytes(msg, unixfrom=True) + b"\n"
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Unseekable sink for ZipFile; take() hands back what was written since the last call."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _eml_name(index: int, msg: EmailMessage) -> str:
+    number = re.sub(r"[^\w.-]", "_", str(msg.get("X-Member-Number", "")))
+    return f"{index:05d}-{number}.eml"
+
+
+def iter_eml_zip(messages: Iterator[EmailMessage]) -> Iterator[bytes]:
+    """A zip with one .eml per message, streamed as it is built.
+
+    ZipFile writes to an unseekable sink using data descriptors, so each
+    member is yielded as soon as it is compressed.
+    """
+    sink = _ChunkWriter()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for index, msg in enumerate(messages, start=1):
+            zf.writestr(_eml_name(index, msg), _as_bytes(msg))
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    yield sink.take()
+
+
+def export(db: Session, fmt: str, selection: str = "unreported") -> Iterator[bytes]:
+    messages = iter_messages(db, selection)
+    if fmt == "zip":
+        return iter_eml_zip(messages)
+    return iter_mbox(messages)
+
+
+def filename(fmt: str, selection: str) -> str:
+    return f"notifications-{selection}-{time.strftime('%Y%m%d')}.{'zip' if fmt == 'zip' else 'mbox'}"
@@ -0,0 +1,171 @@
+"""In-process cache of the signed-in member, keyed by session user_id.
+
+get_current_member runs on every authenticated request; with the cache
+it only hits the database on a miss. Entries are immutable snapshots of
+the members row (not ORM objects, so they can be shared between requests
+and sessions), evicted least-recently-used beyond MEMBER_CACHE_SIZE and
+expired after MEMBER_CACHE_TTL_SECONDS.
+
+Code that changes a member must call invalidate(member_id), or clear()
+for bulk changes such as imports. Both also bump the shared "members"
+generation (app/generations.py), and every lookup first compares that
+generation with the one the cache was filled under, so the other worker
+processes drop their entries too. The TTL is a backstop for writers that
+don't go through this module (e.g. editing the database by hand).
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from .config import MEMBER_CACHE_SIZE, MEMBER_CACHE_TTL_SECONDS
+from .generations import Generation, UNAVAILABLE
+from .models import Member
+
+
+@dataclass(frozen=True)
+class MemberSnapshot:
+    id: int
+    member_number: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    mobile_phone: Optional[str]
+    email: Optional[str]
+    is_admin: bool
+    access_code: Optional[str]
+
+    @classmethod
+    def from_member(cls, member: Member) -> "MemberSnapshot":
+        return cls(
+            id=int(member.id),
+            member_number=member.member_number,
+            first_name=member.first_name,
+            last_name=member.last_name,
+            mobile_phone=member.mobile_phone,
+            email=member.email,
+            is_admin=bool(member.is_admin),
+            access_code=member.access_code,
+        )
+
+
+class MemberCache:
+    def __init__(self, max_size: int = MEMBER_CACHE_SIZE, ttl: float = MEMBER_CACHE_TTL_SECONDS, generation: Generation = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = generation or Generation("members")
+        # member_id -> (snapshot, expires at)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # shared generation the entries were loaded under
+        self._filled_under = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    def current_generation(self) -> int:
+        """Check the shared generation, dropping every entry if another process moved it.
+
+        Pass the result to put() for a row read after this call.
+        """
+        generation = self.generation.current()
+        with self._lock:
+            if generation != self._filled_under:
+                if self._entries:
+                    self._entries.clear()
+                    self.remote_invalidations += 1
+                self._filled_under = generation
+        return generation
+
+    def get(self, member_id: int) -> Optional[MemberSnapshot]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(member_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(member_id)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[member_id]
+            self.misses += 1
+            return None
+
+    def put(self, snapshot: MemberSnapshot, generation: int) -> None:
+        """Cache a snapshot read under `generation` (from current_generation())."""
+        if self.max_size <= 0 or generation == UNAVAILABLE:
+            return
+        with self._lock:
+            # a bump since the read means the row may already be out of date
+            if generation != self._filled_under or generation != self.generation.current():
+                return
+            self._entries[snapshot.id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, member_id: int) -> None:
+        with self._lock:
+            self._entries.pop(member_id, None)
+            self.invalidations += 1
+        self.generation.bump()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        self.generation.bump()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "remote_invalidations": self.remote_invalidations,
+            "generation": self._filled_under,
+        }
+
+
+cache = MemberCache()
+
+
+def get_member(db: Session, member_id: int) -> Optional[MemberSnapshot]:
+    """The member with this id, from the cache or one query."""
+    generation = cache.current_generation()
+    snapshot = cache.get(member_id)
+    if snapshot is not None:
+        return snapshot
+    member = db.query(Member).filter(Member.id == member_id).first()
+    if member is None:
+        return None
+    snapshot = MemberSnapshot.from_member(member)
+    cache.put(snapshot, generation)
+    return snapshot
+
+
+def prime(member: Member, generation: int) -> None:
+    """Cache a member loaded elsewhere (login) so the next request is a hit.
+
+    `generation` is current_generation() from before the member was read.
+    """
+    cache.put(MemberSnapshot.from_member(member), generation)
+
+
+def invalidate(member_id: int) -> None:
+    cache.invalidate(member_id)
+
+
+def clear() -> None:
+    cache.clear()
@@ -0,0 +1,330 @@
+"""Streaming member roster import.
+
+The uploaded file (.csv, or .xlsx read with openpyxl's read-only mode) is
+read incrementally straight from the spooled upload, rows are validated
+and inserted with bulk mappings in chunks of IMPORT_CHUNK_SIZE, so memory
+stays flat whatever the size of the export.
+
+Two modes:
+- replace: truncate `members` and load the roster (the original behaviour;
+  run by app.import_jobs with a commit per chunk)
+- sync: match rows on member_number, compare a hash of the roster fields
+  and only insert/update/delete what changed, keeping access codes, admin
+  flags and activities of members who are still on the roster.
+"""
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import IMPORT_CHUNK_SIZE, IMPORT_STAGING_DIR
+from .models import Member
+
+REQUIRED_COLUMNS = ["Membership Number", "First Name", "Last Name", "Cell Phone", "Primary Email"]
+
+TRUE_VALUES = ("1", "true", "yes", "y")
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        rows = self.imported + self.skipped + len(self.errors)
+        return rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def open_csv(fileobj) -> Tuple[List[str], Iterator[Dict[str, str]]]:
+    """Return (fieldnames, row iterator) decoding a binary file object lazily."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", errors="replace", newline="")
+    reader = csv.DictReader(text)
+    return list(reader.fieldnames or []), iter(reader)
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    # Excel stores membership/phone numbers as floats (1234567.0)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def open_xlsx(fileobj) -> Tuple[List[str], Iterator[Dict[str, str]]]:
+    """Return (fieldnames, row iterator) for the first sheet of a workbook.
+
+    Uses openpyxl's read-only mode, which streams rows from the file instead
+    of loading the whole sheet. The first row holds the column names.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    values = wb.active.iter_rows(values_only=True)
+    header = next(values, None) or ()
+    fieldnames = [_cell_text(h).strip() for h in header]
+
+    def rows() -> Iterator[Dict[str, str]]:
+        try:
+            for row in values:
+                yield {name: _cell_text(v) for name, v in zip(fieldnames, row) if name}
+        finally:
+            wb.close()
+
+    return fieldnames, rows()
+
+
+ROSTER_EXTENSIONS = (".csv", ".xlsx")
+
+
+def roster_extension(filename: str) -> Optional[str]:
+    """Return the supported extension of an uploaded roster, or None."""
+    name = (filename or "").lower()
+    for ext in ROSTER_EXTENSIONS:
+        if name.endswith(ext):
+            return ext
+    return None
+
+
+def open_roster(fileobj, extension: str) -> Tuple[List[str], Iterator[Dict[str, str]]]:
+    """Open a .csv or .xlsx roster as (fieldnames, row iterator)."""
+    if extension == ".xlsx":
+        return open_xlsx(fileobj)
+    return open_csv(fileobj)
+
+
+def missing_columns(fieldnames: List[str]) -> List[str]:
+    return [c for c in REQUIRED_COLUMNS if c not in fieldnames]
+
+
+def row_to_mapping(row: Dict[str, str], fieldnames: List[str]) -> Optional[Dict]:
+    """Convert one roster row to a `members` mapping.
+
+    Returns None for an entirely empty row; raises ValueError for a row that
+    can't be imported.
+    """
+    if not any((str(v or "")).strip() for v in row.values()):
+        return None
+
+    def value(col: str) -> str:
+        return str(row.get(col) or "").strip()
+
+    mapping = {
+        "member_number": value("Membership Number"),
+        "first_name": value("First Name"),
+        "last_name": value("Last Name"),
+        "mobile_phone": value("Cell Phone"),
+        "email": value("Primary Email"),
+        "is_admin": False,
+    }
+    if not mapping["member_number"]:
+        raise ValueError("missing Membership Number")
+
+    # optional fields
+    if "access_code" in fieldnames:
+        mapping["access_code"] = value("access_code") or None
+    if "is_admin" in fieldnames:
+        mapping["is_admin"] = value("is_admin").lower() in TRUE_VALUES
+    return mapping
+
+
+def iter_chunks(rows: Iterable[Dict[str, str]], fieldnames: List[str], result: ImportResult, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """Validate rows and yield lists of member mappings of at most `chunk_size`.
+
+    Skipped rows and errors are counted on `result` as they go by.
+    """
+    chunk: List[Dict] = []
+    for i, row in enumerate(rows, start=1):
+        try:
+            mapping = row_to_mapping(row, fieldnames)
+        except Exception as e:
+            result.errors.append(f"Row {i}: {e}")
+            continue
+        if mapping is None:
+            result.skipped += 1
+            continue
+        chunk.append(mapping)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def count_rows(fileobj, extension: str) -> int:
+    """Count the data rows of a roster (blank ones included) without keeping them."""
+    _, rows = open_roster(fileobj, extension)
+    return sum(1 for _ in rows)
+
+
+# Roster fields compared by sync; access_code / is_admin only when the file provides them
+SYNC_FIELDS = ["member_number", "first_name", "last_name", "mobile_phone", "email"]
+
+
+@dataclass
+class SyncPlan:
+    inserts: List[Dict] = field(default_factory=list)
+    updates: List[Dict] = field(default_factory=list)
+    deletes: List[Dict] = field(default_factory=list)
+    unchanged: int = 0
+    result: ImportResult = field(default_factory=ImportResult)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.inserts or self.updates or self.deletes)
+
+
+def _sync_fields(mapping: Dict, fieldnames: List[str]) -> List[str]:
+    fields = list(SYNC_FIELDS)
+    if "access_code" in fieldnames and mapping.get("access_code"):
+        # a blank code in the file never wipes an existing one
+        fields.append("access_code")
+    if "is_admin" in fieldnames:
+        fields.append("is_admin")
+    return fields
+
+
+def _hash(values: Dict, fields: List[str]) -> str:
+    h = hashlib.sha1()
+    for f in fields:
+        h.update(str(values.get(f) if values.get(f) is not None else "").encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def plan_sync(db: Session, rows: Iterable[Dict[str, str]], fieldnames: List[str]) -> SyncPlan:
+    """Work out the inserts/updates/deletes that bring `members` in line with the roster.
+
+    Nothing is written. Members are matched on member_number; if the table
+    holds the same number twice, the lowest id is kept and the others are
+    planned for deletion.
+    """
+    plan = SyncPlan()
+    start = time.perf_counter()
+
+    columns = [Member.id] + [getattr(Member, f) for f in SYNC_FIELDS + ["access_code", "is_admin"]]
+    current: Dict[str, Dict] = {}
+    extra: List[Dict] = []
+    for row in db.query(*columns).order_by(Member.id):
+        values = dict(row._mapping)
+        key = str(values["member_number"] or "").strip()
+        if key in current:
+            extra.append(values)
+        else:
+            current[key] = values
+
+    seen = set()
+    for chunk in iter_chunks(rows, fieldnames, plan.result):
+        for mapping in chunk:
+            key = mapping["member_number"]
+            if key in seen:
+                plan.result.errors.append(f"Membership Number {key} appears more than once; later row ignored")
+                continue
+            seen.add(key)
+
+            existing = current.get(key)
+            if existing is None:
+                plan.inserts.append(mapping)
+                continue
+            fields = _sync_fields(mapping, fieldnames)
+            if _hash(mapping, fields) == _hash(existing, fields):
+                plan.unchanged += 1
+            else:
+                update = {f: mapping[f] for f in fields}
+                update["id"] = existing["id"]
+                plan.updates.append(update)
+
+    plan.deletes = [values for key, values in current.items() if key not in seen] + extra
+    plan.result.imported = len(plan.inserts) + len(plan.updates)
+    plan.result.seconds = time.perf_counter() - start
+    return plan
+
+
+def apply_sync(
+    db: Session,
+    plan: SyncPlan,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    before_commit: Optional[Callable[[Session], None]] = None,
+) -> None:
+    """Write a SyncPlan in one transaction.
+
+    `before_commit(db)` runs inside the transaction just before the commit;
+    raising from it rolls everything back.
+    """
+    try:
+        for i in range(0, len(plan.inserts), chunk_size):
+            db.bulk_insert_mappings(Member, plan.inserts[i:i + chunk_size])
+        for i in range(0, len(plan.updates), chunk_size):
+            db.bulk_update_mappings(Member, plan.updates[i:i + chunk_size])
+        delete_ids = [int(d["id"]) for d in plan.deletes]
+        for i in range(0, len(delete_ids), chunk_size):
+            # activities go with them through ON DELETE CASCADE
+            db.query(Member).filter(Member.id.in_(delete_ids[i:i + chunk_size])).delete(synchronize_session=False)
+        if before_commit is not None:
+            before_commit(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+_TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def stage_upload(fileobj, suffix: str) -> str:
+    """Copy an upload to IMPORT_STAGING_DIR and return its token."""
+    os.makedirs(IMPORT_STAGING_DIR, exist_ok=True)
+    token = uuid.uuid4().hex
+    with open(staged_path(token, suffix), "wb") as out:
+        shutil.copyfileobj(fileobj, out)
+    return token
+
+
+def staged_path(token: str, suffix: str) -> str:
+    if not _TOKEN_RE.match(token or ""):
+        raise ValueError("invalid staged import token")
+    return os.path.join(IMPORT_STAGING_DIR, f"{token}{suffix}")
+
+
+def remove_stale_staged(max_age_seconds: float, keep: Iterable[str] = ()) -> List[str]:
+    """Delete staged uploads older than max_age_seconds, except the tokens in `keep`.
+
+    Returns the deleted paths.
+    """
+    if not os.path.isdir(IMPORT_STAGING_DIR):
+        return []
+    keep = set(keep)
+    cutoff = time.time() - max_age_seconds
+    removed = []
+    for name in os.listdir(IMPORT_STAGING_DIR):
+        token, ext = os.path.splitext(name)
+        if not _TOKEN_RE.match(token) or ext not in ROSTER_EXTENSIONS or token in keep:
+            continue
+        path = os.path.join(IMPORT_STAGING_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed.append(path)
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def find_staged(token: str) -> Optional[Tuple[str, str]]:
+    """Return (path, extension) of a staged upload, or None if it is gone."""
+    for ext in ROSTER_EXTENSIONS:
+        path = staged_path(token, ext)
+        if os.path.exists(path):
+            return path, ext
+    return None
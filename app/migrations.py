@@ -0,0 +1,106 @@
+"""Small, idempotent schema migrations run at startup.
+
+`Base.metadata.create_all` only creates missing tables; anything that has
+to change an existing database (triggers, new indexes, data fixes) lives
+here and must be safe to run on every start.
+"""
+import logging
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import rollups
+
+logger = logging.getLogger(__name__)
+
+
+def _install_rollups(engine: Engine) -> None:
+    with engine.begin() as conn:
+        old_trigger = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'activities_rollup_insert'"
+        ).scalar()
+        rollups.install_triggers(conn)
+        # First start after the rollup tables were added: backfill them
+        has_activities = conn.exec_driver_sql("SELECT 1 FROM activities LIMIT 1").first() is not None
+        has_rollups = conn.exec_driver_sql("SELECT 1 FROM category_totals LIMIT 1").first() is not None
+        # Triggers from before the sums were stored raw rounded every step; recompute those sums once
+        rounded = old_trigger is not None and "ROUND(" in old_trigger
+        if has_activities and (not has_rollups or rounded):
+            logger.info("Backfilling member/category rollup tables")
+            db = Session(bind=conn)
+            try:
+                rollups.rebuild(db)
+            finally:
+                db.close()
+
+
+def _unique_member_category(engine: Engine) -> None:
+    """Merge duplicate (member_id, category) activity rows and add the unique index.
+
+    Duplicates come from concurrent autosaves before the index existed; they
+    all hold a value for the same form line, so the most recently written
+    row (highest id) wins and the others are removed.
+    """
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_activities_member_category'"
+        ).first()
+        if exists:
+            return
+        result = conn.exec_driver_sql(
+            """DELETE FROM activities WHERE id NOT IN (
+                   SELECT MAX(id) FROM activities GROUP BY member_id, category
+               )"""
+        )
+        if result.rowcount:
+            logger.warning("Merged %s duplicate activity rows", result.rowcount)
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX uq_activities_member_category ON activities (member_id, category)"
+        )
+
+
+def _member_lookup_indexes(engine: Engine) -> None:
+    # Expression indexes used by login and access-code generation (see models.py)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_members_lower_last_name ON members (lower(last_name))")
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_members_lower_access_code ON members (lower(access_code))")
+
+
+# Columns added to email_log when it became the outbox (see models.EmailLog)
+EMAIL_OUTBOX_COLUMNS = [
+    ("status", "VARCHAR NOT NULL DEFAULT 'sent'"),
+    ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("next_attempt_at", "DATETIME"),
+    ("last_error", "TEXT"),
+    ("created_at", "DATETIME"),
+    ("batch_id", "VARCHAR"),
+]
+
+
+def _email_outbox_columns(engine: Engine) -> None:
+    # rows written before the outbox existed were sent directly, hence the 'sent' default
+    with engine.begin() as conn:
+        existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(email_log)")}
+        for name, ddl in EMAIL_OUTBOX_COLUMNS:
+            if name not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE email_log ADD COLUMN {name} {ddl}")
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_email_log_status_next_attempt ON email_log (status, next_attempt_at)"
+        )
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_email_log_batch_id ON email_log (batch_id)")
+
+
+def _import_job_owner(engine: Engine) -> None:
+    # import_jobs predates claim tokens (see import_jobs.ImportWorker._claim)
+    with engine.begin() as conn:
+        existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(import_jobs)")}
+        if "claimed_by" not in existing:
+            conn.exec_driver_sql("ALTER TABLE import_jobs ADD COLUMN claimed_by VARCHAR")
+
+
+def run_migrations(engine: Engine) -> None:
+    _unique_member_category(engine)
+    _member_lookup_indexes(engine)
+    _email_outbox_columns(engine)
+    _import_job_owner(engine)
+    _install_rollups(engine)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Date, DateTime, ForeignKey, Boolean, CheckConstraint
+from sqlalchemy import Column, Integer, String, Float, Text, Date, DateTime, ForeignKey, Boolean, CheckConstraint, Index
+from sqlalchemy import func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .db import Base
@@ -27,14 +28,33 @@ class Member(Base):
         foreign_keys="Submission.reviewer_id",
     )
 
+# Case-insensitive lookups (login, access-code uniqueness) compare lower(col) = lower(?)
+# so SQLite can seek these expression indexes instead of scanning members.
+Index("ix_members_lower_last_name", func.lower(Member.last_name))
+Index("ix_members_lower_access_code", func.lower(Member.access_code))
+
 class EmailLog(Base):
+    """Outgoing mail; doubles as the outbox drained by app.outbox.
+
+    status is queued -> sending -> sent, or failed after OUTBOX_MAX_ATTEMPTS.
+    While sending, next_attempt_at is the lease after which another worker
+    may pick the message up again.
+    """
     __tablename__ = "email_log"
+    __table_args__ = (Index("ix_email_log_status_next_attempt", "status", "next_attempt_at"),)
     id = Column(Integer, primary_key=True, index=True)
     member_number = Column(String, nullable=False)
     to_address = Column(String, nullable=False)
     subject = Column(String, nullable=False)
     body = Column(Text, nullable=False)
-    sent_at = Column(DateTime, default=datetime.now())
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    # set for messages queued together by /admin/notify-all
+    batch_id = Column(String, index=True)
 
 class Activity(Base):
     __tablename__ = "activities"
@@ -51,10 +71,56 @@ class Activity(Base):
     __table_args__ = (
         CheckConstraint("hours >= 0", name="hours_non_negative"),
         CheckConstraint("amount >= 0", name="amount_non_negative"),
+        # One row per member per Form 1728 line; writes rely on it for ON CONFLICT upserts
+        Index("uq_activities_member_category", "member_id", "category", unique=True),
     )
 
     member = relationship("Member", back_populates="activities")
 
+class MemberTotal(Base):
+    """Rollup of a member's volunteer hours and donations.
+
+    Kept in step with `activities` by the triggers in app/rollups.py so the
+    dashboard and admin report never have to scan the activities table.
+    """
+    __tablename__ = "member_totals"
+    # No foreign key on purpose: cascaded activity deletes adjust this row
+    # while the member row itself is being removed.
+    member_id = Column(Integer, primary_key=True)
+    hours = Column(Float, nullable=False, default=0.0)
+    amount = Column(Float, nullable=False, default=0.0)
+
+class CategoryTotal(Base):
+    """Rollup of hours (or quantity) and donations per Form 1728 category."""
+    __tablename__ = "category_totals"
+    category = Column(String, primary_key=True)
+    hours = Column(Float, nullable=False, default=0.0)
+    amount = Column(Float, nullable=False, default=0.0)
+
+class ImportJob(Base):
+    """A roster import running in the background (see app/import_jobs.py)."""
+    __tablename__ = "import_jobs"
+    id = Column(String, primary_key=True)
+    filename = Column(String, nullable=False)
+    extension = Column(String, nullable=False)
+    mode = Column(String, nullable=False, default="replace")
+    status = Column(String, nullable=False, default="queued", index=True)
+    phase = Column(String, nullable=True)
+    total_rows = Column(Integer, nullable=True)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    errors = Column(Text, nullable=True)
+    message = Column(Text, nullable=True)
+    truncated = Column(Boolean, nullable=False, default=False)
+    # token of the worker that claimed the job; its commits check it is still theirs
+    claimed_by = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
 class Submission(Base):
     __tablename__ = "submissions"
     id = Column(Integer, primary_key=True)
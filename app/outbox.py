@@ -0,0 +1,274 @@
+"""Durable email outbox backed by the email_log table.
+
+Notifications are written to email_log with status "queued" in the same
+request that asks for them, so nothing is lost if the process restarts
+before they go out. A worker thread drains the table:
+
+- claims due messages (status queued, or a "sending" lease that expired)
+  by flipping them to "sending" with a lease in next_attempt_at,
+- sends up to OUTBOX_CONCURRENCY of them at once on a thread pool, never
+  more than OUTBOX_RATE_PER_MINUTE in any 60 seconds,
+- marks them sent, or re-queues them with exponential backoff, giving up
+  ("failed") after OUTBOX_MAX_ATTEMPTS.
+
+Every worker process starts a worker, but only the one holding an flock
+on OUTBOX_LOCK_FILE drains the table; the others stand by and take over
+if it exits. The per-minute limit is therefore counted in one place and
+holds for the whole app. (A message queued in a standby process is
+picked up on the sender's next poll, within OUTBOX_POLL_SECONDS.)
+
+Delivery is at-least-once: a worker that dies mid-send leaves the lease to
+expire and the message is sent again.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; every process then sends (and the limit is per process)
+    fcntl = None
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .config import (
+    OUTBOX_CONCURRENCY,
+    OUTBOX_RATE_PER_MINUTE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_BASE_SECONDS,
+    OUTBOX_RETRY_MAX_SECONDS,
+    OUTBOX_SEND_TIMEOUT_SECONDS,
+    OUTBOX_POLL_SECONDS,
+    OUTBOX_LOCK_FILE,
+)
+from . import db_writer
+from .db import SessionLocal
+from .models import EmailLog
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("queued", "sending", "sent", "failed")
+
+
+def enqueue_many(db: Session, messages: Iterable[Dict], batch_id: Optional[str] = None) -> int:
+    """Queue messages (dicts with member_number, to_address, subject, body) and commit.
+
+    All rows written in one call share `batch_id`, if given, so a bulk send
+    can be tracked with status_counts(db, batch_id). Returns the number queued.
+    """
+    now = datetime.utcnow()
+    rows = [
+        dict(m, status="queued", attempts=0, next_attempt_at=now, created_at=now, batch_id=batch_id)
+        for m in messages
+    ]
+    if rows:
+        db.bulk_insert_mappings(EmailLog, rows)
+    db.commit()
+    if rows:
+        worker.wake()
+    return len(rows)
+
+
+def enqueue(db: Session, member_number: str, to_address: str, subject: str, body: str) -> None:
+    enqueue_many(db, [{"member_number": member_number, "to_address": to_address, "subject": subject, "body": body}])
+
+
+def status_counts(db: Session, batch_id: Optional[str] = None) -> Dict[str, int]:
+    """{status: count} for every outbox status, zeros included, optionally for one batch."""
+    counts = dict.fromkeys(STATUSES, 0)
+    query = db.query(EmailLog.status, func.count(EmailLog.id))
+    if batch_id is not None:
+        query = query.filter(EmailLog.batch_id == batch_id)
+    for status, count in query.group_by(EmailLog.status):
+        counts[status] = count
+    return counts
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait after the given number of failed attempts."""
+    return min(OUTBOX_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), OUTBOX_RETRY_MAX_SECONDS)
+
+
+def _smtp_send(to_address: str, subject: str, body: str) -> None:
+    from .email_sender import EMailSender
+    EMailSender().send_email(to_address, subject, body, False)
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        send: Callable[[str, str, str], None] = _smtp_send,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        rate_per_minute: int = OUTBOX_RATE_PER_MINUTE,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+        lock_path: str = OUTBOX_LOCK_FILE,
+    ):
+        self.session_factory = session_factory
+        self.send = send
+        self.concurrency = max(concurrency, 1)
+        self.rate_per_minute = max(rate_per_minute, 1)
+        self.poll_seconds = poll_seconds
+        self.lock_path = lock_path
+        # whether this process is the one sending
+        self.sending = False
+        # monotonic times of the sends in the last minute
+        self._recent = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the messages in flight; anything still queued stays in the table."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _acquire_sender_lock(self) -> Optional[int]:
+        """Wait until this process is the sender; None if stopped first."""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+        logged = False
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                if not logged:
+                    logger.info("Another process is sending the email outbox; standing by")
+                    logged = True
+            if self._stop.wait(self.poll_seconds):
+                os.close(fd)
+                return None
+
+    def _run(self) -> None:
+        lock_fd = self._acquire_sender_lock()
+        if lock_fd is None:
+            return
+        self.sending = True
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="outbox-send")
+        try:
+            while not self._stop.is_set():
+                try:
+                    busy = self.drain_once(executor)
+                except Exception:
+                    logger.exception("Email outbox pass failed")
+                    busy = False
+                if not busy:
+                    self._wake.wait(self.poll_seconds)
+                    self._wake.clear()
+        finally:
+            executor.shutdown(wait=True)
+            self.sending = False
+            # closing the file releases the flock for a standby process
+            os.close(lock_fd)
+
+    def _budget(self) -> int:
+        """Sends allowed right now by the per-minute limit."""
+        cutoff = time.monotonic() - 60.0
+        while self._recent and self._recent[0] <= cutoff:
+            self._recent.popleft()
+        return self.rate_per_minute - len(self._recent)
+
+    def drain_once(self, executor: ThreadPoolExecutor) -> bool:
+        """Send one batch of due messages. Returns True if there may be more to do now."""
+        budget = self._budget()
+        if budget <= 0:
+            # wait for the oldest send to leave the window (or for stop)
+            self._stop.wait(max(self._recent[0] + 60.0 - time.monotonic(), 0.05))
+            return True
+
+        db = self.session_factory()
+        try:
+            batch = self._claim(db, min(budget, self.concurrency))
+            if not batch:
+                return False
+            for _ in batch:
+                self._recent.append(time.monotonic())
+            futures = {
+                executor.submit(self.send, m["to_address"], m["subject"], m["body"]): m for m in batch
+            }
+            wait(futures)
+            self._record(db, [(m, f.exception()) for f, m in futures.items()])
+            return True
+        finally:
+            db.close()
+
+    def _claim(self, db: Session, limit: int) -> List[Dict]:
+        now = datetime.utcnow()
+        due = (
+            (EmailLog.status.in_(["queued", "sending"])) & (EmailLog.next_attempt_at <= now)
+        )
+        candidates = (
+            db.query(EmailLog.id, EmailLog.to_address, EmailLog.subject, EmailLog.body, EmailLog.attempts)
+            .filter(due)
+            .order_by(EmailLog.next_attempt_at, EmailLog.id)
+            .limit(limit)
+            .all()
+        )
+        lease = now + timedelta(seconds=OUTBOX_SEND_TIMEOUT_SECONDS)
+        claimed = []
+        with db_writer.exclusive():
+            for row in candidates:
+                # conditional UPDATE so two workers never take the same message
+                got = (
+                    db.query(EmailLog)
+                    .filter(EmailLog.id == row.id, due)
+                    .update({"status": "sending", "next_attempt_at": lease}, synchronize_session=False)
+                )
+                if got:
+                    claimed.append(dict(row._mapping))
+            db.commit()
+        return claimed
+
+    def _record(self, db: Session, results: List[tuple]) -> None:
+        with db_writer.exclusive():
+            self._record_results(db, results)
+
+    def _record_results(self, db: Session, results: List[tuple]) -> None:
+        now = datetime.utcnow()
+        for message, error in results:
+            query = db.query(EmailLog).filter(EmailLog.id == message["id"])
+            if error is None:
+                self.sent += 1
+                query.update(
+                    {"status": "sent", "sent_at": now, "attempts": message["attempts"] + 1, "last_error": None},
+                    synchronize_session=False,
+                )
+                continue
+            self.failures += 1
+            attempts = message["attempts"] + 1
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                logger.error("Giving up on email %s to %s after %s attempts: %s", message["id"], message["to_address"], attempts, error)
+                values = {"status": "failed", "next_attempt_at": None}
+            else:
+                delay = retry_delay(attempts)
+                logger.warning("Email %s to %s failed (%s); retrying in %.0fs", message["id"], message["to_address"], error, delay)
+                values = {"status": "queued", "next_attempt_at": now + timedelta(seconds=delay)}
+            values.update(attempts=attempts, last_error=str(error)[:2000])
+            query.update(values, synchronize_session=False)
+        db.commit()
+
+
+worker = OutboxWorker()
@@ -0,0 +1,201 @@
+"""Read snapshot for the admin report.
+
+The report reads every member and every rollup row; run against the live
+database that read competes with autosave commits. With REPORT_SNAPSHOT
+on (it is off by default), the report runs against an in-memory copy of just the tables it
+reads (members and the two rollup tables, not email bodies or import
+jobs), so it never touches the file the write path is committing to.
+
+The copy is refreshed in the background once it is older than
+REPORT_SNAPSHOT_MAX_AGE seconds: a report that finds it stale is served
+from the old copy and wakes the refresher thread. It is refreshed inline
+instead when it is older than REPORT_SNAPSHOT_MAX_STALE, or when the
+shared "members" generation (app/generations.py) moved since the copy -
+admin edits, imports and access codes bump it in every worker - so an
+admin never sees a member they just removed. A refresh is skipped when
+nothing was committed since the last one (PRAGMA data_version). The page
+shows the time of the copy it was built from.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional, Tuple, TypeVar
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from . import write_behind
+from .config import DB_PATH, REPORT_SNAPSHOT, REPORT_SNAPSHOT_MAX_AGE, REPORT_SNAPSHOT_MAX_STALE
+from .generations import Generation
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# everything _report_data (app/views.py) reads
+TABLES: Tuple[str, ...] = ("members", "member_totals", "category_totals")
+
+
+@dataclass
+class Snapshot:
+    engine: Engine
+    taken_at: datetime
+    # monotonic time of the copy, for the age check
+    taken: float
+    seconds: float
+    # "members" generation the copy was taken under
+    generation: int
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.taken
+
+    def read(self, fn: Callable[[Session], T]) -> T:
+        """Run fn(session) against the copy; reads are serialised on its one connection."""
+        with self._lock:
+            db = Session(bind=self.engine, autoflush=False)
+            try:
+                return fn(db)
+            finally:
+                db.close()
+
+
+class ReportSnapshots:
+    def __init__(
+        self,
+        path: str = DB_PATH,
+        max_age: float = REPORT_SNAPSHOT_MAX_AGE,
+        max_stale: float = REPORT_SNAPSHOT_MAX_STALE,
+        generation: Generation = None,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.max_stale = max(max_stale, max_age)
+        self.generation = generation or Generation("members")
+        self._current: Optional[Snapshot] = None
+        # serialises refreshes between the thread and a first inline copy
+        self._refresh_lock = threading.Lock()
+        self._source = None
+        self._data_version = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.skipped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="report-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._refresh_lock:
+            if self._source is not None:
+                self._source.close()
+                self._source = None
+
+    def get(self) -> Snapshot:
+        """The current copy; refreshed inline if missing, too old or behind a member change, else in the background."""
+        snapshot = self._current
+        if snapshot is None or snapshot.age >= self.max_stale or snapshot.generation != self.generation.current():
+            return self.refresh()
+        if snapshot.age >= self.max_age:
+            self._wake.set()
+        return snapshot
+
+    def refresh(self, force: bool = False) -> Snapshot:
+        with self._refresh_lock:
+            if self._source is None:
+                self._source = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            if write_behind.enabled():
+                # buffered autosaves belong in the copy
+                write_behind.buffer.flush()
+            # read before copying: a bump during the copy means one more refresh
+            generation = self.generation.current()
+            # changes whenever another connection commits
+            data_version = self._source.execute("PRAGMA data_version").fetchone()[0]
+            current = self._current
+            if current is not None and not force and data_version == self._data_version:
+                # nothing new: keep the copy, but count it as fresh
+                current.taken = time.monotonic()
+                current.taken_at = datetime.now()
+                current.generation = generation
+                self.skipped += 1
+                return current
+
+            start = time.perf_counter()
+            copy = self._copy_tables()
+            engine = create_engine("sqlite://", creator=lambda: copy, poolclass=StaticPool)
+            snapshot = Snapshot(
+                engine=engine,
+                taken_at=datetime.now(),
+                taken=time.monotonic(),
+                seconds=time.perf_counter() - start,
+                generation=generation,
+            )
+            # a report still reading the old copy keeps it alive until it finishes
+            self._current = snapshot
+            self._data_version = data_version
+            self.refreshes += 1
+            logger.info("Report snapshot refreshed in %.0fms", snapshot.seconds * 1000)
+            return snapshot
+
+    def _copy_tables(self) -> sqlite3.Connection:
+        """An in-memory database holding TABLES (with their indexes) as of one read transaction."""
+        copy = sqlite3.connect("file::memory:", uri=True, check_same_thread=False, isolation_level=None)
+        try:
+            copy.execute("ATTACH DATABASE ? AS src", (f"file:{self.path}?mode=ro",))
+            marks = ", ".join("?" for _ in TABLES)
+            # one transaction: every table is read from the same committed state
+            copy.execute("BEGIN")
+            schema = copy.execute(
+                f"SELECT type, name, sql FROM src.sqlite_master "
+                f"WHERE tbl_name IN ({marks}) AND type IN ('table', 'index') AND sql IS NOT NULL "
+                f"ORDER BY type = 'index'",
+                TABLES,
+            ).fetchall()
+            for kind, name, sql in schema:
+                copy.execute(sql)
+                if kind == "table":
+                    copy.execute(f'INSERT INTO main."{name}" SELECT * FROM src."{name}"')
+            copy.execute("COMMIT")
+            copy.execute("DETACH DATABASE src")
+        except Exception:
+            copy.close()
+            raise
+        return copy
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Report snapshot refresh failed; reports keep using the previous copy")
+
+
+snapshots = ReportSnapshots()
+
+
+def enabled() -> bool:
+    return REPORT_SNAPSHOT and snapshots.running
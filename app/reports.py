@@ -0,0 +1,68 @@
+from typing import Dict, List, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from .models import Activity
+from .categories import (
+    FAITH_ACTIVITIES,
+    FAMILY_ACTIVITIES,
+    COMMUNITY_ACTIVITIES,
+    LIFE_ACTIVITIES,
+    OTHER_QUANTITATIVE,
+    QUANTITY_EXCLUDE_HOURS,
+)
+
+
+def category_totals_by_category(db: Session) -> Dict[str, Dict[str, float]]:
+    """Sum hours and amount for every category across all members.
+
+    Quantity-only categories keep their raw hours here because the report
+    shows them as a "Total Quantity" column.
+    """
+    rows = (
+        db.query(
+            Activity.category,
+            func.coalesce(func.sum(Activity.hours), 0.0),
+            func.coalesce(func.sum(Activity.amount), 0.0),
+        )
+        .group_by(Activity.category)
+        .all()
+    )
+    return {str(cat): {"hours": float(hours), "amount": float(amount)} for cat, hours, amount in rows}
+
+
+def member_totals_by_member(db: Session) -> Dict[int, Dict[str, float]]:
+    """Sum volunteer hours and donations per member.
+
+    Hours from QUANTITY_EXCLUDE_HOURS categories are counts (visits, masses...)
+    so they are left out of the member's volunteer hours.
+    """
+    volunteer_hours = case(
+        (Activity.category.in_(QUANTITY_EXCLUDE_HOURS), 0.0),
+        else_=Activity.hours,
+    )
+    rows = (
+        db.query(
+            Activity.member_id,
+            func.coalesce(func.sum(volunteer_hours), 0.0),
+            func.coalesce(func.sum(Activity.amount), 0.0),
+        )
+        .group_by(Activity.member_id)
+        .all()
+    )
+    return {int(mid): {"hours": float(hours), "amount": float(amount)} for mid, hours, amount in rows}
+
+
+def group_category_totals(category_totals: Dict[str, Dict[str, float]]) -> Dict[str, List[Tuple[str, Dict[str, float]]]]:
+    """Arrange per-category totals in Form 1728 section order for the templates."""
+    def rows(labels: List[str]):
+        return [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in labels]
+
+    return {
+        "Faith": rows(FAITH_ACTIVITIES),
+        "Family": rows(FAMILY_ACTIVITIES),
+        "Community": rows(COMMUNITY_ACTIVITIES),
+        "Life": rows(LIFE_ACTIVITIES),
+        "Other": rows(OTHER_QUANTITATIVE),
+    }
@@ -0,0 +1,164 @@
+"""Rollup tables for member and category totals.
+
+`member_totals` and `category_totals` are maintained by SQLite triggers on
+`activities`, so every write path (form save, autosave, member removal,
+cascaded deletes from an import) updates them in the same transaction.
+The stored sums are raw, so float error stays at the level of a plain SUM
+and `verify` can compare them tightly. They are rounded to ROUND_DIGITS
+when read, so repeated add/subtract of 0.1 style values does not leave a
+member looking "reported" with 1e-17 hours.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query, Session
+
+from .models import Member, MemberTotal, CategoryTotal
+from .categories import QUANTITY_EXCLUDE_HOURS
+from .reports import category_totals_by_category, member_totals_by_member
+
+logger = logging.getLogger(__name__)
+
+# Allowed difference between a rollup and a fresh GROUP BY before we call it drift
+DRIFT_TOLERANCE = 1e-6
+# Decimals the totals are rounded to when read
+ROUND_DIGITS = 6
+
+TRIGGER_NAMES = ("activities_rollup_insert", "activities_rollup_update", "activities_rollup_delete")
+
+
+def _excluded_sql() -> str:
+    return ", ".join("'" + c.replace("'", "''") + "'" for c in QUANTITY_EXCLUDE_HOURS)
+
+
+def _volunteer_hours(row: str) -> str:
+    return f"CASE WHEN {row}.category IN ({_excluded_sql()}) THEN 0.0 ELSE {row}.hours END"
+
+
+def _add(row: str) -> List[str]:
+    return [
+        f"""INSERT INTO member_totals (member_id, hours, amount)
+            VALUES ({row}.member_id, {_volunteer_hours(row)}, {row}.amount)
+            ON CONFLICT(member_id) DO UPDATE SET
+                hours = hours + excluded.hours,
+                amount = amount + excluded.amount;""",
+        f"""INSERT INTO category_totals (category, hours, amount)
+            VALUES ({row}.category, {row}.hours, {row}.amount)
+            ON CONFLICT(category) DO UPDATE SET
+                hours = hours + excluded.hours,
+                amount = amount + excluded.amount;""",
+    ]
+
+
+def _subtract(row: str) -> List[str]:
+    return [
+        f"""UPDATE member_totals SET
+                hours = hours - {_volunteer_hours(row)},
+                amount = amount - {row}.amount
+            WHERE member_id = {row}.member_id;""",
+        f"""UPDATE category_totals SET
+                hours = hours - {row}.hours,
+                amount = amount - {row}.amount
+            WHERE category = {row}.category;""",
+    ]
+
+
+def _trigger_sql() -> List[str]:
+    # drop rollup rows for members that no longer have any activity (deleted/truncated)
+    cleanup = """DELETE FROM member_totals WHERE member_id = OLD.member_id
+            AND NOT EXISTS (SELECT 1 FROM activities WHERE member_id = OLD.member_id);"""
+    insert_body = "\n".join(_add("NEW"))
+    update_body = "\n".join(_subtract("OLD") + _add("NEW"))
+    delete_body = "\n".join(_subtract("OLD") + [cleanup])
+    return [
+        f"CREATE TRIGGER activities_rollup_insert AFTER INSERT ON activities BEGIN\n{insert_body}\nEND",
+        f"CREATE TRIGGER activities_rollup_update AFTER UPDATE OF member_id, category, hours, amount ON activities BEGIN\n{update_body}\nEND",
+        f"CREATE TRIGGER activities_rollup_delete AFTER DELETE ON activities BEGIN\n{delete_body}\nEND",
+    ]
+
+
+def install_triggers(conn: Connection) -> None:
+    """(Re)create the rollup triggers.
+
+    Always dropped and recreated so a change to QUANTITY_EXCLUDE_HOURS is
+    picked up on the next start.
+    """
+    for name in TRIGGER_NAMES:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    for sql in _trigger_sql():
+        conn.exec_driver_sql(sql)
+
+
+def rebuild(db: Session) -> None:
+    """Recompute both rollup tables from `activities`. Caller commits."""
+    db.query(MemberTotal).delete()
+    db.query(CategoryTotal).delete()
+    db.execute(text(
+        f"""INSERT INTO member_totals (member_id, hours, amount)
+            SELECT a.member_id, SUM({_volunteer_hours('a')}), SUM(a.amount)
+            FROM activities a GROUP BY a.member_id"""
+    ))
+    db.execute(text(
+        """INSERT INTO category_totals (category, hours, amount)
+            SELECT category, SUM(hours), SUM(amount)
+            FROM activities GROUP BY category"""
+    ))
+
+
+def verify(db: Session) -> List[str]:
+    """Compare the rollups with a fresh GROUP BY over `activities`.
+
+    Returns a list of human-readable drift descriptions (empty when clean).
+    """
+    problems: List[str] = []
+
+    def compare(kind: str, expected: Dict, actual: Dict) -> None:
+        for key in sorted(set(expected) | set(actual), key=str):
+            exp = expected.get(key, {"hours": 0.0, "amount": 0.0})
+            act = actual.get(key, {"hours": 0.0, "amount": 0.0})
+            for field in ("hours", "amount"):
+                if abs(exp[field] - act[field]) > DRIFT_TOLERANCE:
+                    problems.append(f"{kind} {key!r}: {field} rollup={act[field]} actual={exp[field]}")
+
+    # the raw stored sums: rounding them first would hide (or add) up to half a unit of drift
+    compare("member", member_totals_by_member(db), member_totals(db, digits=None))
+    compare("category", category_totals_by_category(db), category_totals(db, digits=None))
+    return problems
+
+
+def _totals(row, digits: Optional[int]) -> Dict[str, float]:
+    hours, amount = float(row.hours), float(row.amount)
+    if digits is not None:
+        # + 0.0 turns a rounded -0.0 into 0.0
+        hours, amount = round(hours, digits) + 0.0, round(amount, digits) + 0.0
+    return {"hours": hours, "amount": amount}
+
+
+def member_totals(db: Session, digits: Optional[int] = ROUND_DIGITS) -> Dict[int, Dict[str, float]]:
+    return {int(row.member_id): _totals(row, digits) for row in db.query(MemberTotal).all()}
+
+
+def member_total(db: Session, member_id: int) -> Dict[str, float]:
+    row = db.get(MemberTotal, member_id)
+    if row is None:
+        return {"hours": 0.0, "amount": 0.0}
+    return _totals(row, ROUND_DIGITS)
+
+
+def category_totals(db: Session, digits: Optional[int] = ROUND_DIGITS) -> Dict[str, Dict[str, float]]:
+    return {str(row.category): _totals(row, digits) for row in db.query(CategoryTotal).all()}
+
+
+def unreported_members(db: Session) -> Query:
+    """Members with nothing reported (no rollup row, or only zeros), by name."""
+    return (
+        db.query(Member)
+        .outerjoin(MemberTotal, MemberTotal.member_id == Member.id)
+        .filter(or_(
+            MemberTotal.member_id == None,
+            and_(func.round(MemberTotal.hours, ROUND_DIGITS) <= 0, func.round(MemberTotal.amount, ROUND_DIGITS) <= 0),
+        ))
+        .order_by(Member.last_name, Member.first_name)
+    )
@@ -1,18 +1,43 @@
 from datetime import date, datetime
-from typing import List, Dict
+from types import SimpleNamespace
+from typing import List, Dict, Optional
 
-from fastapi import APIRouter, Depends, Request, HTTPException, BackgroundTasks, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, Request, HTTPException, UploadFile, File, Form
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import logging
+import uuid
+
+from .db import get_db, get_async_db, SessionLocal
+from .models import Activity, ImportJob, Member
+from .config import COUNCIL_TITLE
+from .categories import (
+    FAITH_ACTIVITIES,
+    FAMILY_ACTIVITIES,
+    COMMUNITY_ACTIVITIES,
+    LIFE_ACTIVITIES,
+    OTHER_QUANTITATIVE,
+    QUANTITY_EXCLUDE_HOURS,
+)
+from .reports import group_category_totals
+from .activity_store import save_activity, save_changed, load_member_values
+from . import rollups
+from . import write_behind
+from . import db_writer
+from . import member_import
+from . import import_jobs
+from . import outbox
+from . import email_template
+from . import mail_merge
+from . import member_cache
+from . import loop_monitor
+from . import report_snapshot
+from .member_cache import MemberSnapshot
 
-from .db import get_db
-from .models import Activity, Member
-from .config import COUNCIL_TITLE, EMAIL_TEXT
-
-from .email_sender import EMailSender
 from dotenv import load_dotenv
 import os
 
@@ -23,80 +48,24 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-# Detailed Form 1728 Section 1 activities grouped as in prompts.txt
-FAITH_ACTIVITIES: List[str] = [
-    "Refund Support Vocations Program",
-    "Church Facilities",
-    "Catholic Schools/Seminaries",
-    "Religious/Vocations Education",
-    "Prayer & Study Programs",
-    "Sacramental Gifts",
-    "Miscellaneous Faith Activities",
-]
-
-FAMILY_ACTIVITIES: List[str] = [
-    "Food for Families",
-    "Family Formation Programs",
-    "Keep Christ in Christmas",
-    "Family Week",
-    "Family Prayer Night",
-    "Miscellaneous Family Programs",
-]
-
-COMMUNITY_ACTIVITIES: List[str] = [
-    "Coats For Kids",
-    "Global Wheelchair Mission",
-    "Habitat for Humanity",
-    "Disaster Preparedness/Relief",
-    "Physically Disabled/Intellectual Disabilities",
-    "Elderly/Widow(er) Care",
-    "Hospitals/Health Organizations",
-    "Columbian Squires",
-    "Scouting/Youth Groups",
-    "Athletics",
-    "Youth Welfare/Service",
-    "Scholarships/Education",
-    "Veteran Military/VAVS",
-    "Miscellaneous Community/Youth Activities",
-]
-
-LIFE_ACTIVITIES: List[str] = [
-    "Special Olympics",
-    "Marches for Life",
-    "Ultrasound Initiative",
-    "Pregnancy Center Support",
-    "Christian Refugee Relief",
-    "Memorials to Unborn Children",
-    "Miscellaneous Life Activities",
-]
-
-OTHER_QUANTITATIVE: List[str] = [
-    "Visits to the Sick",
-    "Visits to the Bereaved",
-    "Number of Blood Donations",
-    "Masses Held for Members",
-    "Hours of Fraternal Service to Sick/Disabled Members and their Families",
-]
-
-# Items which are quantities (counts) and should NOT be counted as volunteer hours
-QUANTITY_EXCLUDE_HOURS: List[str] = [
-    "Visits to the Sick",
-    "Visits to the Bereaved",
-    "Number of Blood Donations",
-    "Masses Held for Members",
-]
-
-# For simplicity we still store all metrics in the Activity table, using
-# category as the exact label from above. For OTHER_QUANTITATIVE rows we
-# store the quantity in Activity.hours and leave amount at 0.
-
-def get_current_member(request: Request, db: Session) -> Member | None:
+
+def get_current_member(request: Request, db: Session) -> MemberSnapshot | None:
     # access the session via request.scope to avoid AssertionError if middleware not installed
     sess = request.scope.get("session") or {}
     user_id = sess.get("user_id")
     if not user_id:
         return None
-    return db.query(Member).filter(Member.id == user_id).first()
+    # cached snapshot; see app/member_cache.py for what invalidates it
+    return member_cache.get_member(db, int(user_id))
+
+
+async def get_current_member_async(request: Request, db: AsyncSession) -> MemberSnapshot | None:
+    """get_current_member for routes using get_async_db; a cache hit doesn't touch the database."""
+    sess = request.scope.get("session") or {}
+    user_id = sess.get("user_id")
+    if not user_id:
+        return None
+    return await db.run_sync(member_cache.get_member, int(user_id))
 
 
 def require_admin(member: Member | None) -> None:
@@ -104,31 +73,37 @@ def require_admin(member: Member | None) -> None:
         raise HTTPException(status_code=403, detail="Admin access required")
 
 
+def _activity_map(db: Session, member_id: int) -> Dict[str, SimpleNamespace]:
+    # {category: obj with .hours/.amount} for the activities form, including pending autosaves
+    values = write_behind.overlay(member_id, load_member_values(db, member_id))
+    return {cat: SimpleNamespace(hours=hours, amount=amount) for cat, (hours, amount) in values.items()}
+
+
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, db: Session = Depends(get_db)):
-    member = get_current_member(request, db)
+async def dashboard(request: Request, db: AsyncSession = Depends(get_async_db)):
+    member = await get_current_member_async(request, db)
     if not member:
         return RedirectResponse("/login", status_code=303)
 
-    activities = db.query(Activity).filter(Activity.member_id == member.id).all()
-    # Exclude quantity-only categories from the total volunteer hours
-    total_hours = sum(a.hours for a in activities if str(a.category) not in QUANTITY_EXCLUDE_HOURS)
-    total_amount = sum(a.amount for a in activities)
-
-    category_totals: Dict[str, Dict[str, float]] = {}
-    for a in activities:
-        cat = str(a.category)
-        category_totals.setdefault(cat, {"hours": 0.0, "amount": 0.0})
-        category_totals[cat]["hours"] += a.hours
-        category_totals[cat]["amount"] += a.amount
-
-    grouped = {
-        "Faith": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in FAITH_ACTIVITIES],
-        "Family": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in FAMILY_ACTIVITIES],
-        "Community": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in COMMUNITY_ACTIVITIES],
-        "Life": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in LIFE_ACTIVITIES],
-        "Other": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in OTHER_QUANTITATIVE],
+    member_id = int(getattr(member, "id"))
+    stored = await db.run_sync(load_member_values, member_id)
+    values = write_behind.overlay(member_id, stored)
+    if values is stored:
+        # Totals come from the member_totals rollup (quantity-only categories already excluded)
+        totals = await db.run_sync(rollups.member_total, member_id)
+    else:
+        # Pending write-behind autosaves aren't in the rollup yet; add up the member's own lines
+        totals = {
+            "hours": sum(h for cat, (h, a) in values.items() if cat not in QUANTITY_EXCLUDE_HOURS),
+            "amount": sum(a for h, a in values.values()),
+        }
+    total_hours = totals["hours"]
+    total_amount = totals["amount"]
+
+    category_totals: Dict[str, Dict[str, float]] = {
+        cat: {"hours": hours, "amount": amount} for cat, (hours, amount) in values.items()
     }
+    grouped = group_category_totals(category_totals)
 
     return templates.TemplateResponse(
         "member/dashboard.html",
@@ -149,8 +124,7 @@ async def activities_get(request: Request, db: Session = Depends(get_db)):
     if not member:
         return RedirectResponse("/login", status_code=303)
 
-    activities = db.query(Activity).filter(Activity.member_id == member.id).all()
-    activity_map = {str(a.category): a for a in activities}
+    activity_map = _activity_map(db, int(getattr(member, "id")))
 
     return templates.TemplateResponse(
         "member/activities.html",
@@ -170,14 +144,16 @@ async def activities_get(request: Request, db: Session = Depends(get_db)):
 
 
 @router.post("/activities")
-async def activities_post(request: Request, db: Session = Depends(get_db)):
-    member = get_current_member(request, db)
+async def activities_post(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # same writes as the autosave routes; a sync Session here would hold the
+    # event loop while an AsyncSession write waits on it for the database lock
+    member = await get_current_member_async(request, db)
     if not member:
         return RedirectResponse(url="/login", status_code=303)
 
     form = await request.form()
 
-    def upsert(category: str, hours_raw: str, amount_raw: str, quantity_only: bool = False):
+    def parse(category: str, hours_raw: str, amount_raw: str, quantity_only: bool = False):
         try:
             if quantity_only:
                 hours = float(hours_raw or "0")
@@ -189,43 +165,32 @@ async def activities_post(request: Request, db: Session = Depends(get_db)):
             raise ValueError("invalid")
         if hours < 0 or amount < 0:
             raise ValueError("negative")
-
-        existing = (
-            db.query(Activity)
-            .filter(Activity.member_id == member.id, Activity.category == category)
-            .first()
-        )
-        if existing:
-            existing.hours = hours
-            existing.amount = amount
-            existing.date = date.today()
-        else:
-            if hours > 0 or amount > 0:
-                db.add(
-                    Activity(
-                        member_id=member.id,
-                        category=category,
-                        description=f"Form 1728 Section 1 - {category}",
-                        date=date.today(),
-                        hours=hours,
-                        amount=amount,
-                    )
-                )
+        return category, hours, amount
 
     try:
+        # Validate the whole form before touching the database
+        submitted = []
         for category in FAITH_ACTIVITIES + FAMILY_ACTIVITIES + COMMUNITY_ACTIVITIES + LIFE_ACTIVITIES:
             hours_key = f"hours_{category}"
             amount_key = f"amount_{category}"
-            upsert(category, form.get(hours_key, "0"), form.get(amount_key, "0"), quantity_only=False)
+            submitted.append(parse(category, form.get(hours_key, "0"), form.get(amount_key, "0"), quantity_only=False))
 
         for category in OTHER_QUANTITATIVE:
             qty_key = f"qty_{category}"
-            upsert(category, form.get(qty_key, "0"), "0", quantity_only=True)
-
-        db.commit()
+            submitted.append(parse(category, form.get(qty_key, "0"), "0", quantity_only=True))
+
+        # One SELECT for what's stored, one bulk upsert for what changed
+        member_id = int(getattr(member, "id"))
+        if write_behind.enabled():
+            # the submitted form is the newest state; don't let older buffered autosaves
+            # overwrite it (waits for a flush in progress, hence the threadpool)
+            await run_in_threadpool(write_behind.buffer.discard_member, member_id)
+        if db_writer.enabled():
+            await db_writer.run(save_changed, member_id, submitted)
+        elif await db.run_sync(save_changed, member_id, submitted):
+            await db.commit()
     except ValueError as e:
-        activities = db.query(Activity).filter(Activity.member_id == member.id).all()
-        activity_map = {str(a.category): a for a in activities}
+        activity_map = await db.run_sync(_activity_map, int(getattr(member, "id")))
         msg = "Please enter valid numbers for all fields." if str(e) == "invalid" else "Values must be non-negative."
         return templates.TemplateResponse(
             "member/activities.html",
@@ -247,42 +212,14 @@ async def activities_post(request: Request, db: Session = Depends(get_db)):
     return RedirectResponse("/dashboard", status_code=303)
 
 
-@router.get("/admin/report", response_class=HTMLResponse)
-async def admin_report(request: Request, db: Session = Depends(get_db)):
-    member = get_current_member(request, db)
-    require_admin(member)
-
-    activities = db.query(Activity).all()
-
-    # Aggregate across all members by category
-    category_totals: Dict[str, Dict[str, float]] = {}
-    for a in activities:
-        cat = str(a.category)
-        category_totals.setdefault(cat, {"hours": 0.0, "amount": 0.0})
-        category_totals[cat]["hours"] += a.hours
-        category_totals[cat]["amount"] += a.amount
-
-    grouped = {
-        "Faith": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in FAITH_ACTIVITIES],
-        "Family": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in FAMILY_ACTIVITIES],
-        "Community": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in COMMUNITY_ACTIVITIES],
-        "Life": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in LIFE_ACTIVITIES],
-        "Other": [(label, category_totals.get(label, {"hours": 0.0, "amount": 0.0})) for label in OTHER_QUANTITATIVE],
-    }
+def _report_data(db: Session) -> Dict:
+    """Everything the admin report reads, in one pass over the rollup tables."""
+    # Read from the rollup tables; one row per category / per member
+    grouped = group_category_totals(rollups.category_totals(db))
 
     # Per-member aggregates
     members = db.query(Member).order_by(Member.last_name, Member.first_name).all()
-    member_totals: Dict[int, Dict[str, float]] = {int(getattr(m, "id")): {"hours": 0.0, "amount": 0.0} for m in members}
-    for a in activities:
-        mid = int(getattr(a, "member_id"))
-        if mid not in member_totals:
-            # skip activities for members not in list (shouldn't happen)
-            continue
-        # Only add to hours if this category represents hours, not a quantity-only item
-        if str(a.category) not in QUANTITY_EXCLUDE_HOURS:
-            member_totals[mid]["hours"] += a.hours
-        # amounts are always monetary
-        member_totals[mid]["amount"] += a.amount
+    member_totals = rollups.member_totals(db)
 
     # Build a server-side list of member_numbers for members who have reported
     member_numbers: List[str] = []
@@ -293,21 +230,55 @@ async def admin_report(request: Request, db: Session = Depends(get_db)):
         if hours <= 0 and amount <= 0:
             member_numbers.append(str(getattr(m, "member_number")))
 
+    return {
+        "grouped": grouped,
+        "members": members,
+        "member_totals": member_totals,
+        "not_reported": member_numbers,
+    }
+
+
+@router.get("/admin/report", response_class=HTMLResponse)
+async def admin_report(request: Request, db: AsyncSession = Depends(get_async_db)):
+    member = await get_current_member_async(request, db)
+    require_admin(member)
+
+    snapshot = None
+    if report_snapshot.enabled():
+        # an in-memory copy, so the report's reads never compete with autosave commits
+        snapshot = await run_in_threadpool(report_snapshot.snapshots.get)
+        report = await run_in_threadpool(snapshot.read, _report_data)
+    else:
+        if write_behind.enabled():
+            # report totals come from the rollups, so write out buffered autosaves first
+            await run_in_threadpool(write_behind.buffer.flush)
+        report = await db.run_sync(_report_data)
+
     return templates.TemplateResponse(
         "admin/report.html",
         {
             "request": request,
             "member": member,
             "council_title": COUNCIL_TITLE,
-            "grouped": grouped,
-            "members": members,
-            "member_totals": member_totals,
-            "not_reported": member_numbers,
+            **report,
+            # live: the notify-all progress shouldn't wait for the next snapshot
+            "outbox_counts": await db.run_sync(outbox.status_counts),
+            "snapshot": snapshot,
+            "snapshot_max_age": report_snapshot.snapshots.max_age,
         },
     )
 
+def _email_template() -> email_template.CompiledTemplate:
+    """The compiled notification template (cached until the file changes)."""
+    try:
+        return email_template.load()
+    except FileNotFoundError:
+        # Provide a clear error to the admin/user instead of crashing the server
+        raise HTTPException(status_code=500, detail=f"Email template not found: {email_template.template_path()}")
+
+
 @router.post('/admin/notify/{member_number}')
-async def admin_notify_member(member_number: str, request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def admin_notify_member(member_number: str, request: Request, db: Session = Depends(get_db)):
     member = get_current_member(request, db)
     require_admin(member)
 
@@ -315,50 +286,124 @@ async def admin_notify_member(member_number: str, request: Request, background_t
     if not target_member:
         raise HTTPException(status_code=404, detail="Member not found")
 
+    template = _email_template()
+
     # Determine if target has a valid access_code
     access_code = target_member.access_code
     if not access_code or access_code.strip() == "":
         # If not, generate and assign a new one
         from .access_code import AccessCode
         ac = AccessCode(db)
-        # ensure we pass a plain int to satisfy the type checker
-        access_code = ac.assign_access_code(int(getattr(target_member, "id")))
+        # ensure we pass a plain int to satisfy the type checker; on the threadpool because
+        # the commit may wait for the cross-process writer lock (DB_WRITER)
+        access_code = await run_in_threadpool(ac.assign_access_code, int(getattr(target_member, "id")))
 
     target_member_email = target_member.email
-    email_template_file_path = os.getenv("EMAIL_TEXT", EMAIL_TEXT)
-    # expand ~ and environment variables and resolve to absolute path
-    email_template_file_path = os.path.expanduser(os.path.expandvars(email_template_file_path))
-    if not os.path.isabs(email_template_file_path):
-        email_template_file_path = os.path.abspath(email_template_file_path)
+    email_text = template.render(email_template.member_values(target_member, access_code))
 
-    if not os.path.exists(email_template_file_path):
-        # Provide a clear error to the admin/user instead of crashing the server
-        raise HTTPException(status_code=500, detail=f"Email template not found: {email_template_file_path}")
+    # load email subject from environment or use default
+    email_subject = os.getenv('EMAIL_SUBJECT', f"Notification from {COUNCIL_TITLE}")
 
-    # load email-notification template (utf-8)
-    with open(email_template_file_path, "r", encoding="utf-8") as f:
-        email_text = f.read()
+    # Queue in the outbox; the outbox worker sends it (with retries) after the commit
+    outbox.enqueue(db, str(target_member.member_number), str(target_member_email), email_subject, email_text)
+    return { "status": "ok" }
 
-    # replace {name} placeholder with member's name
-    email_text = email_text.replace("{name}", f"{target_member.first_name} {target_member.last_name}")
-    email_text = email_text.replace('{last_name}', target_member.last_name or "")
-    email_text = email_text.replace('{url}', os.getenv('URL', 'http://localhost:8000'))
-    email_text = email_text.replace("{access_code}", access_code)
+@router.post('/admin/notify-all')
+def admin_notify_all(request: Request, db: Session = Depends(get_db)):
+    """Queue a notification for every member who hasn't reported, as one outbox batch.
 
-    # load email subject from environment or use default
-    email_subject = os.getenv('EMAIL_SUBJECT', f"Notification from {COUNCIL_TITLE}")
+    Returns the batch id; progress is at /admin/notify-all/{batch_id}.
+    A plain def: rendering and queueing hundreds of messages runs on the
+    threadpool, not the event loop.
+    """
+    member = get_current_member(request, db)
+    require_admin(member)
+    # before any access code is changed
+    template = _email_template()
+
+    # non-reporters in one query: no rollup row, or nothing but zeros
+    targets = rollups.unreported_members(db).all()
+    with_email = [m for m in targets if (m.email or "").strip()]
 
-    es = EMailSender()
-    # Schedule synchronous send in background to avoid blocking the request
-    # es.send_email(str(target_member_email), email_subject, email_text, False)
-    background_tasks.add_task(
-        es.send_email,
-        str(target_member_email),
-        email_subject,
-        email_text,
-        False
+    # one bulk UPDATE for everyone still missing an access code
+    missing = [int(m.id) for m in with_email if not (m.access_code or "").strip()]
+    codes = {}
+    if missing:
+        from .access_code import AccessCode
+        codes = AccessCode(db).assign_access_codes(missing)
+
+    base = email_template.base_values()
+    email_subject = os.getenv('EMAIL_SUBJECT', f"Notification from {COUNCIL_TITLE}")
+    batch_id = uuid.uuid4().hex
+    bodies = template.render_many(
+        email_template.member_values(m, codes.get(int(m.id)) or m.access_code, base) for m in with_email
     )
-    return { "status": "ok" }
+    queued = outbox.enqueue_many(
+        db,
+        (
+            {"member_number": str(m.member_number), "to_address": m.email.strip(), "subject": email_subject, "body": body}
+            for m, body in zip(with_email, bodies)
+        ),
+        batch_id=batch_id,
+    )
+    return {
+        "status": "ok",
+        "batch_id": batch_id,
+        "queued": queued,
+        "member_numbers": [str(m.member_number) for m in with_email],
+        "skipped_no_email": len(targets) - len(with_email),
+    }
+
+
+@router.get('/admin/notify-all/{batch_id}')
+async def admin_notify_all_status(batch_id: str, request: Request, db: Session = Depends(get_db)):
+    member = get_current_member(request, db)
+    require_admin(member)
+    counts = outbox.status_counts(db, batch_id=batch_id)
+    if not any(counts.values()):
+        raise HTTPException(status_code=404, detail="Notification batch not found")
+    return {"batch_id": batch_id, "total": sum(counts.values()), **counts}
+
+@router.post('/admin/mail-merge')
+async def admin_mail_merge(
+    request: Request,
+    format: str = Form("mbox"),
+    members: str = Form("unreported"),
+    db: Session = Depends(get_db),
+):
+    """Download the notification emails as an mbox file or a zip of .eml files."""
+    member = get_current_member(request, db)
+    require_admin(member)
+    if format not in mail_merge.FORMATS or members not in mail_merge.SELECTIONS:
+        raise HTTPException(status_code=400, detail="Unknown export format or member selection")
+    _email_template()  # fail with a clear error before the download starts
+
+    def stream():
+        # the request's session is closed once the response starts, so the export gets its own
+        export_db = SessionLocal()
+        try:
+            yield from mail_merge.export(export_db, format, members)
+        finally:
+            export_db.close()
+
+    media_type = "application/zip" if format == "zip" else "application/mbox"
+    headers = {"Content-Disposition": f'attachment; filename="{mail_merge.filename(format, members)}"'}
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
+
+@router.get('/admin/cache-stats')
+async def admin_cache_stats(request: Request, db: Session = Depends(get_db)):
+    """Hit/miss counters of the in-process member cache."""
+    member = get_current_member(request, db)
+    require_admin(member)
+    return {"member_cache": member_cache.cache.stats()}
+
+
+@router.get('/admin/loop-stats')
+async def admin_loop_stats(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Event-loop lag percentiles, in-flight requests and recent stalls with their stacks."""
+    member = await get_current_member_async(request, db)
+    require_admin(member)
+    return {"event_loop": loop_monitor.monitor.stats()}
 
 @router.post('/admin/remove_member_record/{member_number}')
 async def admin_remove_member_record(member_number: str, request: Request, db: Session = Depends(get_db)):
@@ -376,147 +421,139 @@ async def admin_remove_member_record(member_number: str, request: Request, db: S
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to remove member record: {e}")
+    member_cache.invalidate(int(target_member.id))
     return RedirectResponse("/admin/report", status_code=303)
 
-@router.get("/import/membership", response_class=HTMLResponse)
-async def import_members_get(request: Request, db: Session = Depends(get_db)):
-    member = get_current_member(request, db)
-#    require_admin(member)
+def _import_page(request: Request, member, error=None, result=None, plan=None, staged=None, job=None, status_code: int = 200):
     return templates.TemplateResponse(
         "admin/import_members.html",
         {
             "request": request,
             "member": member,
             "council_title": COUNCIL_TITLE,
-            "error": None,
-            "result": None,
+            "error": error,
+            "result": result,
+            "plan": plan,
+            "staged": staged,
+            "job": job,
         },
+        status_code=status_code,
     )
 
 
-@router.post("/import/membership", response_class=HTMLResponse)
-async def import_members_post(request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Upload a CSV, truncate the members table, and import new members.
+@router.get("/import/membership", response_class=HTMLResponse)
+async def import_members_get(request: Request, db: Session = Depends(get_db)):
+    member = get_current_member(request, db)
+#    require_admin(member)
+    # pick up the progress of an import that is still running, or one that left a partial roster
+    job = import_jobs.active_job(db) or import_jobs.latest_partial_replace(db)
+    return _import_page(request, member, job=job)
+
+
+def _plan_from_file(db: Session, path: str, extension: str):
+    """Plan a differential sync from a staged file without writing. Returns (plan, error)."""
+    with open(path, "rb") as f:
+        fieldnames, rows = member_import.open_roster(f, extension)
+        missing_cols = member_import.missing_columns(fieldnames)
+        if missing_cols:
+            return None, f"Missing required columns in file: {', '.join(missing_cols)}"
+        return member_import.plan_sync(db, rows, fieldnames), None
+
+
+def _check_columns(path: str, extension: str):
+    """Read just the header of a staged file. Returns an error message or None."""
+    with open(path, "rb") as f:
+        fieldnames, _ = member_import.open_roster(f, extension)
+    missing_cols = member_import.missing_columns(fieldnames)
+    if missing_cols:
+        return f"Missing required columns in file: {', '.join(missing_cols)}"
+    return None
 
-    Expected CSV headers (at minimum): member_number, first_name, last_name
-    Optional headers: mobile_phone, email, access_code, is_admin
+
+@router.post("/import/membership", response_class=HTMLResponse)
+async def import_members_post(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: str = Form("replace"),
+    dry_run: bool = Form(False),
+    db: Session = Depends(get_db),
+):
+    """Upload a roster (.csv or .xlsx) and queue it for import.
+
+    Expected headers (at minimum): Membership Number, First Name, Last Name,
+    Cell Phone, Primary Email. Optional headers: access_code, is_admin.
+    For .xlsx the first sheet is used and its first row holds the headers.
+
+    mode=replace truncates the members table and reloads it. mode=sync only
+    applies the inserts/updates/deletes needed, keyed on Membership Number;
+    with dry_run the diff is shown for confirmation before anything is written.
+    Imports run as background jobs (see app.import_jobs); the page polls
+    /import/jobs/{id} for progress.
     """
     member = get_current_member(request, db)
 
-    if not file.filename.lower().endswith(".csv"):
-        return templates.TemplateResponse(
-            "admin/import_members.html",
-            {
-                "request": request,
-                "member": member,
-                "council_title": COUNCIL_TITLE,
-                "error": "Please upload a .csv file",
-                "result": None,
-            },
-            status_code=400,
-        )
-
-    import io
-    import csv
+    extension = member_import.roster_extension(file.filename)
+    if extension is None:
+        return _import_page(request, member, error="Please upload a .csv or .xlsx file", status_code=400)
+    if mode not in ("replace", "sync"):
+        return _import_page(request, member, error=f"Unknown import mode: {mode}", status_code=400)
 
-    content = await file.read()
+    staged = await run_in_threadpool(member_import.stage_upload, file.file, extension)
+    path = member_import.staged_path(staged, extension)
     try:
-        text = content.decode("utf-8-sig")
-    except Exception:
-        text = content.decode("utf-8", errors="replace")
+        if mode == "sync" and dry_run:
+            # keep the upload so the admin can apply exactly this file after reviewing the diff
+            plan, error = await run_in_threadpool(_plan_from_file, db, path, extension)
+        else:
+            plan, error = None, await run_in_threadpool(_check_columns, path, extension)
+    except Exception as e:
+        os.remove(path)
+        return _import_page(request, member, error=f"Could not read {file.filename}: {e}", status_code=400)
+    if error:
+        os.remove(path)
+        return _import_page(request, member, error=error, status_code=400)
+    if plan is not None:
+        return _import_page(request, member, result=plan.result, plan=plan, staged=staged)
 
-    reader = csv.DictReader(io.StringIO(text))
+    job = import_jobs.create_job(db, staged, file.filename, extension, mode)
+    return _import_page(request, member, job=job)
 
-    # Basic validation of required columns
-    required_cols = ["Membership Number", "First Name", "Last Name", "Cell Phone", "Primary Email"]
-    missing_cols = [c for c in required_cols if c not in (reader.fieldnames or [])]
-    if missing_cols:
-        return templates.TemplateResponse(
-            "admin/import_members.html",
-            {
-                "request": request,
-                "member": member,
-                "council_title": COUNCIL_TITLE,
-                "error": f"Missing required columns in CSV: {', '.join(missing_cols)}",
-                "result": None,
-            },
-            status_code=400,
-        )
 
-    # Truncate existing members table
+@router.post("/import/membership/apply", response_class=HTMLResponse)
+async def import_members_apply(request: Request, staged: str = Form(...), db: Session = Depends(get_db)):
+    """Apply a sync that was previewed with dry_run. The diff is recomputed against the current table."""
+    member = get_current_member(request, db)
     try:
-        db.query(Member).delete()
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to truncate members table: {e}")
-
-    imported = 0
-    skipped = 0
-    errors = []
-
-    for i, row in enumerate(reader, start=1):
-        # skip entirely empty rows
-        if not any((v or "").strip() for v in row.values()):
-            skipped += 1
-            continue
+        found = member_import.find_staged(staged)
+    except ValueError:
+        return _import_page(request, member, error="Invalid import reference", status_code=400)
+    if found is None or db.get(ImportJob, staged) is not None:
+        return _import_page(request, member, error="This import was already applied or has expired; please upload the file again", status_code=400)
+    _, extension = found
 
-        try:
-            m = Member(
-                member_number=(row.get("Membership Number") or "").strip(),
-                first_name=(row.get("First Name") or "").strip(),
-                last_name=(row.get("Last Name") or "").strip(),
-                mobile_phone=(row.get("Cell Phone") or "").strip(),
-                email=(row.get("Primary Email") or "").strip(),
-            )
-
-            # optional fields
-            if "access_code" in (reader.fieldnames or []):
-                try:
-                    if hasattr(m, "access_code"):
-                        m.access_code = (row.get("access_code") or "").strip() or None
-                except Exception:
-                    pass
-
-            if "is_admin" in (reader.fieldnames or []):
-                val = (row.get("is_admin") or "").strip().lower()
-                if val in ("1", "true", "yes", "y"):
-                    try:
-                        if hasattr(m, "is_admin"):
-                            m.is_admin = True
-                    except Exception:
-                        pass
-
-            db.add(m)
-            imported += 1
-        except Exception as e:
-            errors.append(f"Row {i}: {e}")
+    job = import_jobs.create_job(db, staged, f"{staged}{extension}", extension, "sync")
+    return _import_page(request, member, job=job)
 
-    try:
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to commit imported members: {e}")
 
-    # now set the access_codes for those members missing one
-    from .access_code import AccessCode
-    ac = AccessCode(db)
-    members_without_ac = db.query(Member).filter((Member.access_code == None) | (Member.access_code == "")).all()
-    for m in members_without_ac:
-        ac.assign_access_code(int(getattr(m, "id")))
+@router.post("/import/jobs/{job_id}/retry", response_class=HTMLResponse)
+async def import_job_retry(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Queue a failed import again; a replace resumes after its last committed row."""
+    member = get_current_member(request, db)
+    if import_jobs.active_job(db) is not None:
+        return _import_page(request, member, error="Another import is still running", status_code=409)
+    job = import_jobs.retry_job(db, job_id)
+    if job is None:
+        return _import_page(request, member, error="This import can't be retried; please upload the file again", status_code=400)
+    return _import_page(request, member, job=job)
 
-    result = {"imported": imported, "skipped": skipped, "errors": errors}
 
-    return templates.TemplateResponse(
-        "admin/import_members.html",
-        {
-            "request": request,
-            "member": member,
-            "council_title": COUNCIL_TITLE,
-            "error": None,
-            "result": result,
-        },
-    )
+@router.get("/import/jobs/{job_id}")
+async def import_job_status(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Progress of a background import, polled by the import page."""
+    job = db.get(ImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return JSONResponse(import_jobs.job_status(job))
 
 
 @router.get("/static/{filename}", response_class=HTMLResponse)
@@ -540,11 +577,56 @@ async def admin_promote_member(request: Request, member_number: str = Form(...),
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to promote member: {e}")
+    member_cache.invalidate(int(target_member.id))
 
     return RedirectResponse("/dashboard", status_code=303)
 
+def parse_activity_payload(payload: dict):
+    """Validate one autosave item and return (category, hours, amount, quantity_only).
+
+    Raises ValueError with the error code sent back to the browser
+    ("missing_category", "invalid_number" or "negative_value").
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("invalid_json")
+    category = payload.get("category")
+    if not category:
+        raise ValueError("missing_category")
+
+    quantity_only = bool(payload.get("quantity_only", False))
+
+    # parse numeric inputs defensively
+    def to_float(v):
+        try:
+            if v is None or v == "":
+                return 0.0
+            return float(v)
+        except Exception:
+            raise ValueError("invalid_number")
+
+    if quantity_only:
+        hours = to_float(payload.get("hours", 0))
+        amount = 0.0
+    else:
+        hours = to_float(payload.get("hours", 0))
+        amount = to_float(payload.get("amount", 0))
+
+    if hours < 0 or amount < 0:
+        raise ValueError("negative_value")
+    return str(category), hours, amount, quantity_only
+
+
+def _client_ip(request: Request) -> str:
+    # Determine client IP (respect CF and X-Forwarded-For headers)
+    client_ip = request.headers.get("CF-Connecting-IP") or request.headers.get("X-Forwarded-For")
+    if client_ip:
+        return client_ip.split(",")[0].strip()
+    client = getattr(request, 'client', None)
+    return client.host if client else 'unknown'
+
+
 @router.post('/api/activity-update')
-async def api_activity_update(request: Request, db: Session = Depends(get_db)):
+async def api_activity_update(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Receive JSON updates for a single activity and upsert into the Activity table for the current member.
 
     Expected JSON shape:
@@ -555,7 +637,7 @@ async def api_activity_update(request: Request, db: Session = Depends(get_db)):
         "quantity_only": false  # optional, true if this is a quantity-only field
     }
     """
-    member = get_current_member(request, db)
+    member = await get_current_member_async(request, db)
     if not member:
         return JSONResponse({"error": "not_authenticated"}, status_code=401)
 
@@ -564,70 +646,25 @@ async def api_activity_update(request: Request, db: Session = Depends(get_db)):
     except Exception:
         return JSONResponse({"error": "invalid_json"}, status_code=400)
 
-    category = payload.get("category")
-    if not category:
-        return JSONResponse({"error": "missing_category"}, status_code=400)
-
-    quantity_only = bool(payload.get("quantity_only", False))
-
-    # parse numeric inputs defensively
-    def to_float(v):
-        try:
-            if v is None or v == "":
-                return 0.0
-            return float(v)
-        except Exception:
-            raise ValueError("invalid_number")
-
     try:
-        if quantity_only:
-            hours = to_float(payload.get("hours", 0))
-            amount = 0.0
-        else:
-            hours = to_float(payload.get("hours", 0))
-            amount = to_float(payload.get("amount", 0))
-    except ValueError:
-        return JSONResponse({"error": "invalid_number"}, status_code=400)
-
-    if hours < 0 or amount < 0:
-        return JSONResponse({"error": "negative_value"}, status_code=400)
-
-    existing = (
-        db.query(Activity)
-        .filter(Activity.member_id == member.id, Activity.category == category)
-        .first()
-    )
+        category, hours, amount, quantity_only = parse_activity_payload(payload)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
 
     try:
-        if existing:
-            existing.hours = hours
-            existing.amount = amount
-            existing.date = date.today()
+        if write_behind.enabled():
+            write_behind.buffer.put(int(getattr(member, "id")), category, hours, amount, create_empty=quantity_only)
+        elif db_writer.enabled():
+            await db_writer.run(save_activity, int(getattr(member, "id")), category, hours, amount, create_empty=quantity_only)
         else:
-            # Only create a new row if there's something to store (keep DB cleaner)
-            if hours > 0 or amount > 0 or quantity_only:
-                db.add(
-                    Activity(
-                        member_id=member.id,
-                        category=category,
-                        description=f"Form 1728 Section 1 - {category}",
-                        date=date.today(),
-                        hours=hours,
-                        amount=amount,
-                    )
-                )
-        db.commit()
+            # Single INSERT ... ON CONFLICT DO UPDATE; only creates a row if there's something to store
+            await db.run_sync(save_activity, int(getattr(member, "id")), category, hours, amount, create_empty=quantity_only)
+            await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return JSONResponse({"error": "db_error", "detail": str(e)}, status_code=500)
 
-    # Determine client IP (respect CF and X-Forwarded-For headers)
-    client_ip = request.headers.get("CF-Connecting-IP") or request.headers.get("X-Forwarded-For")
-    if client_ip:
-        client_ip = client_ip.split(",")[0].strip()
-    else:
-        client = getattr(request, 'client', None)
-        client_ip = client.host if client else 'unknown'
+    client_ip = _client_ip(request)
 
     # Log autosave details
     try:
@@ -652,15 +689,96 @@ async def api_activity_update(request: Request, db: Session = Depends(get_db)):
 
     return JSONResponse({"status": "ok", "saved_at": saved_at})
 
+@router.post('/api/activity-batch')
+async def api_activity_batch(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Apply several autosave updates for the current member in one transaction.
+
+    Expected JSON shape:
+    {
+        "updates": [
+            {"category": "Activity Label", "hours": 1.5, "amount": 10.0, "quantity_only": false},
+            ...
+        ]
+    }
+    Later entries for the same category win. Valid entries are saved even if
+    others are invalid; those come back as "errors": [{"category", "error"}]
+    (with a 400 if nothing was valid).
+    """
+    member = await get_current_member_async(request, db)
+    if not member:
+        return JSONResponse({"error": "not_authenticated"}, status_code=401)
+
+    try:
+        payload = await request.json()
+    except Exception:
+        return JSONResponse({"error": "invalid_json"}, status_code=400)
+
+    updates = payload.get("updates") if isinstance(payload, dict) else None
+    if not isinstance(updates, list) or not updates:
+        return JSONResponse({"error": "missing_updates"}, status_code=400)
+
+    latest: Dict[str, tuple] = {}
+    # quantity-only categories get a row even for zeros, as in /api/activity-update
+    quantity_only: Dict[str, bool] = {}
+    errors: Dict[Optional[str], str] = {}
+    for item in updates:
+        try:
+            category, hours, amount, qty_only = parse_activity_payload(item)
+        except ValueError as e:
+            category = item.get("category") if isinstance(item, dict) else None
+            category = str(category) if category else None
+            errors[category] = str(e)
+            latest.pop(category, None)
+            continue
+        errors.pop(category, None)
+        latest[category] = (category, hours, amount)
+        quantity_only[category] = qty_only
+    error_list = [{"category": category, "error": error} for category, error in errors.items()]
+    if not latest:
+        first = error_list[0]
+        return JSONResponse({"error": first["error"], "category": first["category"], "errors": error_list}, status_code=400)
+
+    member_id = int(getattr(member, "id"))
+    create_empty = [category for category in latest if quantity_only[category]]
+    try:
+        if write_behind.enabled():
+            for category, hours, amount in latest.values():
+                write_behind.buffer.put(member_id, category, hours, amount, create_empty=quantity_only[category])
+            changed = list(latest.values())
+        elif db_writer.enabled():
+            changed = await db_writer.run(save_changed, member_id, list(latest.values()), create_empty)
+        else:
+            changed = await db.run_sync(save_changed, member_id, latest.values(), create_empty)
+            if changed:
+                await db.commit()
+    except Exception as e:
+        await db.rollback()
+        return JSONResponse({"error": "db_error", "detail": str(e)}, status_code=500)
+
+    try:
+        logger.info(
+            "autosave batch: member_id=%s member=%s %s categories=%s changed=%s ip=%s",
+            member_id,
+            getattr(member, 'first_name', ''),
+            getattr(member, 'last_name', ''),
+            len(latest),
+            len(changed),
+            _client_ip(request),
+        )
+    except Exception:
+        logger.exception("Failed to log autosave batch")
+
+    from datetime import timezone
+    saved_at = datetime.now(timezone.utc).isoformat()
+
+    return JSONResponse({"status": "ok", "saved_at": saved_at, "saved": list(latest.keys()), "errors": error_list})
+
 @router.get('/admin/email-template', response_class=HTMLResponse)
 async def admin_email_template_get(request: Request, db: Session = Depends(get_db)):
     member = get_current_member(request, db)
     require_admin(member)
 
-    email_template_file_path = os.getenv('EMAIL_TEXT', EMAIL_TEXT)
-    email_template_file_path = os.path.expanduser(os.path.expandvars(email_template_file_path))
-    if not os.path.isabs(email_template_file_path):
-        email_template_file_path = os.path.abspath(email_template_file_path)
+    email_template_file_path = email_template.template_path()
 
     content = ''
     if os.path.exists(email_template_file_path):
@@ -686,10 +804,7 @@ async def admin_email_template_post(request: Request, db: Session = Depends(get_
     form = await request.form()
     content = form.get('content', '')
 
-    email_template_file_path = os.getenv('EMAIL_TEXT', EMAIL_TEXT)
-    email_template_file_path = os.path.expanduser(os.path.expandvars(email_template_file_path))
-    if not os.path.isabs(email_template_file_path):
-        email_template_file_path = os.path.abspath(email_template_file_path)
+    email_template_file_path = email_template.template_path()
 
     # Ensure directory exists
     dirpath = os.path.dirname(email_template_file_path)
@@ -706,6 +821,9 @@ async def admin_email_template_post(request: Request, db: Session = Depends(get_
         members = db.query(Member).order_by(Member.last_name, Member.first_name).all()
         return templates.TemplateResponse('admin/email_editor.html', { 'request': request, 'member': member, 'file_path': email_template_file_path, 'content': content, 'error': f'Failed to write file: {e}', 'success': None, 'members': members }, status_code=500)
 
+    # reload in every worker, even within the filesystem's timestamp resolution
+    email_template.invalidate(email_template_file_path)
+
     members = db.query(Member).order_by(Member.last_name, Member.first_name).all()
     return templates.TemplateResponse('admin/email_editor.html', { 'request': request, 'member': member, 'file_path': email_template_file_path, 'content': content, 'error': None, 'success': 'Template saved.', 'members': members })
 
@@ -725,17 +843,9 @@ async def admin_email_preview(request: Request, db: Session = Depends(get_db)):
     if not target_member:
         target_member = member
 
-    # prepare replacement map
-    mp = {
-        '{name}': f"{target_member.first_name or ''} {target_member.last_name or ''}".strip(),
-        '{last_name}': target_member.last_name or '',
-        '{url}': os.getenv('URL', 'http://localhost:8000'),
-        '{access_code}': getattr(target_member, 'access_code', '') or '[no access code]',
-    }
-
-    rendered = content
-    for k, v in mp.items():
-        rendered = rendered.replace(k, v)
+    # render the unsaved editor content the same way notifications are rendered
+    access_code = getattr(target_member, 'access_code', '') or '[no access code]'
+    rendered = email_template.compile_template(content).render(email_template.member_values(target_member, access_code))
 
     # Return a simple preview page
     return templates.TemplateResponse('admin/email_preview.html', { 'request': request, 'member': member, 'preview_for': target_member, 'rendered': rendered, 'raw': content })
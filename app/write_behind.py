@@ -0,0 +1,222 @@
+"""Optional write-behind buffer for autosave traffic.
+
+Autosaves normally commit (and fsync) one at a time. With WRITE_BEHIND=true
+the autosave endpoints only record the latest value per
+(member_id, category) here; a background thread writes everything pending
+in one transaction every WRITE_BEHIND_FLUSH_MS, or sooner once
+WRITE_BEHIND_MAX_PENDING entries are waiting. The buffer is flushed on
+shutdown, and member pages overlay pending values so a member always sees
+what they just typed.
+
+If a bulk flush fails, "database is locked"/"busy" errors put the batch
+back for the next flush; anything else is retried entry by entry, and
+entries that still fail (e.g. the member was deleted meanwhile) are
+dropped and logged so one bad entry can't hold up everyone else's.
+
+Pending values live in this process only. With several workers, a
+member's next page load may hit another worker that hasn't seen them
+until the next flush (at most WRITE_BEHIND_FLUSH_MS later).
+"""
+import logging
+import threading
+from typing import Callable, Dict, Tuple
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import db_writer
+from .activity_store import save_many
+from .config import WRITE_BEHIND, WRITE_BEHIND_FLUSH_MS, WRITE_BEHIND_MAX_PENDING
+from .db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# (member_id, category) -> (hours, amount, create_empty)
+PendingKey = Tuple[int, str]
+PendingValue = Tuple[float, float, bool]
+
+
+def _transient(error: Exception) -> bool:
+    """True for lock contention, which is worth retrying as-is."""
+    if not isinstance(error, OperationalError):
+        return False
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_ms: int = WRITE_BEHIND_FLUSH_MS,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = max(flush_ms, 1) / 1000.0
+        self.max_pending = max_pending
+        self._pending: Dict[PendingKey, PendingValue] = {}
+        self._lock = threading.Lock()
+        # serialises flushes so an explicit flush() and the thread never overlap
+        self._flush_lock = threading.Lock()
+        # members discarded while the current flush runs; its retries must not bring them back
+        self._discarded = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Write-behind autosave buffer started (flush every %sms or %s entries)",
+            int(self.flush_interval * 1000),
+            self.max_pending,
+        )
+
+    def stop(self) -> None:
+        """Stop the flush thread and write out anything still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def put(self, member_id: int, category: str, hours: float, amount: float, create_empty: bool = False) -> None:
+        with self._lock:
+            self._pending[(member_id, category)] = (hours, amount, create_empty)
+            size = len(self._pending)
+        if size >= self.max_pending:
+            self._wake.set()
+
+    def pending_for(self, member_id: int) -> Dict[str, Tuple[float, float]]:
+        """Return {category: (hours, amount)} not yet written for a member."""
+        with self._lock:
+            return {
+                category: (hours, amount)
+                for (mid, category), (hours, amount, _) in self._pending.items()
+                if mid == member_id
+            }
+
+    def discard_member(self, member_id: int) -> None:
+        """Forget pending values for a member (e.g. the full form is being saved).
+
+        Blocks until a flush in progress has finished, so none of the
+        member's older values can be committed after the caller's save.
+        """
+        with self._lock:
+            for key in [k for k in self._pending if k[0] == member_id]:
+                del self._pending[key]
+            self._discarded.add(member_id)
+        with self._flush_lock:
+            pass
+
+    def flush(self) -> int:
+        """Write everything pending in one transaction. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._discarded = set()
+            if not batch:
+                return 0
+
+            db = self.session_factory()
+            try:
+                with db_writer.exclusive():
+                    written = save_many(
+                        db,
+                        ((mid, category, hours, amount, create_empty)
+                         for (mid, category), (hours, amount, create_empty) in batch.items()),
+                    )
+                    db.commit()
+            except Exception as e:
+                db.rollback()
+                if _transient(e):
+                    logger.warning("Write-behind flush of %s autosaves hit a locked database; will retry", len(batch))
+                    self._requeue(batch)
+                    return 0
+                logger.warning("Write-behind flush of %s autosaves failed (%s); writing them one by one", len(batch), getattr(e, "orig", e))
+                written = self._flush_each(batch)
+            finally:
+                db.close()
+
+            self.flushes += 1
+            self.flushed_rows += written
+            return written
+
+    def _flush_each(self, batch: Dict[PendingKey, PendingValue]) -> int:
+        """Write each entry in its own savepoint; drop the ones that fail for good."""
+        written = 0
+        retry = {}
+        db = self.session_factory()
+        try:
+            with db_writer.exclusive():
+                # an explicit BEGIN so the savepoints nest inside one transaction
+                db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                for key, (hours, amount, create_empty) in batch.items():
+                    member_id, category = key
+                    try:
+                        with db.begin_nested():
+                            save_many(db, [(member_id, category, hours, amount, create_empty)])
+                        written += 1
+                    except Exception as e:
+                        if _transient(e):
+                            retry[key] = batch[key]
+                        else:
+                            logger.error(
+                                "Dropping autosave for member %s, %s (%s, %s): %s",
+                                member_id, category, hours, amount, getattr(e, "orig", e),
+                            )
+                db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Write-behind flush of %s autosaves failed; will retry", len(batch))
+            self._requeue(batch)
+            return 0
+        finally:
+            db.close()
+        if retry:
+            self._requeue(retry)
+        return written
+
+    def _requeue(self, batch: Dict[PendingKey, PendingValue]) -> None:
+        with self._lock:
+            # newer values that arrived meanwhile win over the failed ones,
+            # and members discarded meanwhile stay discarded
+            for key, value in batch.items():
+                if key[0] not in self._discarded:
+                    self._pending.setdefault(key, value)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+buffer = WriteBehindBuffer()
+
+
+def enabled() -> bool:
+    return WRITE_BEHIND and buffer.running
+
+
+def overlay(member_id: int, values: Dict[str, Tuple[float, float]]) -> Dict[str, Tuple[float, float]]:
+    """Return `values` ({category: (hours, amount)}) with pending autosaves applied."""
+    if not WRITE_BEHIND:
+        return values
+    pending = buffer.pending_for(member_id)
+    if not pending:
+        return values
+    merged = dict(values)
+    merged.update(pending)
+    return merged
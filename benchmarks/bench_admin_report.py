@@ -0,0 +1,132 @@
+"""Benchmark the admin report aggregation at different roster sizes.
+
+Seeds a throwaway SQLite file with N members who each reported every
+Form 1728 category, then times the old approach (load every Activity row
+and sum in Python) against the GROUP BY queries in app.reports and the
+rollup tables maintained by app.rollups.
+
+Run from the project root:
+
+    python -m benchmarks.bench_admin_report --members 1000 10000 100000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Activity
+from app.categories import (
+    FAITH_ACTIVITIES,
+    FAMILY_ACTIVITIES,
+    COMMUNITY_ACTIVITIES,
+    LIFE_ACTIVITIES,
+    OTHER_QUANTITATIVE,
+    QUANTITY_EXCLUDE_HOURS,
+)
+from app.reports import category_totals_by_category, member_totals_by_member
+from app import rollups
+
+ALL_CATEGORIES = FAITH_ACTIVITIES + FAMILY_ACTIVITIES + COMMUNITY_ACTIVITIES + LIFE_ACTIVITIES + OTHER_QUANTITATIVE
+
+
+def seed(path: str, members: int) -> None:
+    conn = sqlite3.connect(path)
+    today = date.today().isoformat()
+    conn.executemany(
+        "INSERT INTO members (id, member_number, first_name, last_name, is_admin) VALUES (?, ?, ?, ?, 0)",
+        ((i, str(100000 + i), "First", f"Last{i}") for i in range(1, members + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO activities (member_id, date, category, description, hours, amount) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (i, today, cat, f"Form 1728 Section 1 - {cat}", float(i % 7), float(i % 11))
+            for i in range(1, members + 1)
+            for cat in ALL_CATEGORIES
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_report(db) -> None:
+    # What admin_report used to do: build an ORM object for every activity row
+    activities = db.query(Activity).all()
+    category_totals = {}
+    for a in activities:
+        category_totals.setdefault(a.category, {"hours": 0.0, "amount": 0.0})
+        category_totals[a.category]["hours"] += a.hours
+        category_totals[a.category]["amount"] += a.amount
+    member_totals = {}
+    for a in activities:
+        totals = member_totals.setdefault(a.member_id, {"hours": 0.0, "amount": 0.0})
+        if a.category not in QUANTITY_EXCLUDE_HOURS:
+            totals["hours"] += a.hours
+        totals["amount"] += a.amount
+
+
+def sql_report(db) -> None:
+    category_totals_by_category(db)
+    member_totals_by_member(db)
+
+
+def rollup_report(db) -> None:
+    rollups.category_totals(db)
+    rollups.member_totals(db)
+
+
+def timed(fn, Session, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        db = Session()
+        try:
+            start = time.perf_counter()
+            fn(db)
+            elapsed = time.perf_counter() - start
+        finally:
+            db.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=20000,
+        help="skip the legacy Python aggregation above this many members (it needs GBs of RAM)",
+    )
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'rows':>9} {'legacy (s)':>11} {'sql (s)':>9} {'rollup (s)':>11}")
+    for n in args.members:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite3")
+            engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(bind=engine)
+            seed(path, n)
+            Session = sessionmaker(bind=engine)
+            db = Session()
+            rollups.rebuild(db)
+            db.commit()
+            db.close()
+
+            legacy = timed(legacy_report, Session, args.repeat) if n <= args.legacy_limit else None
+            sql = timed(sql_report, Session, args.repeat)
+            rollup = timed(rollup_report, Session, args.repeat)
+            engine.dispose()
+
+        legacy_txt = f"{legacy:11.3f}" if legacy is not None else f"{'skipped':>11}"
+        print(f"{n:>8} {n * len(ALL_CATEGORIES):>9} {legacy_txt} {sql:9.3f} {rollup:11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Compare autosave write throughput across the SQLite connection profiles.
+
+For each profile in DB_PROFILES (app/config.py) a fresh database is
+created and --writers threads save random autosaves (upsert + commit,
+like POST /api/activity-update) for --seconds while --readers threads
+load member pages (load_member_values + the member_totals rollup, like
+the dashboard). Reports committed saves per second, save latency,
+reads per second and "database is locked" errors.
+
+Run from the project root:
+
+    python -m benchmarks.bench_db_profiles --writers 8 --readers 4 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.config import DB_PROFILES
+from app.db import Base, apply_pragmas
+from app.migrations import run_migrations
+from app.activity_store import save_activity, load_member_values
+from app.categories import FAITH_ACTIVITIES, FAMILY_ACTIVITIES, COMMUNITY_ACTIVITIES, LIFE_ACTIVITIES
+from app import rollups
+
+CATEGORIES = FAITH_ACTIVITIES + FAMILY_ACTIVITIES + COMMUNITY_ACTIVITIES + LIFE_ACTIVITIES
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def run(profile: str, args) -> None:
+    pragmas = dict(DB_PROFILES[profile])
+    if args.busy_timeout_ms is not None:
+        pragmas["busy_timeout"] = args.busy_timeout_ms
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        engine = create_engine(
+            f"sqlite:///{path}",
+            connect_args={"check_same_thread": False},
+            pool_size=args.writers + args.readers,
+        )
+        event.listen(engine, "connect", lambda conn, record: apply_pragmas(conn, pragmas))
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        conn = sqlite3.connect(path)
+        conn.executemany(
+            "INSERT INTO members (id, member_number, last_name, is_admin) VALUES (?, ?, ?, 0)",
+            ((i, str(i), f"Last{i}") for i in range(1, args.members + 1)),
+        )
+        conn.commit()
+        conn.close()
+
+        Session = sessionmaker(bind=engine)
+        lock = threading.Lock()
+        latencies = []
+        reads = [0]
+        locked = [0]
+        stop_at = time.perf_counter() + args.seconds
+
+        def writer(seed: int) -> None:
+            rnd = random.Random(seed)
+            local = []
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                db = Session()
+                try:
+                    save_activity(db, rnd.randint(1, args.members), rnd.choice(CATEGORIES), round(rnd.random() * 10, 1), 0.0)
+                    db.commit()
+                    local.append((time.perf_counter() - start) * 1000)
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        locked[0] += 1
+                finally:
+                    db.close()
+            with lock:
+                latencies.extend(local)
+
+        def reader(seed: int) -> None:
+            rnd = random.Random(seed)
+            count = 0
+            while time.perf_counter() < stop_at:
+                member_id = rnd.randint(1, args.members)
+                db = Session()
+                try:
+                    load_member_values(db, member_id)
+                    rollups.member_total(db, member_id)
+                    count += 1
+                except OperationalError:
+                    with lock:
+                        locked[0] += 1
+                finally:
+                    db.close()
+            with lock:
+                reads[0] += count
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(1000 + i,)) for i in range(args.readers)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    print(
+        f"{profile:>12} {pragmas['journal_mode']:>7} {pragmas['synchronous']:>7} "
+        f"{len(latencies) / elapsed:9.0f} {percentile(latencies, 50):8.2f} {percentile(latencies, 99):8.2f} "
+        f"{reads[0] / elapsed:9.0f} {locked[0]:7d}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=list(DB_PROFILES), choices=list(DB_PROFILES))
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--busy-timeout-ms", type=int, default=None, help="override every profile's busy_timeout")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per profile")
+    print(f"{'profile':>12} {'journal':>7} {'sync':>7} {'saves/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'reads/s':>9} {'locked':>7}")
+    for profile in args.profiles:
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Autosave throughput as worker processes are added, with and without the single writer.
+
+Each of P processes (standing in for uvicorn/gunicorn workers) runs
+--threads threads that save random autosaves back to back for --seconds:
+
+- direct: every thread upserts and commits on its own connection, so
+  threads and processes fight over the SQLite lock (busy_timeout retries);
+- writer: threads hand the save to the process's db_writer thread and wait
+  on the future; each writer commits whatever has queued up in one
+  transaction, and the processes take turns through the flock.
+
+Run from the project root:
+
+    python -m benchmarks.bench_db_writer --procs 1 2 4 8 --threads 8 --seconds 5
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+def _setup_env(tmp: str, mode: str) -> None:
+    # must happen before app.config is imported (in this process or a spawned child)
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.sqlite3")
+    os.environ["GENERATION_FILE"] = os.path.join(tmp, "bench.generations")
+    os.environ["DB_WRITER"] = "true" if mode == "writer" else "false"
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def _worker(tmp: str, mode: str, args, seed: int, start_at: float, results) -> None:
+    _setup_env(tmp, mode)
+    from sqlalchemy.exc import OperationalError
+    from app import db_writer
+    from app.activity_store import save_activity
+    from app.categories import FAITH_ACTIVITIES, FAMILY_ACTIVITIES, COMMUNITY_ACTIVITIES, LIFE_ACTIVITIES
+    from app.db import SessionLocal, engine
+
+    categories = FAITH_ACTIVITIES + FAMILY_ACTIVITIES + COMMUNITY_ACTIVITIES + LIFE_ACTIVITIES
+    if mode == "writer":
+        db_writer.writer.start()
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    # all processes start together, once every interpreter has finished importing
+    time.sleep(max(start_at - time.time(), 0))
+    stop_at = time.perf_counter() + args.seconds
+
+    def thread(tseed: int) -> None:
+        rnd = random.Random(tseed)
+        local = []
+        failed = 0
+        while time.perf_counter() < stop_at:
+            values = (rnd.randint(1, args.members), rnd.choice(categories), round(rnd.random() * 10, 1), 0.0)
+            start = time.perf_counter()
+            try:
+                if mode == "writer":
+                    db_writer.call(save_activity, *values)
+                else:
+                    db = SessionLocal()
+                    try:
+                        save_activity(db, *values)
+                        db.commit()
+                    finally:
+                        db.close()
+                local.append((time.perf_counter() - start) * 1000)
+            except OperationalError:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=thread, args=(seed * 1000 + i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batches = db_writer.writer.batches
+    db_writer.writer.stop()
+    engine.dispose()
+    results.put((latencies, errors[0], batches))
+
+
+def run(mode: str, procs: int, args) -> None:
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup_env(tmp, mode)
+        conn = sqlite3.connect(os.environ["DB_PATH"])
+        conn.close()
+        setup = ctx.Process(target=_create, args=(tmp, args.members))
+        setup.start()
+        setup.join()
+
+        results = ctx.Queue()
+        start_at = time.time() + 2.0
+        workers = [ctx.Process(target=_worker, args=(tmp, mode, args, i, start_at, results)) for i in range(procs)]
+        for p in workers:
+            p.start()
+        latencies, errors, batches = [], 0, 0
+        for _ in workers:
+            lat, err, b = results.get()
+            latencies.extend(lat)
+            errors += err
+            batches += b
+        for p in workers:
+            p.join()
+
+    per_commit = f"{len(latencies) / batches:8.1f}" if batches else f"{1:8.1f}"
+    print(
+        f"{mode:>7} {procs:6d} {len(latencies) / args.seconds:9.0f} {percentile(latencies, 50):8.2f} "
+        f"{percentile(latencies, 99):8.2f} {per_commit} {errors:7d}"
+    )
+
+
+def _create(tmp: str, members: int) -> None:
+    _setup_env(tmp, "direct")
+    from app.db import Base, engine
+    from app.migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    engine.dispose()
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    conn.executemany(
+        "INSERT INTO members (id, member_number, last_name, is_admin) VALUES (?, ?, ?, 0)",
+        ((i, str(i), f"Last{i}") for i in range(1, members + 1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads per process, {args.seconds:g}s per run (DB_PROFILE={os.getenv('DB_PROFILE', 'wal')})")
+    print(f"{'mode':>7} {'procs':>6} {'saves/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'/commit':>8} {'locked':>7}")
+    for procs in args.procs:
+        for mode in ("direct", "writer"):
+            run(mode, procs, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare rendering notification emails by re-reading + str.replace against the compiled template.
+
+The old path read the template file and ran a chain of str.replace calls
+for every message; the compiled template is read once (then checked by
+mtime) and each message is a single join.
+
+Run from the project root:
+
+    python -m benchmarks.bench_email_template --messages 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from app import email_template
+
+TEMPLATE = (
+    "Dear {name},\n\n"
+    "Our council is collecting Form 1728 hours. Please sign in at {url} with your\n"
+    "last name ({last_name}) and access code {access_code}.\n\n" * 4
+)
+
+
+def legacy(path: str, m) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    text = text.replace("{name}", f"{m.first_name} {m.last_name}")
+    text = text.replace("{last_name}", m.last_name or "")
+    text = text.replace("{url}", os.getenv("URL", "http://localhost:8000"))
+    return text.replace("{access_code}", m.access_code)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    members = [
+        SimpleNamespace(first_name=f"F{i}", last_name=f"L{i}", member_number=str(i), access_code=f"C{i:05d}")
+        for i in range(args.messages)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "email.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(TEMPLATE)
+
+        start = time.perf_counter()
+        old = [legacy(path, m) for m in members]
+        legacy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        template = email_template.load(path)
+        base = email_template.base_values()
+        new = list(template.render_many(email_template.member_values(m, base=base) for m in members))
+        compiled_s = time.perf_counter() - start
+
+    assert old == new, "renderers disagree"
+    print(f"{'renderer':>10} {'msgs/sec':>12} {'seconds':>9}")
+    print(f"{'legacy':>10} {args.messages / legacy_s:12.0f} {legacy_s:9.3f}")
+    print(f"{'compiled':>10} {args.messages / compiled_s:12.0f} {compiled_s:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Event-loop responsiveness under concurrent autosave traffic.
+
+Drives the real app in-process (httpx ASGITransport, one event loop) with
+--clients signed-in members each posting autosaves back to back, while a
+heartbeat task asks to wake every --tick-ms and records how late it
+actually woke. Two runs:
+
+- blocking: the old autosave handler, an `async def` calling a sync
+  Session (each upsert + commit stalls the loop);
+- async: POST /api/activity-update on the AsyncSession (aiosqlite).
+
+Loop lag is what every other request on the worker waits on top of its
+own work, so the async run should show a much lower p99/max lag at a
+similar save rate. Its request latency tail is a different matter: the
+aiosqlite connections still take turns on SQLite's single write lock,
+and a writer that finds it busy backs off in sqlite's busy handler.
+
+Run from the project root:
+
+    python -m benchmarks.bench_event_loop --clients 32 --seconds 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def _blocking_route(app) -> str:
+    """Mount the pre-AsyncSession autosave handler for comparison."""
+    from fastapi import Depends, Request
+    from fastapi.responses import JSONResponse
+    from sqlalchemy.orm import Session
+
+    from app.activity_store import save_activity
+    from app.db import get_db
+    from app.views import get_current_member, parse_activity_payload
+
+    async def blocking_autosave(request: Request, db: Session = Depends(get_db)):
+        member = get_current_member(request, db)
+        if not member:
+            return JSONResponse({"error": "not_authenticated"}, status_code=401)
+        category, hours, amount, quantity_only = parse_activity_payload(await request.json())
+        save_activity(db, member.id, category, hours, amount, create_empty=quantity_only)
+        db.commit()
+        return JSONResponse({"status": "ok"})
+
+    path = "/bench/blocking-autosave"
+    app.add_api_route(path, blocking_autosave, methods=["POST"])
+    return path
+
+
+async def login(app, member_id: int):
+    import httpx
+
+    c = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    r = await c.post("/login", data={"last_name": f"Last{member_id}", "access_code": f"CODE{member_id}"})
+    r.raise_for_status()
+    return c
+
+
+async def run(path: str, args, clients, categories) -> None:
+    lags = []
+    latencies = []
+    errors = [0]
+    stop_at = time.perf_counter() + args.seconds
+    tick = args.tick_ms / 1000.0
+
+    async def heartbeat() -> None:
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.append((time.perf_counter() - start - tick) * 1000)
+
+    async def client(c, seed: int) -> None:
+        rnd = random.Random(seed)
+        while time.perf_counter() < stop_at:
+            body = {"category": rnd.choice(categories), "hours": round(rnd.random() * 10, 1), "amount": 0}
+            start = time.perf_counter()
+            r = await c.post(path, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if r.status_code != 200:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(heartbeat(), *(client(c, i) for i, c in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{path:>26} {len(latencies) / elapsed:9.0f} {percentile(latencies, 50):8.1f} {percentile(latencies, 99):8.1f} "
+        f"{percentile(lags, 50):8.2f} {percentile(lags, 99):8.2f} {max(lags, default=0.0):8.2f} {errors[0]:6d}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # must happen before app.config is imported
+        os.environ["DB_PATH"] = os.path.join(tmp, "bench.sqlite3")
+        os.environ["GENERATION_FILE"] = os.path.join(tmp, "bench.generations")
+        import main as app_main
+        logging.getLogger().setLevel(logging.WARNING)  # no access log per request
+        from app.categories import FAITH_ACTIVITIES, FAMILY_ACTIVITIES, COMMUNITY_ACTIVITIES, LIFE_ACTIVITIES
+        from app.db import async_engine, engine
+
+        conn = sqlite3.connect(os.environ["DB_PATH"])
+        conn.executemany(
+            "INSERT INTO members (id, member_number, last_name, access_code, is_admin) VALUES (?, ?, ?, ?, 0)",
+            ((i, str(i), f"Last{i}", f"CODE{i}") for i in range(1, args.clients + 1)),
+        )
+        conn.commit()
+        conn.close()
+
+        categories = FAITH_ACTIVITIES + FAMILY_ACTIVITIES + COMMUNITY_ACTIVITIES + LIFE_ACTIVITIES
+        blocking = _blocking_route(app_main.app)
+
+        async def bench() -> None:
+            print(f"{args.clients} clients, {args.seconds:.0f}s each, heartbeat every {args.tick_ms:g}ms")
+            print(f"{'route':>26} {'saves/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8} {'errors':>6}")
+            # sign everyone in first so only autosaves are being timed
+            clients = [await login(app_main.app, i) for i in range(1, args.clients + 1)]
+            try:
+                await run(blocking, args, clients, categories)
+                await run("/api/activity-update", args, clients, categories)
+            finally:
+                for c in clients:
+                    await c.aclose()
+                await async_engine.dispose()
+
+        asyncio.run(bench())
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
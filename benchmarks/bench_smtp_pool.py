@@ -0,0 +1,87 @@
+"""Compare sending mail over a new SMTP session per message with the pooled EMailSender.
+
+A local aiosmtpd server stands in for the mail provider; it accepts and
+drops every message. --handshake-ms delays the EHLO reply to stand in for
+the TLS handshake and AUTH round trips a real provider costs on every new
+connection.
+
+Run from the project root:
+
+    python -m benchmarks.bench_smtp_pool --messages 300 --threads 4
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yagmail
+from aiosmtpd.controller import Controller
+
+from app.email_sender import EMailSender, SMTPConnectionPool
+
+FROM = "bench@example.com"
+
+
+class SinkHandler:
+    def __init__(self, handshake_ms: float):
+        self.handshake = handshake_ms / 1000.0
+        self.sessions = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.sessions += 1
+        await asyncio.sleep(self.handshake)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.messages += 1
+        return "250 OK"
+
+
+def per_message(host: str, port: int, to: str) -> None:
+    # what EMailSender used to do for every email
+    yag = yagmail.SMTP(user=FROM, host=host, port=port, smtp_ssl=False, smtp_starttls=False, smtp_skip_login=True)
+    yag.send(to=to, subject="Reminder", contents="Please report your hours.")
+    yag.close()
+
+
+def run(name: str, send, handler: SinkHandler, args) -> None:
+    handler.sessions = handler.messages = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(send, (f"member{i}@example.com" for i in range(args.messages))))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>12} {args.messages / elapsed:10.1f} {handler.sessions:9d} {elapsed:9.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=20.0, help="delay per new connection")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    handler = SinkHandler(args.handshake_ms)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        print(f"{'mode':>12} {'msgs/sec':>10} {'sessions':>9} {'seconds':>9}")
+        run("per-message", lambda to: per_message("127.0.0.1", args.port, to), handler, args)
+
+        sender = EMailSender(host="127.0.0.1", port=args.port, user=FROM, password="", smtp_skip_login=True)
+        sender.pool = SMTPConnectionPool(sender._new_connection, size=args.pool_size)
+        run("pooled", lambda to: sender.send_email(to, "Reminder", "Please report your hours."), handler, args)
+        sender.pool.close()
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
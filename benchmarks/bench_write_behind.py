@@ -0,0 +1,123 @@
+"""Compare autosave throughput with the write-behind buffer off and on.
+
+A pool of threads (standing in for the request threadpool) fires autosaves
+for random members/categories for a fixed time, pausing --think-ms between
+saves. With the buffer off each save is its own upsert + commit; with it
+on saves only touch memory and a background thread commits everything
+pending every --flush-ms (or every --max-pending entries).
+
+Run from the project root:
+
+    python -m benchmarks.bench_write_behind --threads 16 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.migrations import run_migrations
+from app.activity_store import save_activity
+from app.categories import FAITH_ACTIVITIES, FAMILY_ACTIVITIES, COMMUNITY_ACTIVITIES, LIFE_ACTIVITIES
+from app.write_behind import WriteBehindBuffer
+
+CATEGORIES = FAITH_ACTIVITIES + FAMILY_ACTIVITIES + COMMUNITY_ACTIVITIES + LIFE_ACTIVITIES
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def run(mode: str, args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        conn = sqlite3.connect(path)
+        conn.executemany(
+            "INSERT INTO members (id, member_number, last_name, is_admin) VALUES (?, ?, ?, 0)",
+            ((i, str(i), f"Last{i}") for i in range(1, args.members + 1)),
+        )
+        conn.commit()
+        conn.close()
+
+        Session = sessionmaker(bind=engine)
+        commits = [0]
+        event.listen(engine, "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+
+        buffer = None
+        if mode == "on":
+            buffer = WriteBehindBuffer(session_factory=Session, flush_ms=args.flush_ms, max_pending=args.max_pending)
+            buffer.start()
+
+        latencies = []
+        lat_lock = threading.Lock()
+        stop_at = time.perf_counter() + args.seconds
+
+        def worker(seed: int) -> None:
+            rnd = random.Random(seed)
+            local = []
+            while time.perf_counter() < stop_at:
+                member_id = rnd.randint(1, args.members)
+                category = rnd.choice(CATEGORIES)
+                hours = round(rnd.random() * 10, 1)
+                start = time.perf_counter()
+                if buffer is not None:
+                    buffer.put(member_id, category, hours, 0.0)
+                else:
+                    db = Session()
+                    try:
+                        save_activity(db, member_id, category, hours, 0.0)
+                        db.commit()
+                    finally:
+                        db.close()
+                local.append(time.perf_counter() - start)
+                if args.think_ms:
+                    time.sleep(args.think_ms / 1000.0)
+            with lat_lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if buffer is not None:
+            buffer.stop()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    print(
+        f"{mode:>4} {len(latencies) / elapsed:12.0f} {commits[0] / elapsed:12.1f} "
+        f"{percentile(latencies, 50) * 1000:9.3f} {percentile(latencies, 99) * 1000:9.3f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--flush-ms", type=int, default=500)
+    parser.add_argument("--max-pending", type=int, default=200)
+    parser.add_argument("--think-ms", type=float, default=2.0, help="pause between saves per thread")
+    args = parser.parse_args()
+
+    print(f"{'mode':>4} {'saves/sec':>12} {'commits/sec':>12} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for mode in ("off", "on"):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
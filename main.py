@@ -6,7 +6,17 @@ from fastapi.templating import Jinja2Templates
 from starlette.responses import RedirectResponse
 
 from app.config import SECRET_KEY
-from app.db import engine, Base
+from app.db import engine, async_engine, Base
+from app.migrations import run_migrations
+from app import write_behind
+from app import import_jobs
+from app import outbox
+from app import loop_monitor
+from app import db_writer
+from app import report_snapshot
+from app import backup
+from app.email_sender import close_pools
+from app.config import WRITE_BEHIND, LOOP_MONITOR, DB_WRITER, REPORT_SNAPSHOT
 from app.routers import api
 from app.logging_config import setup_logging, request_client_ip, request_member_name, request_member_id
 import logging
@@ -21,6 +31,40 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def on_startup():
     setup_logging()
+    if DB_WRITER:
+        db_writer.writer.start()
+    if WRITE_BEHIND:
+        write_behind.buffer.start()
+    # resumes any import that was interrupted by the last shutdown
+    import_jobs.worker.start()
+    # sends queued notifications, including any left over from the last run
+    outbox.worker.start()
+    if LOOP_MONITOR:
+        loop_monitor.monitor.start()
+    if REPORT_SNAPSHOT:
+        report_snapshot.snapshots.start()
+    # no-op when BACKUP_INTERVAL_HOURS is 0
+    backup.scheduler.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    loop_monitor.monitor.stop()
+    report_snapshot.snapshots.stop()
+    backup.scheduler.stop()
+    # pauses a running import after its current chunk
+    import_jobs.worker.stop()
+    outbox.worker.stop()
+    close_pools()
+    # flush buffered autosaves before the process exits
+    if WRITE_BEHIND:
+        write_behind.buffer.stop()
+    # last, after everything that might still queue a write
+    db_writer.writer.stop()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    # closes the aiosqlite connections (each has its own thread)
+    await async_engine.dispose()
 
 # Middleware to extract client IP (honoring common Cloudflare headers) and member name
 @app.middleware("http")
@@ -67,7 +111,13 @@ async def add_request_context(request: Request, call_next):
     request.state.member_name = member_name or "-"
     request.state.member_id = member_id or "-"
 
-    response = await call_next(request)
+    # lets the loop monitor name the request that blocks the event loop
+    if loop_monitor.monitor.running:
+        loop_monitor.monitor.request_started(request.scope, request.state.client_ip, request.state.member_id, request.state.member_name)
+    try:
+        response = await call_next(request)
+    finally:
+        loop_monitor.monitor.request_finished(request.scope)
 
     # Access-style log with duration and response status
     try:
@@ -122,6 +172,7 @@ async def debug_log_context(request: Request):
 # Create tables that don't exist (non-destructive for existing members table)
 try:
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 except Exception as e:
     print("DB init error:", e)
 
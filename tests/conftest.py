@@ -0,0 +1,106 @@
+"""Shared fixtures: the app against a throwaway database.
+
+app.config reads the environment when it is imported, so everything is
+pointed at a temporary directory here, before any app module is loaded.
+Background threads that would only add noise (backups, report snapshot,
+loop monitor) are turned off.
+"""
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP = tempfile.mkdtemp(prefix="survey1728-tests-")
+
+os.environ.update(
+    {
+        "DB_PATH": os.path.join(TMP, "data.sqlite3"),
+        "GENERATION_FILE": os.path.join(TMP, "data.generations"),
+        "EMAIL_TEXT": os.path.join(TMP, "email.txt"),
+        "IMPORT_STAGING_DIR": os.path.join(TMP, "imports"),
+        "BACKUP_INTERVAL_HOURS": "0",
+        "REPORT_SNAPSHOT": "false",
+        "LOOP_MONITOR": "false",
+        "SECRET_KEY": "tests",
+    }
+)
+with open(os.environ["EMAIL_TEXT"], "w") as f:
+    f.write("Hi {name}, your code is {access_code}: {url}\n")
+
+# templates and static files are looked up relative to the project root
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+_numbers = itertools.count(1000)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    from app.db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_member(client):
+    """Insert a member and return (id, last_name, access_code)."""
+
+    def make(is_admin: bool = False):
+        number = next(_numbers)
+        last_name, access_code = f"Member{number}", f"C{number}"
+        conn = sqlite3.connect(os.environ["DB_PATH"])
+        try:
+            cur = conn.execute(
+                "INSERT INTO members (member_number, first_name, last_name, is_admin, access_code, email) "
+                "VALUES (?, 'Test', ?, ?, ?, ?)",
+                (str(number), last_name, int(is_admin), access_code, f"m{number}@example.org"),
+            )
+            conn.commit()
+            return cur.lastrowid, last_name, access_code
+        finally:
+            conn.close()
+
+    return make
+
+
+@pytest.fixture
+def member(client, make_member):
+    """A signed-in (non-admin) member's id."""
+    member_id, last_name, access_code = make_member()
+    response = client.post("/login", data={"last_name": last_name, "access_code": access_code})
+    assert response.status_code == 200
+    return member_id
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a database of its own, for workers that take a session_factory
+    (a replace import deletes every member, the outbox sends whatever is queued)."""
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from app.db import Base, apply_pragmas
+    from app.migrations import run_migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'worker.sqlite3'}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda conn, record: apply_pragmas(conn))
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
@@ -0,0 +1,112 @@
+"""POST /activities writes the whole form with a fixed number of statements."""
+import contextlib
+from typing import List
+
+from sqlalchemy import event
+
+from app import member_cache
+from app.activity_store import load_member_values
+from app.db import async_engine, engine
+
+
+@contextlib.contextmanager
+def count_statements():
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for e in engines:
+        event.listen(e, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", before_cursor_execute)
+
+
+FORM = {
+    "hours_Church Facilities": "2",
+    "amount_Church Facilities": "7.5",
+    "hours_Family Week": "3",
+    "hours_Athletics": "1.5",
+    "qty_Visits to the Sick": "4",
+}
+
+
+def post_form(client, form):
+    # start from a cold member cache so the member lookup is always one of the statements
+    member_cache.clear()
+    with count_statements() as statements:
+        response = client.post("/activities", data=form, follow_redirects=False)
+    assert response.status_code == 303
+    return statements
+
+
+def test_full_save_is_three_statements(client, member, db):
+    statements = post_form(client, FORM)
+
+    # member, stored values, one bulk upsert - however many categories the form has
+    assert len(statements) == 3, statements
+    assert statements[2].startswith("INSERT INTO activities")
+    assert load_member_values(db, member) == {
+        "Church Facilities": (2.0, 7.5),
+        "Family Week": (3.0, 0.0),
+        "Athletics": (1.5, 0.0),
+        "Visits to the Sick": (4.0, 0.0),
+    }
+
+
+def test_unchanged_form_writes_nothing(client, member):
+    post_form(client, FORM)
+
+    statements = post_form(client, FORM)
+
+    assert len(statements) == 2, statements
+    assert not any(s.startswith(("INSERT", "UPDATE", "DELETE")) for s in statements)
+
+
+def test_changed_rows_only(client, member, db):
+    post_form(client, FORM)
+
+    statements = post_form(client, dict(FORM, **{"hours_Family Week": "5", "hours_Athletics": "0"}))
+
+    assert len(statements) == 3, statements
+    values = load_member_values(db, member)
+    assert values["Family Week"] == (5.0, 0.0)
+    assert values["Athletics"] == (0.0, 0.0)
+    assert values["Church Facilities"] == (2.0, 7.5)
+
+
+def test_batch_saves_valid_items_and_reports_the_rest(client, member, db):
+    response = client.post(
+        "/api/activity-batch",
+        json={
+            "updates": [
+                {"category": "Athletics", "hours": 2, "amount": 5},
+                {"category": "Family Week", "hours": -1},
+                {"category": "Visits to the Sick", "hours": 0, "quantity_only": True},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["errors"] == [{"category": "Family Week", "error": "negative_value"}]
+    # a zeroed quantity-only field gets a row, as with /api/activity-update
+    assert load_member_values(db, member) == {"Athletics": (2.0, 5.0), "Visits to the Sick": (0.0, 0.0)}
+
+
+def test_batch_quantity_only_matches_single_update(client, member, db):
+    client.post("/api/activity-update", json={"category": "Athletics", "hours": 3, "amount": 9, "quantity_only": True})
+    client.post("/api/activity-batch", json={"updates": [{"category": "Family Week", "hours": 3, "amount": 9, "quantity_only": True}]})
+
+    values = load_member_values(db, member)
+    assert values["Athletics"] == values["Family Week"] == (3.0, 0.0)
+
+
+def test_batch_rejects_malformed_payloads(client, member):
+    assert client.post("/api/activity-batch", json=[1]).status_code == 400
+    response = client.post("/api/activity-batch", json={"updates": [1, 2]})
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_json"
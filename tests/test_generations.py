@@ -0,0 +1,86 @@
+"""Generation counters across real worker processes (app/generations.py).
+
+Children are spawned, not forked, so each one imports the app from
+scratch like a separate uvicorn worker; they inherit the environment
+conftest.py set up, so they share the test database.
+"""
+import multiprocessing as mp
+
+ctx = mp.get_context("spawn")
+
+PROCS = 4
+BUMPS = 500
+
+
+def _bump(path: str, bumps: int) -> None:
+    from app.generations import GenerationCounter
+
+    counter = GenerationCounter(path)
+    for _ in range(bumps):
+        counter.bump("members")
+
+
+def _cache_member(member_id: int, loaded, promoted, result) -> None:
+    from app import member_cache
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result["before"] = member_cache.get_member(db, member_id).is_admin
+        loaded.set()
+        promoted.wait(30)
+        result["after"] = member_cache.get_member(db, member_id).is_admin
+        result["remote_invalidations"] = member_cache.cache.remote_invalidations
+    finally:
+        db.close()
+
+
+def _promote_member(member_id: int, loaded, promoted) -> None:
+    from app import member_cache
+    from app.db import SessionLocal
+    from app.models import Member
+
+    loaded.wait(30)
+    db = SessionLocal()
+    try:
+        db.query(Member).filter(Member.id == member_id).update({"is_admin": True})
+        db.commit()
+        member_cache.invalidate(member_id)
+    finally:
+        db.close()
+        promoted.set()
+
+
+def _run(*processes) -> None:
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(60)
+        assert p.exitcode == 0
+
+
+def test_concurrent_bumps_are_not_lost(tmp_path):
+    from app.generations import GenerationCounter
+
+    path = str(tmp_path / "generations")
+
+    _run(*(ctx.Process(target=_bump, args=(path, BUMPS)) for _ in range(PROCS)))
+
+    assert GenerationCounter(path).current("members") == PROCS * BUMPS
+
+
+def test_invalidation_reaches_other_process(client, make_member):
+    member_id, _, _ = make_member()
+
+    with ctx.Manager() as manager:
+        loaded, promoted, result = ctx.Event(), ctx.Event(), manager.dict()
+        _run(
+            ctx.Process(target=_cache_member, args=(member_id, loaded, promoted, result)),
+            ctx.Process(target=_promote_member, args=(member_id, loaded, promoted)),
+        )
+        result = dict(result)
+
+    # seen on the very next lookup, not after MEMBER_CACHE_TTL_SECONDS
+    assert result["before"] is False
+    assert result["after"] is True
+    assert result["remote_invalidations"] == 1
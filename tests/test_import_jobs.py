@@ -0,0 +1,153 @@
+"""Import jobs stop when another worker has claimed them, and stale staged uploads are cleaned up."""
+import io
+import os
+import time
+
+from sqlalchemy import text
+
+from app import member_import
+from app import import_jobs
+from app.import_jobs import ImportWorker
+from app.models import ImportJob
+
+ROSTER = "Membership Number,First Name,Last Name,Cell Phone,Primary Email\n" + "".join(
+    f"{5000 + i},First{i},Last{i},555,m{i}@example.org\n" for i in range(50)
+)
+
+
+def queue_job(session_factory, mode: str = "replace") -> str:
+    token = member_import.stage_upload(io.BytesIO(ROSTER.encode()), ".csv")
+    db = session_factory()
+    try:
+        db.add(ImportJob(id=token, filename="roster.csv", extension=".csv", mode=mode, status="queued"))
+        db.commit()
+    finally:
+        db.close()
+    return token
+
+
+class TakenOverAfterFirstChunk(ImportWorker):
+    """Another worker claims the job right after the first chunk is committed."""
+
+    def _commit_chunk(self, db, job, chunk, row_no, errors):
+        super()._commit_chunk(db, job, chunk, row_no, errors)
+        other = self.session_factory()
+        try:
+            other.execute(text("UPDATE import_jobs SET claimed_by = 'other-worker' WHERE id = :id"), {"id": job.id})
+            other.commit()
+        finally:
+            other.close()
+
+
+def test_replace_stops_when_claim_is_lost(session_factory):
+    job_id = queue_job(session_factory)
+
+    assert TakenOverAfterFirstChunk(session_factory, chunk_size=10).run_next()
+
+    db = session_factory()
+    try:
+        job = db.get(ImportJob, job_id)
+        # the second chunk and everything after it were rolled back
+        assert db.execute(text("SELECT count(*) FROM members")).scalar() == 10
+        assert job.rows_processed == 10
+        assert job.status == "running"
+        assert job.claimed_by == "other-worker"
+    finally:
+        db.close()
+
+
+def test_sync_is_not_applied_when_claim_is_lost(session_factory, monkeypatch):
+    job_id = queue_job(session_factory, mode="sync")
+    plan_sync = member_import.plan_sync
+
+    def slow_plan_sync(db, rows, fieldnames):
+        plan = plan_sync(db, rows, fieldnames)
+        # the plan took so long that another worker claimed the job meanwhile
+        other = session_factory()
+        try:
+            other.execute(text("UPDATE import_jobs SET claimed_by = 'other-worker' WHERE id = :id"), {"id": job_id})
+            other.commit()
+        finally:
+            other.close()
+        return plan
+
+    monkeypatch.setattr(member_import, "plan_sync", slow_plan_sync)
+    assert ImportWorker(session_factory, chunk_size=10).run_next()
+
+    db = session_factory()
+    try:
+        job = db.get(ImportJob, job_id)
+        assert db.execute(text("SELECT count(*) FROM members")).scalar() == 0
+        assert job.status == "running"
+        assert job.claimed_by == "other-worker"
+    finally:
+        db.close()
+
+
+def test_job_runs_to_completion(session_factory):
+    job_id = queue_job(session_factory)
+
+    assert ImportWorker(session_factory, chunk_size=10).run_next()
+
+    db = session_factory()
+    try:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "done"
+        assert job.imported == 50
+        assert member_import.find_staged(job_id) is None
+    finally:
+        db.close()
+
+
+class FailsAfterFirstChunk(ImportWorker):
+    def _commit_chunk(self, db, job, chunk, row_no, errors):
+        if job.rows_processed:
+            raise OSError("disk full")
+        super()._commit_chunk(db, job, chunk, row_no, errors)
+
+
+def test_failed_replace_reports_partial_roster_and_can_be_retried(session_factory):
+    job_id = queue_job(session_factory)
+
+    assert FailsAfterFirstChunk(session_factory, chunk_size=10).run_next()
+
+    db = session_factory()
+    try:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "failed"
+        assert db.execute(text("SELECT count(*) FROM members")).scalar() == 10
+        assert "now holds only the 10 members" in job.message
+        status = import_jobs.job_status(job)
+        assert status["partial"] and status["can_retry"]
+        assert import_jobs.latest_partial_replace(db).id == job_id
+
+        assert import_jobs.retry_job(db, job_id).status == "queued"
+    finally:
+        db.close()
+
+    assert ImportWorker(session_factory, chunk_size=10).run_next()
+
+    db = session_factory()
+    try:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "done"
+        assert db.execute(text("SELECT count(*) FROM members")).scalar() == 50
+        assert not import_jobs.job_status(job)["partial"]
+        assert import_jobs.latest_partial_replace(db) is None
+    finally:
+        db.close()
+
+
+def test_stale_staged_uploads_are_removed():
+    old = member_import.stage_upload(io.BytesIO(ROSTER.encode()), ".csv")
+    queued = member_import.stage_upload(io.BytesIO(ROSTER.encode()), ".csv")
+    fresh = member_import.stage_upload(io.BytesIO(ROSTER.encode()), ".csv")
+    day_ago = time.time() - 86400
+    for token in (old, queued):
+        os.utime(member_import.staged_path(token, ".csv"), (day_ago, day_ago))
+
+    removed = member_import.remove_stale_staged(3600, keep=[queued])
+
+    assert removed == [member_import.staged_path(old, ".csv")]
+    assert member_import.find_staged(queued) is not None
+    assert member_import.find_staged(fresh) is not None
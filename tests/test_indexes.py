@@ -0,0 +1,59 @@
+"""Login and access-code lookups must stay on the lower() expression indexes.
+
+The statements are captured as the app issues them and replayed under
+EXPLAIN QUERY PLAN, so a change to either query that stops SQLite from
+using the index fails here instead of turning into a full table scan.
+"""
+import contextlib
+from typing import List, Tuple
+
+from sqlalchemy import event
+
+from app.access_code import AccessCode
+from app.db import async_engine, engine
+
+
+@contextlib.contextmanager
+def capture_member_queries(target):
+    captured: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM members" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plan(statement: str, parameters) -> str:
+    conn = engine.raw_connection()
+    try:
+        rows = conn.cursor().execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    finally:
+        conn.close()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_login_uses_lower_index(client, make_member):
+    _, last_name, access_code = make_member()
+
+    with capture_member_queries(async_engine.sync_engine) as captured:
+        response = client.post("/login", data={"last_name": last_name.upper(), "access_code": access_code.lower()})
+
+    assert response.status_code == 200
+    assert len(captured) == 1, captured
+    plan = query_plan(*captured[0])
+    assert "SEARCH members USING INDEX ix_members_lower_" in plan, plan
+
+
+def test_access_code_uniqueness_uses_lower_index(client, db):
+    with capture_member_queries(engine) as captured:
+        AccessCode(db).generate_unique_access_code()
+
+    assert captured
+    for statement, parameters in captured:
+        plan = query_plan(statement, parameters)
+        assert "SEARCH members USING INDEX ix_members_lower_access_code" in plan, plan
@@ -0,0 +1,53 @@
+"""Mail merge export (app/mail_merge.py)."""
+import io
+import mailbox
+import os
+import sqlite3
+import zipfile
+
+from app import mail_merge
+
+
+def execute(sql: str, *params):
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    try:
+        row = conn.execute(sql, params).fetchone()
+        conn.commit()
+        return row
+    finally:
+        conn.close()
+
+
+def test_zip_export_assigns_codes_to_selected_members_only(db, make_member):
+    unreported, unreported_name, _ = make_member()
+    reported, _, _ = make_member()
+    execute("UPDATE members SET access_code = NULL WHERE id IN (?, ?)", unreported, reported)
+    execute(
+        "INSERT INTO activities (member_id, date, category, description, hours, amount) "
+        "VALUES (?, '2026-01-01', 'Athletics', 'Athletics', 2, 0)",
+        reported,
+    )
+
+    data = b"".join(mail_merge.export(db, "zip", "unreported"))
+
+    code = execute("SELECT access_code FROM members WHERE id = ?", unreported)[0]
+    assert code
+    assert execute("SELECT access_code FROM members WHERE id = ?", reported)[0] is None
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        bodies = [zf.read(name).decode() for name in zf.namelist()]
+    assert all(name.endswith(".eml") for name in zf.namelist())
+    assert any(f"Test {unreported_name}, your code is {code}:" in body for body in bodies)
+
+
+def test_mbox_export_has_one_message_per_member(db, make_member, tmp_path):
+    member_id, last_name, access_code = make_member()
+    number = last_name.removeprefix("Member")
+
+    path = tmp_path / "export.mbox"
+    path.write_bytes(b"".join(mail_merge.export(db, "mbox", "all")))
+
+    messages = list(mailbox.mbox(str(path)))
+    assert len(messages) == execute("SELECT COUNT(*) FROM members WHERE TRIM(COALESCE(email, '')) != ''")[0]
+    (message,) = [m for m in messages if m["X-Member-Number"] == number]
+    assert message["To"] == f"m{number}@example.org"
+    assert f"your code is {access_code}:" in message.get_payload()
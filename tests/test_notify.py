@@ -0,0 +1,48 @@
+"""Notify All must not touch access codes when it can't send anything."""
+import os
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def admin(client, make_member):
+    member_id, last_name, access_code = make_member(is_admin=True)
+    assert client.post("/login", data={"last_name": last_name, "access_code": access_code}).status_code == 200
+    return member_id
+
+
+def access_code(member_id: int):
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    try:
+        return conn.execute("SELECT access_code FROM members WHERE id = ?", (member_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_missing_template_leaves_access_codes_alone(client, admin, make_member, monkeypatch, tmp_path):
+    member_id, _, _ = make_member()
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    conn.execute("UPDATE members SET access_code = NULL WHERE id = ?", (member_id,))
+    conn.commit()
+    conn.close()
+    monkeypatch.setenv("EMAIL_TEXT", str(tmp_path / "missing.txt"))
+
+    response = client.post("/admin/notify-all")
+
+    assert response.status_code == 500
+    assert "Email template not found" in response.json()["detail"]
+    assert access_code(member_id) is None
+
+
+def test_notify_member_assigns_missing_access_code(client, admin, make_member):
+    member_id, last_name, _ = make_member()
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    conn.execute("UPDATE members SET access_code = NULL WHERE id = ?", (member_id,))
+    conn.commit()
+    conn.close()
+
+    response = client.post(f"/admin/notify/{last_name.removeprefix('Member')}")
+
+    assert response.status_code == 200
+    assert access_code(member_id)
@@ -0,0 +1,119 @@
+"""Outbox claiming, retries and the rate limit, with a fake send (app/outbox.py)."""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import outbox
+from app.config import OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE_SECONDS, OUTBOX_RETRY_MAX_SECONDS
+from app.models import EmailLog
+
+
+class FakeSend:
+    def __init__(self, error=None):
+        self.error = error
+        self.to = []
+
+    def __call__(self, to_address, subject, body):
+        self.to.append(to_address)
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+def queue(session_factory, count: int = 1):
+    db = session_factory()
+    try:
+        outbox.enqueue_many(
+            db,
+            [{"member_number": str(i), "to_address": f"m{i}@example.org", "subject": "Hi", "body": "..."} for i in range(count)],
+        )
+    finally:
+        db.close()
+
+
+def messages(session_factory):
+    db = session_factory()
+    try:
+        return db.query(EmailLog).order_by(EmailLog.id).all()
+    finally:
+        db.close()
+
+
+def test_failed_send_is_retried_with_backoff(session_factory, executor):
+    queue(session_factory)
+    send = FakeSend(ConnectionRefusedError("relay down"))
+    worker = outbox.OutboxWorker(session_factory, send=send)
+
+    before = datetime.utcnow()
+    assert worker.drain_once(executor)
+
+    (message,) = messages(session_factory)
+    assert send.to == ["m0@example.org"]
+    assert message.status == "queued"
+    assert message.attempts == 1
+    assert "relay down" in message.last_error
+    assert message.next_attempt_at >= before + timedelta(seconds=OUTBOX_RETRY_BASE_SECONDS)
+    # not due yet: nothing is claimed
+    assert not worker.drain_once(executor)
+    assert len(send.to) == 1
+
+
+def test_gives_up_after_max_attempts(session_factory, executor):
+    queue(session_factory)
+    db = session_factory()
+    db.query(EmailLog).update({"attempts": OUTBOX_MAX_ATTEMPTS - 1})
+    db.commit()
+    db.close()
+    worker = outbox.OutboxWorker(session_factory, send=FakeSend(ConnectionRefusedError("relay down")))
+
+    worker.drain_once(executor)
+
+    (message,) = messages(session_factory)
+    assert message.status == "failed"
+    assert message.attempts == OUTBOX_MAX_ATTEMPTS
+    assert message.next_attempt_at is None
+    assert worker.failures == 1
+
+
+def test_expired_sending_lease_is_claimed_again(session_factory, executor):
+    queue(session_factory, 2)
+    db = session_factory()
+    past, future = datetime.utcnow() - timedelta(seconds=1), datetime.utcnow() + timedelta(hours=1)
+    # one worker died mid-send (lease expired); another is still sending
+    db.query(EmailLog).filter(EmailLog.member_number == "0").update({"status": "sending", "next_attempt_at": past})
+    db.query(EmailLog).filter(EmailLog.member_number == "1").update({"status": "sending", "next_attempt_at": future})
+    db.commit()
+    db.close()
+    send = FakeSend()
+
+    outbox.OutboxWorker(session_factory, send=send).drain_once(executor)
+
+    assert send.to == ["m0@example.org"]
+    assert [m.status for m in messages(session_factory)] == ["sent", "sending"]
+
+
+def test_rate_limit_caps_sends_per_minute(session_factory, executor):
+    queue(session_factory, 5)
+    send = FakeSend()
+    worker = outbox.OutboxWorker(session_factory, send=send, concurrency=4, rate_per_minute=2)
+
+    assert worker.drain_once(executor)
+    assert len(send.to) == 2
+    # budget used up: the next pass only waits (cut short here by stop)
+    worker._stop.set()
+    assert worker.drain_once(executor)
+
+    assert len(send.to) == 2
+    assert [m.status for m in messages(session_factory)].count("sent") == 2
+
+
+def test_retry_delay_doubles_up_to_the_max():
+    assert outbox.retry_delay(1) == OUTBOX_RETRY_BASE_SECONDS
+    assert outbox.retry_delay(2) == 2 * OUTBOX_RETRY_BASE_SECONDS
+    assert outbox.retry_delay(100) == OUTBOX_RETRY_MAX_SECONDS
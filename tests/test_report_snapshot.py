@@ -0,0 +1,41 @@
+"""The report snapshot picks up commits made since the last copy (app/report_snapshot.py)."""
+import os
+
+import pytest
+
+from app.generations import Generation
+from app.report_snapshot import ReportSnapshots
+
+
+def member_count(snapshot):
+    return snapshot.read(lambda db: db.connection().exec_driver_sql("SELECT count(*) FROM members").scalar())
+
+
+@pytest.fixture
+def snapshots(client):
+    snapshots = ReportSnapshots(os.environ["DB_PATH"], max_age=3600, max_stale=3600, generation=Generation("members"))
+    yield snapshots
+    snapshots.stop()
+
+
+def test_write_is_visible_after_data_version_changes(snapshots, make_member):
+    before = member_count(snapshots.refresh())
+
+    # nothing committed: the copy is kept
+    snapshots.refresh()
+    assert snapshots.refreshes == 1 and snapshots.skipped == 1
+
+    # a plain commit from another connection, with no generation bump
+    make_member()
+    snapshot = snapshots.refresh()
+
+    assert snapshots.refreshes == 2
+    assert member_count(snapshot) == before + 1
+
+
+def test_copy_holds_only_report_tables(snapshots):
+    snapshot = snapshots.refresh()
+    tables = snapshot.read(
+        lambda db: {row[0] for row in db.connection().exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    )
+    assert tables == {"members", "member_totals", "category_totals"}
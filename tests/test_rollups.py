@@ -0,0 +1,69 @@
+"""Rollup triggers keep raw sums that match a fresh GROUP BY (app/rollups.py)."""
+import random
+
+from sqlalchemy import text
+
+from app import rollups
+from app.activity_store import save_activity
+from app.migrations import run_migrations
+
+
+def add_member(db, number: str) -> int:
+    return db.execute(
+        text("INSERT INTO members (member_number, first_name, last_name, is_admin) VALUES (:n, 'Test', :n, 0)"), {"n": number}
+    ).lastrowid
+
+
+def test_values_with_many_decimals_do_not_drift(session_factory):
+    rng = random.Random(1728)
+    db = session_factory()
+    try:
+        # each step used to be rounded to 6 decimals: up to 5e-7 off per member in a
+        # category total, which adds up past the drift tolerance over many members
+        for n in range(200):
+            member_id = add_member(db, str(n))
+            for category in ("Athletics", "Family Week", "Church Facilities"):
+                save_activity(db, member_id, category, rng.uniform(0, 10), rng.uniform(0, 100))
+        db.commit()
+
+        assert rollups.verify(db) == []
+    finally:
+        db.close()
+
+
+def test_zeroed_member_reads_as_unreported(session_factory):
+    db = session_factory()
+    try:
+        member_id = add_member(db, "zero")
+        save_activity(db, member_id, "Athletics", 0.1, 0.0)
+        save_activity(db, member_id, "Family Week", 0.2, 0.0)
+        save_activity(db, member_id, "Athletics", 0.0, 0.0)
+        save_activity(db, member_id, "Family Week", 0.0, 0.0)
+        db.commit()
+
+        # the raw sum may be a few ulps off zero; reads round it away
+        assert rollups.member_total(db, member_id) == {"hours": 0.0, "amount": 0.0}
+        assert [m.id for m in rollups.unreported_members(db)] == [member_id]
+    finally:
+        db.close()
+
+
+def test_rounded_sums_from_old_triggers_are_rebuilt(session_factory):
+    db = session_factory()
+    try:
+        member_id = add_member(db, "old")
+        save_activity(db, member_id, "Athletics", 1.23456789, 0.0)
+        # what the old per-step rounding left behind, under the old trigger
+        db.execute(text("UPDATE member_totals SET hours = 1.234568 WHERE member_id = :m"), {"m": member_id})
+        db.execute(text("DROP TRIGGER activities_rollup_insert"))
+        db.execute(text(
+            "CREATE TRIGGER activities_rollup_insert AFTER INSERT ON activities BEGIN "
+            "UPDATE member_totals SET hours = ROUND(hours + NEW.hours, 6) WHERE member_id = NEW.member_id; END"
+        ))
+        db.commit()
+
+        run_migrations(db.get_bind())
+
+        assert rollups.member_totals(db, digits=None)[member_id]["hours"] == 1.23456789
+    finally:
+        db.close()
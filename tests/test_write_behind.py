@@ -0,0 +1,98 @@
+"""Write-behind autosave buffer (app/write_behind.py)."""
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import views, write_behind
+from app.activity_store import load_member_values
+from app.db import SessionLocal
+from app.write_behind import WriteBehindBuffer
+
+
+@pytest.fixture
+def buffer(client, monkeypatch):
+    # flushed only when a test asks for it
+    buffer = WriteBehindBuffer(SessionLocal, flush_ms=60000, max_pending=1000)
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND", True)
+    monkeypatch.setattr(write_behind, "buffer", buffer)
+    yield buffer
+    buffer.stop()
+
+
+def test_pending_values_are_overlaid_on_reads(buffer, member, db):
+    buffer.put(member, "Athletics", 2.5, 0.0)
+
+    assert load_member_values(db, member) == {}
+    assert views._activity_map(db, member)["Athletics"].hours == 2.5
+
+
+def test_stop_flushes_pending_values(buffer, member, db):
+    buffer.start()
+    buffer.put(member, "Athletics", 2.5, 0.0)
+    buffer.put(member, "Family Week", 1.0, 3.0)
+
+    buffer.stop()
+
+    assert load_member_values(db, member) == {"Athletics": (2.5, 0.0), "Family Week": (1.0, 3.0)}
+    assert buffer.pending_for(member) == {}
+
+
+def test_entry_that_cannot_be_written_is_dropped(buffer, member, db):
+    buffer.put(member, "Athletics", 2.5, 0.0)
+    # no such member: the bulk upsert fails on the foreign key
+    buffer.put(999999, "Athletics", 1.0, 0.0)
+
+    assert buffer.flush() == 1
+
+    assert load_member_values(db, member) == {"Athletics": (2.5, 0.0)}
+    assert buffer.pending_for(999999) == {}
+    # the next flush isn't held up by it
+    buffer.put(member, "Athletics", 3.0, 0.0)
+    assert buffer.flush() == 1
+
+
+def test_discard_waits_for_flush_and_keeps_failed_values_out(buffer, member, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def locked_save_many(db, saves):
+        list(saves)
+        started.set()
+        release.wait(10)
+        raise OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+
+    monkeypatch.setattr(write_behind, "save_many", locked_save_many)
+    buffer.put(member, "Athletics", 2.5, 0.0)
+    flushing = threading.Thread(target=buffer.flush)
+    flushing.start()
+    assert started.wait(10)
+
+    discarding = threading.Thread(target=buffer.discard_member, args=(member,))
+    discarding.start()
+    discarding.join(0.2)
+    # still waiting for the flush that holds the member's older value
+    assert discarding.is_alive()
+
+    release.set()
+    flushing.join(10)
+    discarding.join(10)
+    assert not discarding.is_alive()
+    # the failed batch was put back, except for the discarded member
+    assert buffer.pending_for(member) == {}
+
+
+def test_requeue_keeps_other_members(buffer, member, make_member, monkeypatch):
+    other, _, _ = make_member()
+
+    def locked_save_many(db, saves):
+        raise OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+
+    monkeypatch.setattr(write_behind, "save_many", locked_save_many)
+    buffer.put(member, "Athletics", 2.5, 0.0)
+    buffer.put(other, "Athletics", 1.0, 0.0)
+
+    assert buffer.flush() == 0
+
+    assert buffer.pending_for(member) == {"Athletics": (2.5, 0.0)}
+    assert buffer.pending_for(other) == {"Athletics": (1.0, 0.0)}